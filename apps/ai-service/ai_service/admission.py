@@ -0,0 +1,196 @@
+"""
+Admission Control for Ollama
+
+This module bounds the number of concurrent requests sent to each Ollama
+model. Requests beyond the in-flight limit wait in a bounded FIFO queue; when
+the queue is full or a request waits past its deadline, it is rejected with an
+OllamaOverloadedError carrying a Retry-After hint instead of piling up behind
+Ollama's own internal serialization.
+"""
+
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+OLLAMA_MAX_IN_FLIGHT = int(os.getenv("OLLAMA_MAX_IN_FLIGHT", "4"))
+OLLAMA_MAX_QUEUE_DEPTH = int(os.getenv("OLLAMA_MAX_QUEUE_DEPTH", "32"))
+OLLAMA_QUEUE_TIMEOUT = float(os.getenv("OLLAMA_QUEUE_TIMEOUT", "30.0"))
+# Per-model overrides, e.g. '{"qwen2.5-vl": {"max_in_flight": 1, "max_queue_depth": 8}}'
+OLLAMA_MODEL_LIMITS = json.loads(os.getenv("OLLAMA_MODEL_LIMITS", "{}"))
+
+# Number of recent samples kept for wait/service time statistics
+_SAMPLE_WINDOW = 256
+
+
+class OllamaOverloadedError(Exception):
+    """Raised when a request cannot be admitted to Ollama."""
+
+    def __init__(self, message: str, status_code: int, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class _ModelQueue:
+    """Admission state for a single model."""
+
+    def __init__(self, max_in_flight: int, max_queue_depth: int, queue_timeout: float):
+        self.max_in_flight = max_in_flight
+        self.max_queue_depth = max_queue_depth
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.wait_times: Deque[float] = deque(maxlen=_SAMPLE_WINDOW)
+        self.service_times: Deque[float] = deque(maxlen=_SAMPLE_WINDOW)
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+
+    def retry_after(self) -> int:
+        """Estimate how long until a slot frees up, in whole seconds."""
+        if self.service_times:
+            avg_service = sum(self.service_times) / len(self.service_times)
+        else:
+            avg_service = 1.0
+        backlog = len(self.waiters) + 1
+        return max(1, math.ceil(avg_service * backlog / self.max_in_flight))
+
+
+class ModelAdmissionController:
+    """Per-model semaphore with a bounded, deadline-aware wait queue."""
+
+    def __init__(self, max_in_flight: int = OLLAMA_MAX_IN_FLIGHT,
+                 max_queue_depth: int = OLLAMA_MAX_QUEUE_DEPTH,
+                 queue_timeout: float = OLLAMA_QUEUE_TIMEOUT,
+                 model_limits: Optional[Dict[str, Dict[str, Any]]] = None):
+        """
+        Initialize the controller.
+
+        Args:
+            max_in_flight (int): Default concurrent requests per model.
+            max_queue_depth (int): Default number of requests allowed to wait per model.
+            queue_timeout (float): Default seconds a request may wait for a slot.
+            model_limits (Optional[Dict[str, Dict[str, Any]]]): Per-model overrides of the above.
+        """
+        self.max_in_flight = max_in_flight
+        self.max_queue_depth = max_queue_depth
+        self.queue_timeout = queue_timeout
+        self.model_limits = OLLAMA_MODEL_LIMITS if model_limits is None else model_limits
+        self._queues: Dict[str, _ModelQueue] = {}
+
+    def _queue_for(self, model: str) -> _ModelQueue:
+        queue = self._queues.get(model)
+        if queue is None:
+            limits = self.model_limits.get(model, {})
+            queue = _ModelQueue(
+                limits.get("max_in_flight", self.max_in_flight),
+                limits.get("max_queue_depth", self.max_queue_depth),
+                limits.get("queue_timeout", self.queue_timeout),
+            )
+            self._queues[model] = queue
+        return queue
+
+    async def acquire(self, model: str):
+        """
+        Wait for an in-flight slot for a model.
+
+        Raises:
+            OllamaOverloadedError: 429 when the queue is full, 503 when the wait deadline passes.
+        """
+        queue = self._queue_for(model)
+        if queue.in_flight < queue.max_in_flight and not queue.waiters:
+            queue.in_flight += 1
+            queue.admitted += 1
+            queue.wait_times.append(0.0)
+            return
+
+        if len(queue.waiters) >= queue.max_queue_depth:
+            queue.rejected_queue_full += 1
+            raise OllamaOverloadedError(
+                f"Model {model} is saturated ({queue.in_flight} in flight, {len(queue.waiters)} queued)",
+                status_code=429,
+                retry_after=queue.retry_after(),
+            )
+
+        waiter = asyncio.get_running_loop().create_future()
+        queue.waiters.append(waiter)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), queue.queue_timeout)
+        except asyncio.TimeoutError:
+            if not (waiter.done() and not waiter.cancelled()):
+                waiter.cancel()
+                self._discard(queue, waiter)
+                queue.rejected_timeout += 1
+                raise OllamaOverloadedError(
+                    f"Timed out after {queue.queue_timeout:.0f}s waiting for model {model}",
+                    status_code=503,
+                    retry_after=queue.retry_after(),
+                )
+            # The slot was handed over just as the deadline passed; keep it
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(model)
+            else:
+                waiter.cancel()
+                self._discard(queue, waiter)
+            raise
+
+        queue.admitted += 1
+        queue.wait_times.append(time.monotonic() - started)
+
+    @staticmethod
+    def _discard(queue: _ModelQueue, waiter: asyncio.Future):
+        try:
+            queue.waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self, model: str):
+        """Release a slot, handing it directly to the oldest live waiter if any."""
+        queue = self._queue_for(model)
+        while queue.waiters:
+            waiter = queue.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        queue.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self, model: str) -> AsyncIterator[None]:
+        """Hold an in-flight slot for a model for the duration of the block."""
+        await self.acquire(model)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._queue_for(model).service_times.append(time.monotonic() - started)
+            self.release(model)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get live queue depth and wait-time metrics per model."""
+        stats = {}
+        for model, queue in self._queues.items():
+            waits = sorted(queue.wait_times)
+            stats[model] = {
+                "in_flight": queue.in_flight,
+                "max_in_flight": queue.max_in_flight,
+                "queue_depth": len(queue.waiters),
+                "max_queue_depth": queue.max_queue_depth,
+                "admitted": queue.admitted,
+                "rejected_queue_full": queue.rejected_queue_full,
+                "rejected_timeout": queue.rejected_timeout,
+                "avg_wait_seconds": round(sum(waits) / len(waits), 4) if waits else 0.0,
+                "p95_wait_seconds": round(waits[int(0.95 * (len(waits) - 1))], 4) if waits else 0.0,
+                "max_wait_seconds": round(waits[-1], 4) if waits else 0.0,
+            }
+        return stats
+
+
+# Global instance guarding every Ollama inference call
+admission_controller = ModelAdmissionController()
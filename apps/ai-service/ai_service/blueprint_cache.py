@@ -0,0 +1,53 @@
+"""
+Blueprint Analysis Cache
+
+The same blueprint is typically uploaded many times over a sales cycle, and
+each upload used to re-run the multimodal analysis, the most expensive call
+the service makes. This module caches the analysis text and the structured
+data extracted from it, keyed on the image's content hash together with the
+analysis type, prompt and model. It is a ResponseCache, so entries live in an
+in-memory LRU with a TTL and, when a database path is configured, in a SQLite
+tier that survives restarts.
+"""
+
+import hashlib
+import os
+
+from ai_service.response_cache import ResponseCache, make_cache_key, RESPONSE_CACHE_DB_PATH
+
+BLUEPRINT_CACHE_ENABLED = os.getenv("BLUEPRINT_CACHE_ENABLED", "true").lower() == "true"
+BLUEPRINT_CACHE_MAX_ENTRIES = int(os.getenv("BLUEPRINT_CACHE_MAX_ENTRIES", "512"))
+BLUEPRINT_CACHE_MAX_BYTES = int(os.getenv("BLUEPRINT_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+# Blueprints come back for weeks, not minutes
+BLUEPRINT_CACHE_TTL = float(os.getenv("BLUEPRINT_CACHE_TTL", str(30 * 24 * 3600)))
+# Shares the response cache's SQLite file (in its own table) unless set
+BLUEPRINT_CACHE_DB_PATH = os.getenv("BLUEPRINT_CACHE_DB_PATH", RESPONSE_CACHE_DB_PATH)
+BLUEPRINT_CACHE_MAX_DISK_ENTRIES = int(os.getenv("BLUEPRINT_CACHE_MAX_DISK_ENTRIES", "10000"))
+
+
+def blueprint_cache_key(image_bytes: bytes, analysis_type: str, prompt: str, model: str) -> str:
+    """
+    Build the cache key of a blueprint analysis.
+
+    Args:
+        image_bytes (bytes): The decoded image, so base64 and binary uploads share entries.
+        analysis_type (str): Type of analysis ('blueprint', 'general', 'technical').
+        prompt (str): The analysis prompt.
+        model (str): The multimodal model doing the analysis.
+
+    Returns:
+        str: Hex SHA-256 digest.
+    """
+    return make_cache_key("blueprint", hashlib.sha256(image_bytes).hexdigest(), analysis_type, prompt, model)
+
+
+# Global instance used by /analyze-blueprint-enhanced
+blueprint_cache = ResponseCache(
+    max_entries=BLUEPRINT_CACHE_MAX_ENTRIES,
+    max_bytes=BLUEPRINT_CACHE_MAX_BYTES,
+    ttl_seconds=BLUEPRINT_CACHE_TTL,
+    db_path=BLUEPRINT_CACHE_DB_PATH,
+    max_disk_entries=BLUEPRINT_CACHE_MAX_DISK_ENTRIES,
+    enabled=BLUEPRINT_CACHE_ENABLED,
+    name="blueprint_analyses",
+)
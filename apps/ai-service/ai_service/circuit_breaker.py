@@ -0,0 +1,272 @@
+"""
+Circuit Breakers for Ollama Models
+
+This module tracks the health of each Ollama model from the outcome and
+time-to-first-token of recent calls. When too many calls fail or are slow, the
+model's circuit opens and calls fail fast so callers can use the fallback
+model. After a cooldown a single probe is let through (half-open); it closes
+the circuit on success and reopens it on failure. The first-token latencies
+also drive the delay after which a hedged request fires the fallback.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+import httpx
+
+from ai_service.admission import OllamaOverloadedError
+
+CIRCUIT_BREAKER_ENABLED = os.getenv("CIRCUIT_BREAKER_ENABLED", "true").lower() == "true"
+CIRCUIT_BREAKER_WINDOW = int(os.getenv("CIRCUIT_BREAKER_WINDOW", "20"))
+CIRCUIT_BREAKER_MIN_CALLS = int(os.getenv("CIRCUIT_BREAKER_MIN_CALLS", "5"))
+CIRCUIT_BREAKER_FAILURE_RATE = float(os.getenv("CIRCUIT_BREAKER_FAILURE_RATE", "0.5"))
+# A call whose first token takes longer than this counts as a failure
+CIRCUIT_BREAKER_SLOW_CALL_SECONDS = float(os.getenv("CIRCUIT_BREAKER_SLOW_CALL_SECONDS", "60.0"))
+CIRCUIT_BREAKER_OPEN_SECONDS = float(os.getenv("CIRCUIT_BREAKER_OPEN_SECONDS", "30.0"))
+
+OLLAMA_HEDGING_ENABLED = os.getenv("OLLAMA_HEDGING_ENABLED", "false").lower() == "true"
+OLLAMA_HEDGE_PERCENTILE = float(os.getenv("OLLAMA_HEDGE_PERCENTILE", "0.95"))
+OLLAMA_HEDGE_MIN_DELAY = float(os.getenv("OLLAMA_HEDGE_MIN_DELAY", "1.0"))
+# Used until a model has enough first-token samples
+OLLAMA_HEDGE_DEFAULT_DELAY = float(os.getenv("OLLAMA_HEDGE_DEFAULT_DELAY", "10.0"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Number of recent first-token latencies kept per model
+_SAMPLE_WINDOW = 256
+_MIN_LATENCY_SAMPLES = 20
+
+
+class CircuitOpenError(OllamaOverloadedError):
+    """Raised when a model's circuit is open and the call is rejected without reaching Ollama."""
+
+    def __init__(self, model: str, retry_after: int):
+        super().__init__(f"Model {model} is unavailable (circuit open)", status_code=503, retry_after=retry_after)
+        self.model = model
+
+
+class CallTimer:
+    """Measures time to first token for one call."""
+
+    def __init__(self):
+        self.started: Optional[float] = None
+        self.first_token: Optional[float] = None
+
+    def start(self):
+        """Mark the moment the request is sent to Ollama."""
+        self.started = time.monotonic()
+
+    def mark_first_token(self):
+        """Mark the first byte of the response; later calls are ignored."""
+        if self.first_token is None:
+            self.first_token = time.monotonic()
+
+    def latency(self) -> Optional[float]:
+        if self.started is None:
+            return None
+        return (self.first_token or time.monotonic()) - self.started
+
+
+class _ModelBreaker:
+    """Circuit state and rolling call outcomes for one model."""
+
+    def __init__(self, window: int):
+        self.state = CLOSED
+        self.outcomes: Deque[bool] = deque(maxlen=window)  # True for a failed or slow call
+        self.first_token_latencies: Deque[float] = deque(maxlen=_SAMPLE_WINDOW)
+        self.opened_at = 0.0
+        self.probe_started: Optional[float] = None
+        self.calls = 0
+        self.failures = 0
+        self.slow_calls = 0
+        self.rejected = 0
+        self.opens = 0
+
+    def failure_rate(self) -> float:
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+
+class ModelCircuitBreakers:
+    """Per-model circuit breakers with first-token latency tracking."""
+
+    def __init__(self, enabled: bool = CIRCUIT_BREAKER_ENABLED,
+                 window: int = CIRCUIT_BREAKER_WINDOW,
+                 min_calls: int = CIRCUIT_BREAKER_MIN_CALLS,
+                 failure_rate: float = CIRCUIT_BREAKER_FAILURE_RATE,
+                 slow_call_seconds: float = CIRCUIT_BREAKER_SLOW_CALL_SECONDS,
+                 open_seconds: float = CIRCUIT_BREAKER_OPEN_SECONDS):
+        """
+        Initialize the breakers.
+
+        Args:
+            enabled (bool): When False calls are only measured, never rejected.
+            window (int): Number of recent calls the failure rate is computed over.
+            min_calls (int): Calls needed in the window before the circuit can open.
+            failure_rate (float): Fraction of failed or slow calls that opens the circuit.
+            slow_call_seconds (float): First-token latency above which a call counts as failed.
+            open_seconds (float): Cooldown before a half-open probe is allowed.
+        """
+        self.enabled = enabled
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self._breakers: Dict[str, _ModelBreaker] = {}
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _breaker_for(self, model: str) -> _ModelBreaker:
+        if model not in self._breakers:
+            self._breakers[model] = _ModelBreaker(self.window)
+        return self._breakers[model]
+
+    def _probe_pending(self, breaker: _ModelBreaker, now: float) -> bool:
+        # A probe that never reported back (e.g. cancelled) stops blocking after a cooldown
+        return breaker.probe_started is not None and (now - breaker.probe_started) < self.open_seconds
+
+    def is_available(self, model: str) -> bool:
+        """Whether a call to the model would be let through right now, without reserving it."""
+        if not self.enabled:
+            return True
+        breaker = self._breakers.get(model)
+        if breaker is None or breaker.state == CLOSED:
+            return True
+        now = time.monotonic()
+        if breaker.state == OPEN:
+            return (now - breaker.opened_at) >= self.open_seconds
+        return not self._probe_pending(breaker, now)
+
+    def _before_call(self, model: str, breaker: _ModelBreaker):
+        if not self.enabled or breaker.state == CLOSED:
+            return
+        now = time.monotonic()
+        if breaker.state == OPEN and (now - breaker.opened_at) >= self.open_seconds:
+            breaker.state = HALF_OPEN
+            breaker.probe_started = None
+        if breaker.state == OPEN or self._probe_pending(breaker, now):
+            breaker.rejected += 1
+            remaining = self.open_seconds - (now - (breaker.probe_started or breaker.opened_at))
+            raise CircuitOpenError(model, retry_after=max(1, math.ceil(remaining)))
+        breaker.probe_started = now
+
+    def _open(self, breaker: _ModelBreaker):
+        breaker.state = OPEN
+        breaker.opened_at = time.monotonic()
+        breaker.probe_started = None
+        breaker.opens += 1
+
+    def _record(self, breaker: _ModelBreaker, failed: bool):
+        breaker.calls += 1
+        breaker.outcomes.append(failed)
+        if failed:
+            breaker.failures += 1
+        if breaker.state == HALF_OPEN:
+            if failed:
+                self._open(breaker)
+            else:
+                breaker.state = CLOSED
+                breaker.probe_started = None
+                breaker.outcomes.clear()
+        elif (self.enabled and breaker.state == CLOSED and len(breaker.outcomes) >= self.min_calls
+              and breaker.failure_rate() >= self.failure_rate):
+            self._open(breaker)
+
+    def _release_probe(self, breaker: _ModelBreaker):
+        if breaker.state == HALF_OPEN:
+            breaker.probe_started = None
+
+    @asynccontextmanager
+    async def call(self, model: str) -> AsyncIterator[CallTimer]:
+        """
+        Guard one Ollama call to a model.
+
+        Transport errors, 5xx responses and in-stream errors count as failures, as does a
+        first token slower than slow_call_seconds. 4xx responses, local overload rejections
+        and cancellations are not held against the model.
+
+        Raises:
+            CircuitOpenError: If the model's circuit is open.
+        """
+        breaker = self._breaker_for(model)
+        self._before_call(model, breaker)
+        timer = CallTimer()
+        try:
+            yield timer
+        except (OllamaOverloadedError, asyncio.CancelledError):
+            self._release_probe(breaker)
+            raise
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code >= 500:
+                self._record(breaker, True)
+            else:
+                self._release_probe(breaker)
+            raise
+        except Exception:
+            self._record(breaker, True)
+            raise
+        else:
+            latency = timer.latency()
+            slow = latency is not None and latency > self.slow_call_seconds
+            if latency is not None:
+                breaker.first_token_latencies.append(latency)
+            if slow:
+                breaker.slow_calls += 1
+            self._record(breaker, slow)
+
+    def first_token_percentile(self, model: str, percentile: float) -> Optional[float]:
+        """Percentile of recent first-token latencies, or None without enough samples."""
+        breaker = self._breakers.get(model)
+        if breaker is None or len(breaker.first_token_latencies) < _MIN_LATENCY_SAMPLES:
+            return None
+        latencies = sorted(breaker.first_token_latencies)
+        return latencies[min(len(latencies) - 1, int(percentile * len(latencies)))]
+
+    def hedge_delay(self, model: str) -> float:
+        """Seconds to wait for the model's first token before firing a hedged request."""
+        observed = self.first_token_percentile(model, OLLAMA_HEDGE_PERCENTILE)
+        if observed is None:
+            return OLLAMA_HEDGE_DEFAULT_DELAY
+        return max(OLLAMA_HEDGE_MIN_DELAY, observed)
+
+    def record_hedge(self, hedge_won: bool):
+        """Count a fired hedge and whether the hedged request answered first."""
+        self.hedges += 1
+        if hedge_won:
+            self.hedge_wins += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get circuit state and latency per model."""
+        models = {}
+        for model, breaker in self._breakers.items():
+            p50 = self.first_token_percentile(model, 0.5)
+            p95 = self.first_token_percentile(model, 0.95)
+            models[model] = {
+                "state": breaker.state,
+                "failure_rate": round(breaker.failure_rate(), 3),
+                "calls": breaker.calls,
+                "failures": breaker.failures,
+                "slow_calls": breaker.slow_calls,
+                "rejected": breaker.rejected,
+                "opens": breaker.opens,
+                "p50_first_token_seconds": round(p50, 3) if p50 is not None else None,
+                "p95_first_token_seconds": round(p95, 3) if p95 is not None else None,
+            }
+        return {
+            "enabled": self.enabled,
+            "hedging_enabled": OLLAMA_HEDGING_ENABLED,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "models": models,
+        }
+
+
+# Global instance consulted by model selection and every Ollama inference call
+circuit_breakers = ModelCircuitBreakers()
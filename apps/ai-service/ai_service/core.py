@@ -6,12 +6,25 @@ including integration with Ollama and OpenAI. Enhanced with multiple model suppo
 for improved conversational AI and multi-modal capabilities.
 """
 
+import asyncio
 import json
 import os
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple, Union
 
 import httpx
 
+from ai_service.admission import admission_controller, OllamaOverloadedError
+from ai_service.circuit_breaker import circuit_breakers, CircuitOpenError, OLLAMA_HEDGING_ENABLED
+from ai_service.model_registry import ModelRegistry
+from ai_service.model_residency import ModelResidencyManager, OLLAMA_KEEP_ALIVE
+from ai_service.model_scheduler import model_scheduler
+from ai_service.prompt_assembly import prompt_assembler
+from ai_service.ollama_backends import backend_pool
+from ai_service.response_cache import response_cache, make_cache_key, should_cache
+from ai_service.sessions import Session, session_store, render_transcript
+from ai_service.single_flight import single_flight, make_flight_key
+from ai_service.vision_preprocessing import vision_preprocessor
+
 # Configuration
 AI_PROVIDER = os.getenv("AI_PROVIDER", "ollama")  # Default to ollama
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
@@ -36,92 +49,435 @@ MODEL_CONFIG = {
 # Legacy support
 OLLAMA_MODEL_NAME = os.getenv("OLLAMA_MODEL_NAME", MODEL_CONFIG["multimodal"]["fallback"])
 
+# Shared HTTP client pool configuration
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "100"))
+OLLAMA_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OLLAMA_MAX_KEEPALIVE_CONNECTIONS", "20"))
+OLLAMA_KEEPALIVE_EXPIRY = float(os.getenv("OLLAMA_KEEPALIVE_EXPIRY", "30.0"))
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "10.0"))
+
+# Per-route read timeouts (seconds)
+OLLAMA_TIMEOUTS = {
+    "chat": float(os.getenv("OLLAMA_CHAT_TIMEOUT", "300.0")),
+    "generate": float(os.getenv("OLLAMA_GENERATE_TIMEOUT", "300.0")),
+    "tags": float(os.getenv("OLLAMA_TAGS_TIMEOUT", "10.0")),
+}
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Create a pooled HTTP client configured for Ollama traffic.
+
+    Returns:
+        httpx.AsyncClient: A client with keep-alive connection pooling.
+    """
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=OLLAMA_MAX_CONNECTIONS,
+            max_keepalive_connections=OLLAMA_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=OLLAMA_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(OLLAMA_TIMEOUTS["chat"], connect=OLLAMA_CONNECT_TIMEOUT),
+    )
+
+
+async def init_http_client() -> httpx.AsyncClient:
+    """Create the shared HTTP client. Called from the FastAPI startup event."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = create_http_client()
+    return _http_client
+
+
+async def close_http_client():
+    """Close the shared HTTP client. Called from the FastAPI shutdown event."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Get the shared HTTP client, creating it lazily when used outside the app
+    lifecycle (scripts, tests).
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = create_http_client()
+    return _http_client
+
+
+def _route_timeout(route: str) -> httpx.Timeout:
+    """Build the timeout for an Ollama route ('chat', 'generate', 'tags')."""
+    return httpx.Timeout(OLLAMA_TIMEOUTS[route], connect=OLLAMA_CONNECT_TIMEOUT)
+
+
+def _collect_stream_text(response: httpx.Response, route: str) -> str:
+    """
+    Concatenate the text deltas of a buffered Ollama NDJSON response.
+
+    Args:
+        response (httpx.Response): The response from /api/chat or /api/generate.
+        route (str): 'chat' or 'generate', which decides where the text lives.
+
+    Returns:
+        str: The full response text.
+    """
+    full_response = ""
+    for line in response.iter_lines():
+        if line:
+            try:
+                json_data = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Skip lines that are not valid JSON
+            if route == "chat":
+                if "message" in json_data and "content" in json_data["message"]:
+                    full_response += json_data["message"]["content"]
+            elif "response" in json_data:
+                full_response += json_data["response"]
+    return full_response
+
+
+async def _post_ollama(client: httpx.AsyncClient, route: str, payload: Dict[str, Any],
+                       session_id: Optional[str] = None, priority: bool = False) -> httpx.Response:
+    """
+    POST to an Ollama inference route once the model's admission controller lets it through
+    and the chosen host's model scheduler has started the model's batch.
+
+    Args:
+        client (httpx.AsyncClient): HTTP client to use.
+        route (str): 'chat' or 'generate'.
+        payload (Dict[str, Any]): Request body; its "model" selects the admission queue and backend.
+        session_id (Optional[str]): Session key that pins the request to one backend node.
+        priority (bool): Skip the model scheduler's queue (hedged and fallback calls).
+
+    Returns:
+        httpx.Response: The buffered response.
+
+    Raises:
+        OllamaOverloadedError: If the model's queue is full, the wait deadline passes or
+            the model's circuit is open.
+    """
+    model = payload["model"]
+    async with circuit_breakers.call(model) as timer, \
+            admission_controller.slot(model), \
+            backend_pool.lease(model, session_id) as node, \
+            model_scheduler.slot(model, node.url, priority):
+        timer.start()
+        async with client.stream(
+            "POST",
+            f"{node.url}/api/{route}",
+            json={"keep_alive": OLLAMA_KEEP_ALIVE, **payload},
+            timeout=_route_timeout(route),
+        ) as response:
+            # Ollama sends headers with the first generated chunk
+            timer.mark_first_token()
+            await response.aread()
+            response.raise_for_status()
+    model_residency.record_use(model)
+    return response
+
+
+# Ollama's final-chunk statistics forwarded to streaming clients
+STREAM_STAT_FIELDS = (
+    "total_duration", "load_duration", "prompt_eval_count",
+    "prompt_eval_duration", "eval_count", "eval_duration",
+)
+
+
+async def _stream_ollama(client: httpx.AsyncClient, route: str, payload: Dict[str, Any],
+                         session_id: Optional[str] = None, priority: bool = False) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Stream the NDJSON chunks of an Ollama inference call through the same admission,
+    routing and scheduling as _post_ollama.
+
+    Args:
+        client (httpx.AsyncClient): HTTP client to use.
+        route (str): 'chat' or 'generate'.
+        payload (Dict[str, Any]): Request body; streaming and keep_alive are added.
+        session_id (Optional[str]): Session key that pins the request to one backend node.
+        priority (bool): Skip the model scheduler's queue (hedged and fallback calls).
+
+    Yields:
+        Dict[str, Any]: Each decoded chunk, up to and including the one with ``done``.
+    """
+    model = payload["model"]
+    async with circuit_breakers.call(model) as timer, \
+            admission_controller.slot(model), \
+            backend_pool.lease(model, session_id) as node, \
+            model_scheduler.slot(model, node.url, priority):
+        timer.start()
+        async with client.stream(
+            "POST",
+            f"{node.url}/api/{route}",
+            json={**payload, "stream": True, "keep_alive": OLLAMA_KEEP_ALIVE},
+            timeout=_route_timeout(route),
+        ) as response:
+            timer.mark_first_token()
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                try:
+                    json_data = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if "error" in json_data:
+                    raise Exception(json_data["error"])
+                if json_data.get("done"):
+                    model_residency.record_use(model)
+                    yield json_data
+                    return
+                yield json_data
+
+
+async def stream_chat_with_ollama(messages: List[Dict[str, Any]], model: Optional[str] = None,
+                                  options: Dict[str, Any] = {},
+                                  client: Optional[httpx.AsyncClient] = None,
+                                  session_id: Optional[str] = None,
+                                  priority: bool = False) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Stream a chat completion from Ollama as it is generated.
+
+    Args:
+        messages (List[Dict[str, Any]]): The messages to send to Ollama.
+        model (Optional[str]): The model to use. Defaults to OLLAMA_MODEL_NAME.
+        options (Dict[str, Any], optional): Options for the chat. Defaults to {}.
+        client (Optional[httpx.AsyncClient]): HTTP client to use. Defaults to the shared client.
+        session_id (Optional[str]): Session key that pins the request to one backend node.
+        priority (bool): Skip the model scheduler's queue (hedged and fallback calls).
+
+    Yields:
+        Dict[str, Any]: ``{"type": "delta", "content": ...}`` for each token chunk, then a single
+        ``{"type": "done", ...}`` carrying Ollama's eval statistics.
+    """
+    client = client or get_http_client()
+    model_name = model or OLLAMA_MODEL_NAME
+    ollama_messages = [
+        {"role": msg["role"], "content": msg["content"]}
+        for msg in messages
+    ]
+    try:
+        async for json_data in _stream_ollama(client, "chat", {
+            "model": model_name,
+            "messages": ollama_messages,
+            "options": options,
+        }, session_id, priority):
+            content = json_data.get("message", {}).get("content", "")
+            if content:
+                yield {"type": "delta", "content": content}
+            if json_data.get("done"):
+                stats = {field: json_data[field] for field in STREAM_STAT_FIELDS if field in json_data}
+                yield {"type": "done", "model": model_name, **stats}
+    except OllamaOverloadedError:
+        raise
+    except Exception as e:
+        if _is_model_not_found(e):
+            model_registry.invalidate()
+        raise Exception(f"Ollama streaming chat error with model {model_name}: {str(e)}")
+
 
-async def analyze_image_with_ollama(prompt: str, image_base64: str) -> str:
+async def stream_generate_with_ollama(prompt: str, model: Optional[str] = None,
+                                      system: Optional[str] = None,
+                                      context: Optional[List[int]] = None,
+                                      options: Dict[str, Any] = {},
+                                      client: Optional[httpx.AsyncClient] = None,
+                                      session_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Stream a completion from Ollama's /api/generate, optionally continuing an earlier one.
+
+    Args:
+        prompt (str): The new prompt.
+        model (Optional[str]): The model to use. Defaults to OLLAMA_MODEL_NAME.
+        system (Optional[str]): System prompt; leave unset when continuing from a context.
+        context (Optional[List[int]]): The ``context`` returned by a previous generate call,
+            so the earlier exchange is not evaluated again.
+        options (Dict[str, Any], optional): Options for the generation. Defaults to {}.
+        client (Optional[httpx.AsyncClient]): HTTP client to use. Defaults to the shared client.
+        session_id (Optional[str]): Session key that pins the request to one backend node.
+
+    Yields:
+        Dict[str, Any]: ``{"type": "delta", "content": ...}`` for each token chunk, then a single
+        ``{"type": "done", ...}`` carrying Ollama's eval statistics and the new ``context``.
+    """
+    client = client or get_http_client()
+    model_name = model or OLLAMA_MODEL_NAME
+    payload: Dict[str, Any] = {"model": model_name, "prompt": prompt, "options": options}
+    if system:
+        payload["system"] = system
+    if context:
+        payload["context"] = list(context)
+    try:
+        async for json_data in _stream_ollama(client, "generate", payload, session_id):
+            content = json_data.get("response", "")
+            if content:
+                yield {"type": "delta", "content": content}
+            if json_data.get("done"):
+                stats = {field: json_data[field] for field in STREAM_STAT_FIELDS if field in json_data}
+                yield {"type": "done", "model": model_name, "context": json_data.get("context"), **stats}
+    except OllamaOverloadedError:
+        raise
+    except Exception as e:
+        if _is_model_not_found(e):
+            model_registry.invalidate()
+        raise Exception(f"Ollama streaming generate error with model {model_name}: {str(e)}")
+
+
+def _task_options(task_type: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply the sampling options tuned for a task type on top of caller options."""
+    enhanced_options = options.copy()
+    if task_type == "reasoning":
+        enhanced_options.update({"temperature": 0.1, "top_p": 0.9})
+    elif task_type == "conversation":
+        enhanced_options.update({"temperature": 0.7, "top_p": 0.9})
+    return enhanced_options
+
+
+async def analyze_image_with_ollama(prompt: str, image_base64: Union[str, bytes],
+                                    client: Optional[httpx.AsyncClient] = None) -> str:
     """
     Analyze an image using Ollama.
 
     Args:
         prompt (str): The prompt to send to Ollama.
-        image_base64 (str): The base64-encoded image.
+        image_base64 (Union[str, bytes]): The base64-encoded image, or its raw bytes.
+        client (Optional[httpx.AsyncClient]): HTTP client to use. Defaults to the shared client.
 
     Returns:
         str: The analysis result.
     """
+    client = client or get_http_client()
+
+    async def generate() -> str:
+        response = await _post_ollama(client, "generate", {
+            "model": OLLAMA_MODEL_NAME,
+            "prompt": prompt,
+            "images": [image_base64]
+        })
+        # Ollama's /api/generate returns a stream of JSON objects, we need to parse them
+        return _collect_stream_text(response, "generate")
+
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{OLLAMA_BASE_URL}/api/generate",
-                json={
-                    "model": OLLAMA_MODEL_NAME,
-                    "prompt": prompt,
-                    "images": [image_base64]
-                },
-                timeout=300.0,  # Increased timeout for potential large models
-            )
-            response.raise_for_status()
-            # Ollama's /api/generate returns a stream of JSON objects, we need to parse them
-            full_response = ""
-            for line in response.iter_lines():
-                if line:
-                    try:
-                        json_data = json.loads(line)
-                        if "response" in json_data:
-                            full_response += json_data["response"]
-                    except json.JSONDecodeError:
-                        continue  # Skip lines that are not valid JSON
-            return full_response
+        # Downsize to the model's input resolution before hashing and sending it
+        image_base64 = await vision_preprocessor.prepare(image_base64, OLLAMA_MODEL_NAME)
+        # Identical concurrent analyses (retries, same upload) share one Ollama call
+        flight_key = make_flight_key("generate", OLLAMA_MODEL_NAME, prompt, image_base64)
+        return await single_flight.do(flight_key, generate)
+    except OllamaOverloadedError:
+        raise
     except Exception as e:
         raise Exception(f"Ollama image analysis error: {str(e)}")
 
 
-async def chat_with_ollama(messages: List[Dict[str, Any]], options: Dict[str, Any] = {}) -> str:
+async def chat_with_ollama(messages: List[Dict[str, Any]], options: Dict[str, Any] = {},
+                           client: Optional[httpx.AsyncClient] = None,
+                           use_cache: Optional[bool] = None) -> str:
     """
     Chat with Ollama.
 
     Args:
         messages (List[Dict[str, Any]]): The messages to send to Ollama.
         options (Dict[str, Any], optional): Options for the chat. Defaults to {}.
+        client (Optional[httpx.AsyncClient]): HTTP client to use. Defaults to the shared client.
+        use_cache (Optional[bool]): Response cache override. None caches deterministic requests only.
 
     Returns:
         str: The chat response.
     """
+    client = client or get_http_client()
+    # Ollama chat endpoint structure
+    ollama_messages = [
+        {"role": msg["role"], "content": msg["content"]}
+        for msg in messages
+    ]
+
+    cache_key = None
+    if should_cache(options, use_cache):
+        cache_key = make_cache_key("chat", OLLAMA_MODEL_NAME, ollama_messages, options)
+        cached = await response_cache.aget(cache_key)
+        if cached is not None:
+            return cached
+
     try:
-        async with httpx.AsyncClient() as client:
-            # Ollama chat endpoint structure
-            ollama_messages = [
-                {"role": msg["role"], "content": msg["content"]}
-                for msg in messages
-            ]
-            response = await client.post(
-                f"{OLLAMA_BASE_URL}/api/chat",
-                json={
-                    "model": OLLAMA_MODEL_NAME,
-                    "messages": ollama_messages,
-                    "options": options  # Pass along any options
-                },
-                timeout=300.0,
-            )
-        response.raise_for_status()
+        response = await _post_ollama(client, "chat", {
+            "model": OLLAMA_MODEL_NAME,
+            "messages": ollama_messages,
+            "options": options  # Pass along any options
+        })
         # Ollama /api/chat also returns a stream of JSON objects
-        full_response_content = ""
-        for line in response.iter_lines():
-            if line:
-                try:
-                    json_data = json.loads(line)
-                    if "message" in json_data and "content" in json_data["message"]:
-                        full_response_content += json_data["message"]["content"]
-                except json.JSONDecodeError:
-                    continue
-        return full_response_content
+        response_content = _collect_stream_text(response, "chat")
+    except OllamaOverloadedError:
+        raise
     except Exception as e:
         raise Exception(f"Ollama chat error: {str(e)}")
 
+    if cache_key is not None:
+        await response_cache.aset(cache_key, response_content)
+    return response_content
+
+
+async def _fetch_installed_models() -> List[str]:
+    """Fetch the names of the models installed on any healthy Ollama node."""
+    await backend_pool.check_health(get_http_client())
+    if not any(node.healthy for node in backend_pool.nodes):
+        raise ConnectionError("No healthy Ollama backend")
+    return sorted(backend_pool.available_models())
+
+
+# Cached view of installed models, shared by all model selection
+model_registry = ModelRegistry(_fetch_installed_models)
+
+
+async def warm_model(model: str):
+    """
+    Load a model on every healthy Ollama node that has it, using an empty generate.
+
+    Args:
+        model (str): The model to load.
+
+    Raises:
+        Exception: If no node can serve the model or a node rejects the load.
+    """
+    client = get_http_client()
+    nodes = [node for node in backend_pool.nodes if node.healthy and node.has_model(model)]
+    if not nodes:
+        raise Exception(f"No healthy Ollama backend has model {model}")
+    responses = await asyncio.gather(*(
+        client.post(
+            f"{node.url}/api/generate",
+            json={"model": model, "prompt": "", "keep_alive": OLLAMA_KEEP_ALIVE, "stream": False},
+            timeout=_route_timeout("generate"),
+        )
+        for node in nodes
+    ))
+    for response in responses:
+        response.raise_for_status()
+
+
+# Keeps the primary model for each task loaded on Ollama
+model_residency = ModelResidencyManager(
+    warm_model,
+    [config["primary"] for config in MODEL_CONFIG.values()],
+    is_reachable=lambda: any(node.healthy for node in backend_pool.nodes),
+)
+
+
+def _is_model_not_found(error: Exception) -> bool:
+    """Check whether an Ollama error means the requested model is not installed."""
+    return (
+        isinstance(error, httpx.HTTPStatusError)
+        and error.response.status_code == 404
+    )
+
 
 async def get_best_model_for_task(task_type: str) -> str:
     """
     Get the best available model for a specific task type.
 
+    The primary model is skipped while it is not installed or its circuit is open.
+
     Args:
         task_type (str): The type of task ('conversation', 'multimodal', 'reasoning')
 
@@ -135,24 +491,19 @@ async def get_best_model_for_task(task_type: str) -> str:
     primary_model = MODEL_CONFIG[task_type]["primary"]
     fallback_model = MODEL_CONFIG[task_type]["fallback"]
 
-    try:
-        # Check if primary model is available
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{OLLAMA_BASE_URL}/api/tags", timeout=10.0)
-            if response.status_code == 200:
-                available_models = [model["name"] for model in response.json().get("models", [])]
-                if primary_model in available_models:
-                    return primary_model
-                elif fallback_model in available_models:
-                    return fallback_model
-    except Exception:
-        pass  # Fall through to return fallback
+    available_models = await model_registry.get_models()
+    if (available_models is not None and primary_model in available_models
+            and circuit_breakers.is_available(primary_model)):
+        return primary_model
 
     return fallback_model
 
 
 async def enhanced_chat_with_context(messages: List[Dict[str, Any]], task_type: str = "conversation", 
-                                   options: Dict[str, Any] = {}) -> str:
+                                   options: Dict[str, Any] = {},
+                                   client: Optional[httpx.AsyncClient] = None,
+                                   use_cache: Optional[bool] = None,
+                                   session_id: Optional[str] = None) -> str:
     """
     Enhanced chat function that selects the best model based on task type.
 
@@ -160,133 +511,362 @@ async def enhanced_chat_with_context(messages: List[Dict[str, Any]], task_type:
         messages (List[Dict[str, Any]]): The messages to send
         task_type (str): The type of task to optimize for
         options (Dict[str, Any], optional): Options for the chat
+        client (Optional[httpx.AsyncClient]): HTTP client to use. Defaults to the shared client.
+        use_cache (Optional[bool]): Response cache override. None caches deterministic requests only.
+        session_id (Optional[str]): Session key that pins the request to one backend node.
 
     Returns:
         str: The chat response
     """
+    response_content, _ = await enhanced_chat_with_model(messages, task_type, options, client, use_cache, session_id)
+    return response_content
+
+
+async def enhanced_chat_with_model(messages: List[Dict[str, Any]], task_type: str = "conversation",
+                                   options: Dict[str, Any] = {},
+                                   client: Optional[httpx.AsyncClient] = None,
+                                   use_cache: Optional[bool] = None,
+                                   session_id: Optional[str] = None) -> Tuple[str, str]:
+    """
+    Enhanced chat that also reports which model produced the answer.
+
+    Args:
+        messages (List[Dict[str, Any]]): The messages to send
+        task_type (str): The type of task to optimize for
+        options (Dict[str, Any], optional): Options for the chat
+        client (Optional[httpx.AsyncClient]): HTTP client to use. Defaults to the shared client.
+        use_cache (Optional[bool]): Response cache override. None caches deterministic requests only.
+        session_id (Optional[str]): Session key that pins the request to one backend node.
+
+    Returns:
+        Tuple[str, str]: The chat response and the model name used
+    """
+    client = client or get_http_client()
     model_name = await get_best_model_for_task(task_type)
 
+    ollama_messages = [
+        {"role": msg["role"], "content": msg["content"]}
+        for msg in messages
+    ]
+
+    # Enhanced options based on task type
+    enhanced_options = _task_options(task_type, options)
+
+    cache_key = None
+    if should_cache(enhanced_options, use_cache):
+        cache_key = make_cache_key("chat", model_name, ollama_messages, enhanced_options)
+        cached = await response_cache.aget(cache_key)
+        if cached is not None:
+            return cached, model_name
+
+    fallback_model = MODEL_CONFIG[task_type]["fallback"] if task_type in MODEL_CONFIG else None
+    if fallback_model == model_name or (fallback_model and not circuit_breakers.is_available(fallback_model)):
+        fallback_model = None
+
     try:
-        async with httpx.AsyncClient() as client:
-            ollama_messages = [
-                {"role": msg["role"], "content": msg["content"]}
-                for msg in messages
-            ]
-
-            # Enhanced options based on task type
-            enhanced_options = options.copy()
-            if task_type == "reasoning":
-                enhanced_options.update({"temperature": 0.1, "top_p": 0.9})
-            elif task_type == "conversation":
-                enhanced_options.update({"temperature": 0.7, "top_p": 0.9})
-
-            response = await client.post(
-                f"{OLLAMA_BASE_URL}/api/chat",
-                json={
-                    "model": model_name,
-                    "messages": ollama_messages,
-                    "options": enhanced_options
-                },
-                timeout=300.0,
+        if OLLAMA_HEDGING_ENABLED and fallback_model:
+            response_content, model_used = await _hedged_chat(
+                model_name, fallback_model, ollama_messages, enhanced_options, client, session_id
             )
-            response.raise_for_status()
-
-            full_response_content = ""
-            for line in response.iter_lines():
-                if line:
-                    try:
-                        json_data = json.loads(line)
-                        if "message" in json_data and "content" in json_data["message"]:
-                            full_response_content += json_data["message"]["content"]
-                    except json.JSONDecodeError:
-                        continue
-            return full_response_content
+        else:
+            try:
+                response_content = await _chat_once(model_name, ollama_messages, enhanced_options, client, session_id)
+                model_used = model_name
+            except OllamaOverloadedError as e:
+                # A full queue is reported to the caller; an open circuit moves on to the fallback
+                if not (isinstance(e, CircuitOpenError) and fallback_model):
+                    raise
+                response_content = await _chat_once(fallback_model, ollama_messages, enhanced_options, client,
+                                                    session_id, priority=True)
+                model_used = fallback_model
+            except Exception:
+                if not fallback_model:
+                    raise
+                response_content = await _chat_once(fallback_model, ollama_messages, enhanced_options, client,
+                                                    session_id, priority=True)
+                model_used = fallback_model
+    except OllamaOverloadedError:
+        raise
     except Exception as e:
         raise Exception(f"Enhanced chat error with model {model_name}: {str(e)}")
 
+    if cache_key is not None and model_used == model_name:
+        await response_cache.aset(cache_key, response_content)
+    return response_content, model_used
+
+
+async def _chat_once(model: str, ollama_messages: List[Dict[str, Any]], options: Dict[str, Any],
+                     client: httpx.AsyncClient, session_id: Optional[str], priority: bool = False) -> str:
+    """Run one buffered chat completion against a single model."""
+    try:
+        response = await _post_ollama(client, "chat", {
+            "model": model,
+            "messages": ollama_messages,
+            "options": options
+        }, session_id=session_id, priority=priority)
+    except Exception as e:
+        if _is_model_not_found(e):
+            model_registry.invalidate()
+        raise
+    return _collect_stream_text(response, "chat")
+
+
+async def _stream_chat_text(model: str, ollama_messages: List[Dict[str, Any]], options: Dict[str, Any],
+                            client: httpx.AsyncClient, session_id: Optional[str],
+                            first_token: asyncio.Event, priority: bool = False) -> str:
+    """Run one streamed chat completion, setting first_token when the first delta arrives."""
+    parts = []
+    async for event in stream_chat_with_ollama(ollama_messages, model, options, client, session_id, priority):
+        if event["type"] == "delta":
+            first_token.set()
+            parts.append(event["content"])
+    return "".join(parts)
+
+
+async def _hedged_chat(primary_model: str, fallback_model: str, ollama_messages: List[Dict[str, Any]],
+                       options: Dict[str, Any], client: httpx.AsyncClient,
+                       session_id: Optional[str]) -> Tuple[str, str]:
+    """
+    Chat with the primary model, firing the fallback if the primary is slow to start.
+
+    If the primary has not produced its first token within its p95 first-token latency,
+    the same request is sent to the fallback model. Whichever finishes first wins and the
+    other request is cancelled. If one of them fails, the other's answer is used. Fallback
+    calls skip the model scheduler's queue, where they would wait for the slow primary.
+
+    Returns:
+        Tuple[str, str]: The response and the model that produced it.
+    """
+    primary_token = asyncio.Event()
+    primary = asyncio.create_task(
+        _stream_chat_text(primary_model, ollama_messages, options, client, session_id, primary_token)
+    )
+    tasks = {primary: primary_model}
+    try:
+        first_token = asyncio.create_task(primary_token.wait())
+        await asyncio.wait({primary, first_token}, timeout=circuit_breakers.hedge_delay(primary_model),
+                           return_when=asyncio.FIRST_COMPLETED)
+        first_token.cancel()
+
+        if primary_token.is_set() or primary.done():
+            try:
+                return await primary, primary_model
+            except OllamaOverloadedError as e:
+                if not isinstance(e, CircuitOpenError):
+                    raise
+            except Exception:
+                pass
+            return await _chat_once(fallback_model, ollama_messages, options, client, session_id,
+                                    priority=True), fallback_model
+
+        hedge = asyncio.create_task(
+            _stream_chat_text(fallback_model, ollama_messages, options, client, session_id, asyncio.Event(),
+                              priority=True)
+        )
+        tasks[hedge] = fallback_model
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    circuit_breakers.record_hedge(hedge_won=task is hedge)
+                    return task.result(), tasks[task]
+                error = task.exception()
+        circuit_breakers.record_hedge(hedge_won=False)
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+async def stream_enhanced_chat_with_context(messages: List[Dict[str, Any]], task_type: str = "conversation",
+                                            options: Dict[str, Any] = {},
+                                            client: Optional[httpx.AsyncClient] = None,
+                                            session_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming variant of enhanced_chat_with_context.
+
+    Args:
+        messages (List[Dict[str, Any]]): The messages to send
+        task_type (str): The type of task to optimize for
+        options (Dict[str, Any], optional): Options for the chat
+        client (Optional[httpx.AsyncClient]): HTTP client to use. Defaults to the shared client.
+        session_id (Optional[str]): Session key that pins the request to one backend node.
+
+    Yields:
+        Dict[str, Any]: A ``{"type": "start", "model": ...}`` event, then the events of
+        stream_chat_with_ollama.
+    """
+    client = client or get_http_client()
+    model_name = await get_best_model_for_task(task_type)
+    yield {"type": "start", "model": model_name}
+    async for event in stream_chat_with_ollama(messages, model_name, _task_options(task_type, options), client,
+                                               session_id):
+        yield event
+
+
+def _session_prompt(session: Session, content: str, model: str) -> Tuple[str, Optional[str], Optional[List[int]], int]:
+    """
+    Build the generate request for the next turn of a session.
+
+    The stored Ollama context is reused when it came from the same model and the new
+    turn still fits the token budget with it. Otherwise the history is re-sent as a
+    transcript, fitted to the budget by the prompt assembler.
 
-async def analyze_image_with_enhanced_multimodal(prompt: str, image_base64: str, 
-                                                analysis_type: str = "blueprint") -> str:
+    Returns:
+        Tuple[str, Optional[str], Optional[List[int]], int]: Prompt, system prompt,
+        context and the number of tokens dropped to fit the budget.
+    """
+    if session.context and session.context_model == model:
+        needed = len(session.context) + prompt_assembler.count_message({"content": content}, model)
+        if needed <= prompt_assembler.budget_for(model):
+            return content, None, list(session.context), 0
+
+    assembly = prompt_assembler.assemble(session.messages + [{"role": "user", "content": content}], model,
+                                         instructions=session.system)
+    system_messages = [message["content"] for message in assembly.messages if message["role"] == "system"]
+    turns = [message for message in assembly.messages if message["role"] != "system"]
+    return render_transcript(turns), "\n\n".join(system_messages) or None, None, assembly.tokens_dropped
+
+
+async def stream_session_reply(session: Session, content: str,
+                               client: Optional[httpx.AsyncClient] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Answer the next user turn of a server-side session.
+
+    The exchange and Ollama's returned context are stored once the reply completes,
+    so a failed or abandoned turn leaves the session unchanged.
+
+    Args:
+        session (Session): The session from session_store.
+        content (str): The new user message.
+        client (Optional[httpx.AsyncClient]): HTTP client to use. Defaults to the shared client.
+
+    Yields:
+        Dict[str, Any]: A ``{"type": "start", "model", "tokens_dropped", "context_reused"}`` event,
+        then the delta events and a ``done`` event with Ollama's eval statistics.
+    """
+    client = client or get_http_client()
+    async with session.lock:
+        model_name = await get_best_model_for_task(session.task_type)
+        prompt, system, context, tokens_dropped = _session_prompt(session, content, model_name)
+        yield {"type": "start", "model": model_name, "tokens_dropped": tokens_dropped,
+               "context_reused": context is not None}
+        reply = ""
+        async for event in stream_generate_with_ollama(prompt, model_name, system, context,
+                                                       _task_options(session.task_type, {}), client, session.id):
+            if event["type"] == "delta":
+                reply += event["content"]
+                yield event
+            else:
+                await session_store.add_turn(session, content, reply, model_name, event.pop("context", None))
+                yield event
+
+
+async def analyze_image_with_enhanced_multimodal(prompt: str, image_base64: Union[str, bytes],
+                                                analysis_type: str = "blueprint",
+                                                client: Optional[httpx.AsyncClient] = None,
+                                                model_name: Optional[str] = None) -> str:
     """
     Enhanced image analysis using the best available multimodal model.
 
     Args:
         prompt (str): The prompt to send
-        image_base64 (str): The base64-encoded image
+        image_base64 (Union[str, bytes]): The base64-encoded image, or its raw bytes
         analysis_type (str): Type of analysis ('blueprint', 'general', 'technical')
+        client (Optional[httpx.AsyncClient]): HTTP client to use. Defaults to the shared client.
+        model_name (Optional[str]): Model to use. Defaults to the best available multimodal model.
 
     Returns:
         str: The analysis result
     """
-    model_name = await get_best_model_for_task("multimodal")
+    client = client or get_http_client()
+    model_name = model_name or await get_best_model_for_task("multimodal")
 
     # Enhanced prompts based on analysis type
     enhanced_prompts = {
-        "blueprint": f"As a deck design expert, analyze this blueprint image. {prompt} Focus on dimensions, structural elements, and construction details.",
-        "technical": f"Provide a technical analysis of this image. {prompt} Include measurements, materials, and engineering considerations.",
+        # Fixed instructions lead so the request-specific prompt only changes the tail
+        "blueprint": f"As a deck design expert, analyze this blueprint image. Focus on dimensions, structural elements, and construction details. {prompt}",
+        "technical": f"Provide a technical analysis of this image. Include measurements, materials, and engineering considerations. {prompt}",
         "general": prompt
     }
 
     final_prompt = enhanced_prompts.get(analysis_type, prompt)
+    generate_options = {
+        "temperature": 0.2,  # Lower temperature for more precise analysis
+        "top_p": 0.9
+    }
 
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{OLLAMA_BASE_URL}/api/generate",
-                json={
-                    "model": model_name,
-                    "prompt": final_prompt,
-                    "images": [image_base64],
-                    "options": {
-                        "temperature": 0.2,  # Lower temperature for more precise analysis
-                        "top_p": 0.9
-                    }
-                },
-                timeout=300.0,
-            )
-            response.raise_for_status()
+    async def generate() -> str:
+        response = await _post_ollama(client, "generate", {
+            "model": model_name,
+            "prompt": final_prompt,
+            "images": [image_base64],
+            "options": generate_options
+        })
+
+        return _collect_stream_text(response, "generate")
 
-            full_response = ""
-            for line in response.iter_lines():
-                if line:
-                    try:
-                        json_data = json.loads(line)
-                        if "response" in json_data:
-                            full_response += json_data["response"]
-                    except json.JSONDecodeError:
-                        continue
-            return full_response
+    try:
+        image_base64 = await vision_preprocessor.prepare(image_base64, model_name)
+        flight_key = make_flight_key("generate", model_name, final_prompt, image_base64, generate_options)
+        return await single_flight.do(flight_key, generate)
+    except OllamaOverloadedError:
+        raise
     except Exception as e:
+        if _is_model_not_found(e):
+            model_registry.invalidate()
         raise Exception(f"Enhanced multimodal analysis error with model {model_name}: {str(e)}")
 
 
-async def process_deck_design_query(query: str, context: Optional[Dict[str, Any]] = None) -> str:
+# System prompt for deck design queries; kept byte-identical across requests
+DECK_DESIGN_SYSTEM_PROMPT = """You are DeckChatbot AI, an expert in deck design and construction. 
+    You help sales professionals by analyzing blueprints, calculating materials, and providing 
+    technical guidance. Always provide clear, actionable advice with specific measurements 
+    and material recommendations when possible."""
+
+
+async def process_deck_design_query(query: str, context: Optional[Dict[str, Any]] = None,
+                                    use_cache: Optional[bool] = None) -> str:
     """
     Process deck design queries using reasoning-optimized models.
 
     Args:
         query (str): The deck design query
         context (Optional[Dict[str, Any]]): Additional context (measurements, materials, etc.)
+        use_cache (Optional[bool]): Response cache override. Reasoning queries are cached by default.
 
     Returns:
         str: The processed response
     """
-    messages = []
+    response, _ = await process_deck_design_query_with_model(query, context, use_cache)
+    return response
 
-    # Add context if provided
-    if context:
-        context_str = f"Context: {json.dumps(context, indent=2)}"
-        messages.append({"role": "system", "content": context_str})
 
-    # Add system message for deck design expertise
-    system_message = """You are DeckChatbot AI, an expert in deck design and construction. 
-    You help sales professionals by analyzing blueprints, calculating materials, and providing 
-    technical guidance. Always provide clear, actionable advice with specific measurements 
-    and material recommendations when possible."""
+async def process_deck_design_query_with_model(query: str, context: Optional[Dict[str, Any]] = None,
+                                               use_cache: Optional[bool] = None) -> Tuple[str, str]:
+    """
+    Process a deck design query and also report which model produced the answer.
 
-    messages.extend([
-        {"role": "system", "content": system_message},
-        {"role": "user", "content": query}
-    ])
+    Args:
+        query (str): The deck design query
+        context (Optional[Dict[str, Any]]): Additional context (measurements, materials, etc.)
+        use_cache (Optional[bool]): Response cache override. Reasoning queries are cached by default.
 
-    return await enhanced_chat_with_context(messages, task_type="reasoning")
+    Returns:
+        Tuple[str, str]: The processed response and the model name used
+    """
+    # Static instructions first and the per-request context last, so Ollama can reuse
+    # the cached prefill of the system prompt across queries
+    context_str = f"Context: {json.dumps(context, indent=2, sort_keys=True)}" if context else None
+    model_name = await get_best_model_for_task("reasoning")
+    messages = prompt_assembler.assemble(
+        [{"role": "user", "content": query}],
+        model_name,
+        context=context_str,
+        instructions=DECK_DESIGN_SYSTEM_PROMPT,
+    ).messages
+
+    return await enhanced_chat_with_model(messages, task_type="reasoning", use_cache=use_cache)
@@ -19,14 +19,18 @@ except ImportError:
     print("Warning: httpx or PIL not available. Using stub implementation for DifixService.")
     DIFIX_DEPENDENCIES_AVAILABLE = False
 
+# Overridable so benchmarks and tests can point at a local stand-in
+DIFIX_API_URL = os.getenv("DIFIX_API_URL", "https://api-inference.huggingface.co/models/nvidia/difix")
+DIFIX_SPACE_URL = os.getenv("DIFIX_SPACE_URL", "https://nvidia-difix3d.hf.space/api/predict")
+
 
 class DifixService:
     """Service for integrating with NVIDIA Difix model via Hugging Face."""
 
     def __init__(self):
         self.hf_api_key = os.getenv("HUGGING_FACE_API_KEY")
-        self.difix_api_url = "https://api-inference.huggingface.co/models/nvidia/difix"
-        self.difix_space_url = "https://nvidia-difix3d.hf.space/api/predict"
+        self.difix_api_url = DIFIX_API_URL
+        self.difix_space_url = DIFIX_SPACE_URL
         self.is_available = DIFIX_DEPENDENCIES_AVAILABLE
 
         if not self.is_available:
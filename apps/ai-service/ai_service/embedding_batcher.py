@@ -0,0 +1,164 @@
+"""
+Embedding Micro-Batching
+
+This module coalesces concurrent single-text embedding requests into batched
+``encode`` calls. SentenceTransformer models embed a batch of texts in little
+more time than one, so under concurrent load (chat turns, stored conversations,
+blueprint analyses) batching multiplies throughput. A batch is dispatched once
+it holds ``max_batch_size`` texts or its oldest text has waited ``max_delay``
+seconds, whichever comes first; each caller then gets its own vector back.
+Batch sizes and queue delays are recorded as histograms for tuning the
+latency/throughput trade-off.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+EMBEDDING_BATCH_ENABLED = os.getenv("EMBEDDING_BATCH_ENABLED", "true").lower() == "true"
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))
+# Longest a text waits for companions before its batch is dispatched anyway
+EMBEDDING_BATCH_MAX_DELAY_MS = float(os.getenv("EMBEDDING_BATCH_MAX_DELAY_MS", "5"))
+
+_BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+_QUEUE_DELAY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 250)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style."""
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # Last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        """Record one value."""
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += value
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Cumulative counts per upper bound, with the total count and mean."""
+        buckets, cumulative = {}, 0
+        for bound, count in zip(list(self.bounds) + ["+Inf"], self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {
+            "buckets": buckets,
+            "count": self.count,
+            "mean": round(self.sum / self.count, 3) if self.count else 0.0,
+        }
+
+
+class EmbeddingBatcher:
+    """Collects concurrent encode requests and runs them as one batched encode."""
+
+    def __init__(self, encode_batch: Callable[[List[str]], Awaitable[List[List[float]]]],
+                 enabled: bool = EMBEDDING_BATCH_ENABLED,
+                 max_batch_size: int = EMBEDDING_BATCH_MAX_SIZE,
+                 max_delay: float = EMBEDDING_BATCH_MAX_DELAY_MS / 1000):
+        """
+        Initialize the batcher.
+
+        Args:
+            encode_batch (Callable[[List[str]], Awaitable[List[List[float]]]]): Embeds a list of texts,
+                returning one vector per text in order.
+            enabled (bool): When False every text is encoded on its own.
+            max_batch_size (int): Texts per batch; a full batch is dispatched at once.
+            max_delay (float): Seconds the first text of a batch waits for more texts.
+        """
+        self.encode_batch = encode_batch
+        self.enabled = enabled
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._pending: List[Tuple[str, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._batches: Set[asyncio.Task] = set()
+        self.batch_sizes = Histogram(_BATCH_SIZE_BUCKETS)
+        self.queue_delays_ms = Histogram(_QUEUE_DELAY_BUCKETS_MS)
+        self.texts = 0
+        self.batches = 0
+        self.errors = 0
+
+    async def encode(self, text: str) -> List[float]:
+        """
+        Embed one text as part of the next batch.
+
+        Args:
+            text (str): The text to embed.
+
+        Returns:
+            List[float]: Its embedding.
+        """
+        if not self.enabled:
+            return (await self.encode_batch([text]))[0]
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush)
+        return await future
+
+    def _flush(self):
+        """Dispatch the pending texts, in batches of at most max_batch_size."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            task = asyncio.ensure_future(self._run_batch(batch))
+            # Keep a reference so the task is not garbage collected mid-flight
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future, float]]):
+        # Callers that gave up (cancelled) no longer need their text embedded
+        batch = [item for item in batch if not item[1].done()]
+        if not batch:
+            return
+        dispatched = time.perf_counter()
+        for _, _, enqueued in batch:
+            self.queue_delays_ms.observe((dispatched - enqueued) * 1000)
+        self.batch_sizes.observe(len(batch))
+        self.batches += 1
+        self.texts += len(batch)
+
+        # Identical texts in one batch (a popular question) are encoded once
+        unique = list(dict.fromkeys(text for text, _, _ in batch))
+        try:
+            vectors = dict(zip(unique, await self.encode_batch(unique)))
+        except Exception as e:
+            self.errors += 1
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for text, future, _ in batch:
+            if not future.done():
+                future.set_result(vectors[text])
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get batch-size and queue-delay histograms and throughput counters."""
+        return {
+            "enabled": self.enabled,
+            "max_batch_size": self.max_batch_size,
+            "max_delay_ms": self.max_delay * 1000,
+            "texts": self.texts,
+            "batches": self.batches,
+            "errors": self.errors,
+            "pending": len(self._pending),
+            "batch_size": self.batch_sizes.to_dict(),
+            "queue_delay_ms": self.queue_delays_ms.to_dict(),
+        }
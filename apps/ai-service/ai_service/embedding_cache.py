@@ -0,0 +1,313 @@
+"""
+Embedding Cache
+
+This module caches text embeddings so the same string is not encoded twice:
+repeated user questions, the default knowledge seeded at startup, the query of
+every retrieval. Entries are keyed on the embedding model and a hash of the
+normalized text, and stored as compact float16 or float32 vectors in an
+in-memory LRU. An optional disk tier keeps every vector in a memory-mapped
+array file with a tab-separated key-to-row index next to it, so a restarted
+service finds its embeddings without re-encoding them. New vectors are queued
+for the disk tier by ``set`` and written in batches by ``flush``. ``flush`` and
+lookups that fall through to the disk tier block on file I/O and are meant to
+run off the event loop; ``get_from_memory`` never touches the disk.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "50000"))
+# float16 halves the footprint; cosine similarities move by well under 1e-3
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float16")
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR")  # Disk tier disabled when unset
+EMBEDDING_CACHE_MAX_DISK_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_DISK_ENTRIES", "1000000"))
+
+_VECTORS_FILE = "vectors.bin"
+_INDEX_FILE = "index.tsv"
+_META_FILE = "meta.json"
+
+
+def normalize_text(text: str) -> str:
+    """Unicode-normalize and collapse whitespace, which do not change what a text means."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def embedding_cache_key(model: str, text: str) -> str:
+    """
+    Build the cache key of a text's embedding.
+
+    Args:
+        model (str): The embedding model name.
+        text (str): The text; it is normalized first.
+
+    Returns:
+        str: Hex digest identifying the (model, text) pair.
+    """
+    return hashlib.sha256(f"{model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()[:32]
+
+
+class _DiskTier:
+    """Append-only vector file, read through a memory map, with a key-to-row index."""
+
+    def __init__(self, directory: str, dtype: np.dtype, max_entries: int):
+        self.directory = directory
+        self.dtype = dtype
+        self.max_entries = max_entries
+        self.dim: Optional[int] = None
+        self.rows: Dict[str, int] = {}
+        self._map: Optional[np.memmap] = None
+        # Lookups and writes run on several executor threads; rows and the map change together
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _load(self):
+        try:
+            with open(self._path(_META_FILE)) as f:
+                meta = json.load(f)
+            if meta.get("dtype") != self.dtype.name:
+                # Written with another precision; start over rather than convert
+                self._reset()
+                return
+            self.dim = meta["dim"]
+            complete_rows = os.path.getsize(self._path(_VECTORS_FILE)) // (self.dim * self.dtype.itemsize)
+            with open(self._path(_INDEX_FILE)) as f:
+                for line in f:
+                    key, _, row = line.rstrip("\n").partition("\t")
+                    # Skip a torn last line or a row whose vector never reached the file
+                    if row.isdigit() and int(row) < complete_rows:
+                        self.rows[key] = int(row)
+        except (OSError, ValueError, KeyError):
+            self._reset()
+
+    def _reset(self):
+        for name in (_VECTORS_FILE, _INDEX_FILE, _META_FILE):
+            if os.path.exists(self._path(name)):
+                os.remove(self._path(name))
+        open(self._path(_VECTORS_FILE), "wb").close()
+        open(self._path(_INDEX_FILE), "w").close()
+        self.dim = None
+        self.rows = {}
+        self._map = None
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            row = self.rows.get(key)
+            if row is None:
+                return None
+            if self._map is None or row >= self._map.shape[0]:
+                # Remap to cover rows appended since the last read
+                self._map = np.memmap(self._path(_VECTORS_FILE), dtype=self.dtype, mode="r",
+                                      shape=(len(self.rows), self.dim))
+            return np.array(self._map[row])
+
+    def add_many(self, items: List[Tuple[str, np.ndarray]]):
+        """Append vectors with one write to each file; duplicates and vectors past the limit are skipped."""
+        with self._lock:
+            if self.dim is None and items:
+                self.dim = items[0][1].shape[0]
+                with open(self._path(_META_FILE), "w") as f:
+                    json.dump({"dim": self.dim, "dtype": self.dtype.name}, f)
+            batch: Dict[str, np.ndarray] = {}
+            for key, vector in items:
+                if len(self.rows) + len(batch) >= self.max_entries:
+                    break
+                if key not in self.rows and vector.shape[0] == self.dim:
+                    batch.setdefault(key, vector)
+            if not batch:
+                return
+            first_row = len(self.rows)
+            # The vectors are written before their index lines, so a crash never indexes a missing vector
+            with open(self._path(_VECTORS_FILE), "r+b") as f:
+                f.seek(first_row * self.dim * self.dtype.itemsize)
+                f.write(np.stack(list(batch.values())).astype(self.dtype, copy=False).tobytes())
+            with open(self._path(_INDEX_FILE), "a") as f:
+                f.writelines(f"{key}\t{first_row + i}\n" for i, key in enumerate(batch))
+            for i, key in enumerate(batch):
+                self.rows[key] = first_row + i
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.rows) * (self.dim or 0) * self.dtype.itemsize
+
+
+class EmbeddingCache:
+    """LRU cache of compact embedding vectors with an optional memory-mapped disk tier."""
+
+    def __init__(self, enabled: bool = EMBEDDING_CACHE_ENABLED,
+                 max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+                 dtype: str = EMBEDDING_CACHE_DTYPE,
+                 directory: Optional[str] = EMBEDDING_CACHE_DIR,
+                 max_disk_entries: int = EMBEDDING_CACHE_MAX_DISK_ENTRIES):
+        """
+        Initialize the cache.
+
+        Args:
+            enabled (bool): When False every lookup misses and nothing is stored.
+            max_entries (int): Vectors held in memory.
+            dtype (str): Storage precision, "float16" or "float32".
+            directory (Optional[str]): Directory of the disk tier; None keeps the cache in memory only.
+            max_disk_entries (int): Vectors kept on disk; later ones stay in memory only.
+        """
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.float16, np.float32):
+            raise ValueError(f"Unsupported embedding cache dtype: {dtype}")
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._disk = _DiskTier(directory, self.dtype, max_disk_entries) if directory and enabled else None
+        # Vectors waiting for the disk tier; set() only queues, flush() writes
+        self._pending: List[Tuple[str, np.ndarray]] = []
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # Disk lookups promote vectors into memory from executor threads
+        self._entries_lock = threading.Lock()
+
+    @property
+    def has_disk_tier(self) -> bool:
+        """Whether lookups that miss in memory go to disk."""
+        return self._disk is not None
+
+    def _remember(self, key: str, vector: np.ndarray):
+        with self._entries_lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = vector
+            self._bytes += vector.nbytes
+            while len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def get_from_memory(self, model: str, text: str) -> Optional[List[float]]:
+        """
+        Look up an embedding in memory only. Never blocks on the disk tier.
+
+        A miss is not counted, since the caller is expected to follow up with ``get``.
+
+        Args:
+            model (str): The embedding model name.
+            text (str): The embedded text.
+
+        Returns:
+            Optional[List[float]]: The embedding, or None when it is not in memory.
+        """
+        if not self.enabled:
+            return None
+        key = embedding_cache_key(model, text)
+        with self._entries_lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return vector.astype(np.float32).tolist()
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        """
+        Look up an embedding in memory, then in the disk tier.
+
+        Blocks on file I/O when there is a disk tier; run it off the event loop.
+
+        Args:
+            model (str): The embedding model name.
+            text (str): The embedded text.
+
+        Returns:
+            Optional[List[float]]: The embedding, or None on a miss.
+        """
+        if not self.enabled:
+            return None
+        embedding = self.get_from_memory(model, text)
+        if embedding is not None:
+            return embedding
+        key = embedding_cache_key(model, text)
+        if self._disk is not None:
+            vector = self._disk.get(key)
+            if vector is not None:
+                self._remember(key, vector)
+                self.disk_hits += 1
+                return vector.astype(np.float32).tolist()
+        self.misses += 1
+        return None
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Look up several embeddings with ``get``, in order. Blocks like ``get``."""
+        return [self.get(model, text) for text in texts]
+
+    def set(self, model: str, text: str, embedding: Sequence[float]):
+        """
+        Store an embedding in memory and queue it for the disk tier.
+
+        Args:
+            model (str): The embedding model name.
+            text (str): The embedded text.
+            embedding (Sequence[float]): Its embedding.
+        """
+        if not self.enabled:
+            return
+        key = embedding_cache_key(model, text)
+        vector = np.asarray(embedding, dtype=self.dtype)
+        self._remember(key, vector)
+        if self._disk is not None:
+            with self._pending_lock:
+                self._pending.append((key, vector))
+
+    @property
+    def pending_writes(self) -> int:
+        """Vectors queued for the disk tier but not yet written."""
+        return len(self._pending)
+
+    def flush(self):
+        """Write the queued vectors to the disk tier. Blocks on file I/O; run it off the event loop."""
+        if self._disk is None:
+            return
+        with self._flush_lock:
+            while True:
+                with self._pending_lock:
+                    pending, self._pending = self._pending, []
+                if not pending:
+                    return
+                self._disk.add_many(pending)
+
+    def clear(self):
+        """Drop the in-memory entries; the disk tier is kept."""
+        with self._entries_lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit rate and memory/disk footprint."""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "dtype": self.dtype.name,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "memory_bytes": self._bytes,
+            "disk_tier": self._disk is not None,
+            "disk_entries": len(self._disk.rows) if self._disk else 0,
+            "disk_pending": self.pending_writes,
+            "disk_bytes": self._disk.nbytes if self._disk else 0,
+        }
@@ -5,6 +5,7 @@ This module provides image processing functionality for the DeckChatbot applicat
 including OCR, dimension parsing, and square footage calculation.
 """
 
+import asyncio
 import base64
 import io
 
@@ -15,6 +16,9 @@ from lib2.square_footage import (
     calculate_square_footage,
 )
 
+from ai_service.difix_service import DIFIX_API_URL
+from ai_service.single_flight import single_flight, make_flight_key
+
 
 def process_image(image_bytes):
     """
@@ -45,8 +49,11 @@ async def analyze_image_with_ocr(image_bytes):
     Returns:
         dict: The analysis result containing OCR text, parsed dimensions, and square footage.
     """
-    # Step 1: OCR
-    text = extract_text_from_image(image_bytes)
+    # Step 1: OCR, off the event loop and shared by concurrent identical uploads
+    text = await single_flight.do(
+        make_flight_key("ocr", image_bytes),
+        lambda: asyncio.to_thread(extract_text_from_image, image_bytes)
+    )
 
     # Step 2: Parse dimensions
     dims = parse_dimensions_from_text(text)
@@ -104,7 +111,7 @@ async def enhance_image_with_difix(image_bytes, hf_api_token):
     try:
         async with httpx.AsyncClient() as client:
             resp = await client.post(
-                "https://api-inference.huggingface.co/models/NVIDIA/difix",
+                DIFIX_API_URL,
                 headers={"Authorization": f"Bearer {hf_api_token}"},
                 content=image_bytes,
                 timeout=60.0,
@@ -0,0 +1,307 @@
+"""
+Knowledge Ingestion
+
+This module bulk-loads reference documents (building codes, span tables,
+product manuals) into the ``deck_knowledge`` collection. Text, Markdown and
+PDF files are streamed one at a time and split into overlapping word windows.
+Chunks are deduplicated by their content-addressed ID, and chunks already in
+the collection are skipped before embedding. The rest are embedded in large
+batches that run side by side on the vector-DB executor, then upserted in
+chunks. Progress is checkpointed after every upsert, so an interrupted run
+resumes where it stopped. The checkpoint also records the chunk IDs of each
+file, so when a file changes, its chunks that are no longer in it are deleted
+before the new ones are upserted.
+
+Usage:
+    python -m ai_service.knowledge_ingestion docs/codes docs/manuals --category building_code
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from ai_service.vector_db_service import VectorDBService, get_vector_db_service, knowledge_id
+
+# Optional PDF support
+try:
+    from pypdf import PdfReader
+    PYPDF_AVAILABLE = True
+except ImportError:
+    PYPDF_AVAILABLE = False
+
+# Directory the /ingest-knowledge endpoint may read from
+KNOWLEDGE_INGEST_DIR = os.getenv("KNOWLEDGE_INGEST_DIR", "knowledge")
+KNOWLEDGE_CHUNK_WORDS = int(os.getenv("KNOWLEDGE_CHUNK_WORDS", "200"))
+KNOWLEDGE_CHUNK_OVERLAP_WORDS = int(os.getenv("KNOWLEDGE_CHUNK_OVERLAP_WORDS", "40"))
+KNOWLEDGE_EMBED_BATCH_SIZE = int(os.getenv("KNOWLEDGE_EMBED_BATCH_SIZE", "128"))
+KNOWLEDGE_UPSERT_BATCH_SIZE = int(os.getenv("KNOWLEDGE_UPSERT_BATCH_SIZE", "512"))
+
+SUPPORTED_EXTENSIONS = (".txt", ".md", ".markdown", ".pdf")
+CHECKPOINT_FILE = "ingest_checkpoint.json"
+_CHECKPOINT_VERSION = 1
+
+# One ingestion at a time, since runs share the checkpoint file
+ingestion_lock = asyncio.Lock()
+
+
+def iter_files(paths: List[str]) -> Iterator[str]:
+    """Yield the supported files among the paths, walking directories in sorted order."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                        yield os.path.join(root, name)
+        elif path.lower().endswith(SUPPORTED_EXTENSIONS):
+            yield path
+
+
+def read_text(path: str) -> str:
+    """
+    Read the text of a file.
+
+    Raises:
+        ValueError: For a PDF when pypdf is not installed.
+    """
+    if path.lower().endswith(".pdf"):
+        if not PYPDF_AVAILABLE:
+            raise ValueError("pypdf is not installed")
+        return "\n\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def chunk_text(text: str, chunk_words: int = KNOWLEDGE_CHUNK_WORDS,
+               overlap_words: int = KNOWLEDGE_CHUNK_OVERLAP_WORDS) -> List[str]:
+    """
+    Split a text into overlapping windows of words.
+
+    Args:
+        text (str): The text to split.
+        chunk_words (int): Words per chunk.
+        overlap_words (int): Words shared by consecutive chunks, so a fact that straddles a boundary stays whole.
+
+    Returns:
+        List[str]: The chunks, with whitespace collapsed.
+    """
+    if not 0 <= overlap_words < chunk_words:
+        raise ValueError("overlap_words must be at least 0 and smaller than chunk_words")
+    words = text.split()
+    step = chunk_words - overlap_words
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + chunk_words]))
+        if start + chunk_words >= len(words):
+            break
+    return chunks
+
+
+class KnowledgeIngestor:
+    """Streams files into deck_knowledge with batched embedding and checkpointed upserts."""
+
+    def __init__(self, service: Optional[VectorDBService] = None, category: str = "reference",
+                 chunk_words: int = KNOWLEDGE_CHUNK_WORDS,
+                 overlap_words: int = KNOWLEDGE_CHUNK_OVERLAP_WORDS,
+                 embed_batch_size: int = KNOWLEDGE_EMBED_BATCH_SIZE,
+                 upsert_batch_size: int = KNOWLEDGE_UPSERT_BATCH_SIZE,
+                 checkpoint_path: Optional[str] = None):
+        """
+        Initialize the ingestor.
+
+        Args:
+            service (Optional[VectorDBService]): Vector database to load. Defaults to the global instance.
+            category (str): ``category`` metadata of the ingested chunks.
+            chunk_words (int): Words per chunk.
+            overlap_words (int): Words shared by consecutive chunks.
+            embed_batch_size (int): Chunks per encode call; an upsert batch is embedded as several concurrent calls.
+            upsert_batch_size (int): Chunks per upsert and checkpoint.
+            checkpoint_path (Optional[str]): Progress file. Defaults to ingest_checkpoint.json in the Chroma directory.
+
+        Raises:
+            ValueError: If the overlap is negative or not smaller than the chunk.
+        """
+        if not 0 <= overlap_words < chunk_words:
+            raise ValueError("overlap_words must be at least 0 and smaller than chunk_words")
+        self.service = service or get_vector_db_service()
+        self.category = category
+        self.chunk_words = chunk_words
+        self.overlap_words = overlap_words
+        self.embed_batch_size = embed_batch_size
+        self.upsert_batch_size = upsert_batch_size
+        self.checkpoint_path = checkpoint_path or os.path.join(self.service.persist_directory, CHECKPOINT_FILE)
+        self._settings = {
+            "category": category, "chunk_words": chunk_words, "overlap_words": overlap_words,
+            "embedding_model": self.service.embedding_model_name,
+        }
+
+    def _load_checkpoint(self) -> Dict[str, Dict[str, Any]]:
+        """Per-file progress of an earlier run with the same settings."""
+        try:
+            with open(self.checkpoint_path) as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if checkpoint.get("version") != _CHECKPOINT_VERSION or checkpoint.get("settings") != self._settings:
+            # Chunk boundaries or metadata would differ, so earlier progress does not carry over
+            return {}
+        return checkpoint.get("files", {})
+
+    def _save_checkpoint(self, files: Dict[str, Dict[str, Any]]):
+        directory = os.path.dirname(self.checkpoint_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.checkpoint_path + ".tmp", "w") as f:
+            json.dump({"version": _CHECKPOINT_VERSION, "settings": self._settings, "files": files}, f)
+        os.replace(self.checkpoint_path + ".tmp", self.checkpoint_path)
+
+    async def _flush(self, pending: List[Tuple[str, Dict[str, Any]]], seen: set, report: Dict[str, Any]):
+        """Dedupe, drop chunks already stored, embed the rest in concurrent batches and upsert them."""
+        documents = []
+        for content, metadata in pending:
+            doc_id = knowledge_id(content)
+            if doc_id in seen:
+                report["duplicates"] += 1
+                continue
+            seen.add(doc_id)
+            documents.append((doc_id, content, metadata))
+        existing = set(await self.service.find_deck_knowledge_ids([doc_id for doc_id, _, _ in documents]))
+        report["existing"] += len(existing)
+        documents = [(content, metadata) for doc_id, content, metadata in documents if doc_id not in existing]
+        if not documents:
+            return
+
+        contents = [content for content, _ in documents]
+        batches = await asyncio.gather(*(
+            self.service.embed_many(contents[start:start + self.embed_batch_size])
+            for start in range(0, len(contents), self.embed_batch_size)
+        ))
+        embeddings = [embedding for batch in batches for embedding in batch]
+        report["embedded"] += len(embeddings)
+        await self.service.upsert_deck_knowledge(documents, embeddings=embeddings)
+        report["upserted"] += len(documents)
+
+    async def ingest(self, paths: List[str],
+                     progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Ingest files into the deck knowledge collection.
+
+        Args:
+            paths (List[str]): Files and directories to ingest.
+            progress (Optional[Callable[[Dict[str, Any]], None]]): Called with the running report after each upsert.
+
+        Returns:
+            Dict[str, Any]: Counts of files and chunks (duplicate, already stored, embedded, upserted,
+            removed from an earlier version of a changed file), elapsed seconds and ``chunks_per_second``.
+
+        Raises:
+            RuntimeError: If the vector database is not available.
+        """
+        if not self.service.is_available:
+            raise RuntimeError("Vector database is not available")
+
+        started = time.perf_counter()
+        report = {"files": 0, "files_skipped": 0, "files_failed": 0, "chunks": 0, "duplicates": 0,
+                  "existing": 0, "embedded": 0, "upserted": 0, "removed": 0,
+                  "seconds": 0.0, "chunks_per_second": 0.0}
+        files = self._load_checkpoint()
+        pending: List[Tuple[str, Dict[str, Any]]] = []
+        # Files with chunks in `pending`: path -> chunks read so far, and whether the file is finished
+        reading: Dict[str, Tuple[int, bool]] = {}
+        # Chunk IDs of the files being read, in chunk order
+        file_ids: Dict[str, List[str]] = {}
+        seen: set = set()
+
+        async def flush():
+            await self._flush(pending, seen, report)
+            pending.clear()
+            for path, (chunks_done, complete) in reading.items():
+                stat = os.stat(path)
+                files[path] = {"size": stat.st_size, "mtime": stat.st_mtime,
+                               "chunks_done": chunks_done, "complete": complete,
+                               "ids": file_ids[path][:chunks_done]}
+            reading.clear()
+            await asyncio.to_thread(self._save_checkpoint, files)
+            elapsed = time.perf_counter() - started
+            report["seconds"] = round(elapsed, 3)
+            report["chunks_per_second"] = round(report["chunks"] / elapsed, 1) if elapsed else 0.0
+            if progress:
+                progress(dict(report))
+
+        for path in iter_files(paths):
+            path = os.path.abspath(path)
+            stat = os.stat(path)
+            done = previous = files.get(path)
+            if done and (done["size"], done["mtime"]) != (stat.st_size, stat.st_mtime):
+                done = None  # Changed since the checkpoint
+            if done and done["complete"]:
+                report["files_skipped"] += 1
+                continue
+            try:
+                text = await asyncio.to_thread(read_text, path)
+            except (OSError, ValueError) as e:
+                print(f"Skipping {path}: {e}")
+                report["files_failed"] += 1
+                continue
+
+            report["files"] += 1
+            chunks = chunk_text(text, self.chunk_words, self.overlap_words)
+            file_ids[path] = [knowledge_id(chunk) for chunk in chunks]
+            if previous and not done:
+                # Chunks of the old version that are gone from the file, unless another file has them too
+                kept = set(file_ids[path]).union(*(
+                    entry.get("ids", []) for other, entry in files.items() if other != path
+                ))
+                stale = [doc_id for doc_id in previous.get("ids", []) if doc_id not in kept]
+                report["removed"] += await self.service.delete_deck_knowledge(stale)
+            start = done["chunks_done"] if done else 0
+            for index in range(start, len(chunks)):
+                pending.append((chunks[index], {"category": self.category, "source": os.path.basename(path),
+                                                "chunk": index}))
+                report["chunks"] += 1
+                reading[path] = (index + 1, index + 1 == len(chunks))
+                if len(pending) >= self.upsert_batch_size:
+                    await flush()
+            reading[path] = (len(chunks), True)
+        await flush()
+        return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="Files or directories of .txt, .md and .pdf documents")
+    parser.add_argument("--category", default="reference", help="Category metadata of the chunks")
+    parser.add_argument("--chunk-words", type=int, default=KNOWLEDGE_CHUNK_WORDS)
+    parser.add_argument("--overlap-words", type=int, default=KNOWLEDGE_CHUNK_OVERLAP_WORDS)
+    parser.add_argument("--embed-batch-size", type=int, default=KNOWLEDGE_EMBED_BATCH_SIZE)
+    parser.add_argument("--upsert-batch-size", type=int, default=KNOWLEDGE_UPSERT_BATCH_SIZE)
+    parser.add_argument("--persist-directory", default=None, help="Chroma directory (default: the service's)")
+    parser.add_argument("--checkpoint", default=None, help="Progress file (default: in the Chroma directory)")
+    args = parser.parse_args(argv)
+
+    # Built here rather than through the global instance, which would load the embedding model again
+    service = VectorDBService(persist_directory=args.persist_directory) if args.persist_directory else None
+    ingestor = KnowledgeIngestor(service, category=args.category, chunk_words=args.chunk_words,
+                                 overlap_words=args.overlap_words, embed_batch_size=args.embed_batch_size,
+                                 upsert_batch_size=args.upsert_batch_size, checkpoint_path=args.checkpoint)
+
+    def show(report: Dict[str, Any]):
+        print(f"{report['files']} files, {report['chunks']} chunks, {report['upserted']} upserted, "
+              f"{report['chunks_per_second']} chunks/s")
+
+    try:
+        report = asyncio.run(ingestor.ingest(args.paths, progress=show))
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
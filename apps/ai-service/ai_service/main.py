@@ -1,6 +1,9 @@
 import base64
+import json
 import os
-from typing import List, Dict, Any, Optional, Union
+import tempfile
+import time
+from typing import List, Dict, Any, Optional, Tuple, Union
 from pathlib import Path
 
 from ai_service.blueprint import (
@@ -11,14 +14,34 @@ from ai_service.blueprint import (
 # Import modules from the ai_service package
 from ai_service.core import (
     AI_PROVIDER,
+    OLLAMA_MODEL_NAME,
     analyze_image_with_ollama,
     chat_with_ollama,
     # Enhanced AI capabilities
     enhanced_chat_with_context,
+    enhanced_chat_with_model,
     analyze_image_with_enhanced_multimodal,
-    process_deck_design_query,
+    process_deck_design_query_with_model,
     get_best_model_for_task,
+    init_http_client,
+    close_http_client,
+    get_http_client,
+    stream_chat_with_ollama,
+    stream_enhanced_chat_with_context,
+    stream_session_reply,
+    model_registry,
+    model_residency,
 )
+from ai_service.admission import admission_controller, OllamaOverloadedError
+from ai_service.circuit_breaker import circuit_breakers
+from ai_service.model_scheduler import model_scheduler
+from ai_service.prompt_assembly import prompt_assembler, PromptAssembly
+from ai_service.ollama_backends import backend_pool
+from ai_service.response_cache import response_cache, make_cache_key
+from ai_service.blueprint_cache import blueprint_cache, blueprint_cache_key
+from ai_service.sessions import session_store, Session
+from ai_service.vision_preprocessing import vision_preprocessor
+from ai_service.single_flight import single_flight
 from ai_service.image_processing import (
     process_image,
     analyze_image_with_ocr,
@@ -31,15 +54,23 @@ from ai_service.difix_service import (
     enhance_deck_3d_preview,
 )
 from ai_service.vector_db_service import (
-    vector_db_service,
+    get_vector_db_service,
     enhance_query_with_context,
 )
+from ai_service.knowledge_ingestion import (
+    KNOWLEDGE_INGEST_DIR,
+    KNOWLEDGE_CHUNK_WORDS,
+    KNOWLEDGE_CHUNK_OVERLAP_WORDS,
+    KnowledgeIngestor,
+    ingestion_lock,
+)
 from ai_service.whisper_service import (
     whisper_service,
     transcribe_voice_command,
     process_voice_interaction,
 )
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 
 app = FastAPI()
@@ -47,6 +78,10 @@ app = FastAPI()
 # --- Configuration ---
 UPLOAD_DIR = "uploads"
 HF_API_TOKEN = os.getenv("HF_API_TOKEN")
+# Binary uploads larger than this are rejected with 413
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(50 * 1024 * 1024)))
+# Raw request bodies are buffered in memory up to this size, then spill to a temporary file
+UPLOAD_SPOOL_MAX_MEMORY = int(os.getenv("UPLOAD_SPOOL_MAX_MEMORY", str(1024 * 1024)))
 
 # --- Startup ---
 @app.on_event("startup")
@@ -54,10 +89,28 @@ async def startup_event():
     os.makedirs(UPLOAD_DIR, exist_ok=True)
     # No specific API key check here, as Ollama will be handled internally
 
+    # Shared, pooled HTTP client for all Ollama calls
+    await init_http_client()
+
+    # Keep the installed-model cache warm so model selection stays off /api/tags
+    await model_registry.start_background_refresh()
+
+    # Probe every Ollama node so failed hosts are ejected and recovered hosts rejoin
+    await backend_pool.start_health_checks(get_http_client)
+
+    # Pre-load the primary models in the background and keep recently used ones resident
+    await model_residency.start()
+
+    # Load configured prompt tokenizers off the event loop; token counts are estimated until then
+    await prompt_assembler.start()
+
+    # Drop conversation sessions that have gone idle
+    await session_store.start()
+
     # Enhanced startup initialization
     # Initialize vector database with default knowledge
     try:
-        await vector_db_service.initialize_default_knowledge()
+        await get_vector_db_service().initialize_default_knowledge()
         print("✓ Vector database initialized with default deck knowledge")
     except Exception as e:
         print(f"Warning: Vector database initialization failed: {e}")
@@ -85,6 +138,26 @@ async def startup_event():
 
     print("AI service startup completed - service is ready to handle requests.")
 
+
+@app.exception_handler(OllamaOverloadedError)
+async def ollama_overloaded_handler(request, exc: OllamaOverloadedError):
+    """Turn admission rejections into 429/503 responses with a Retry-After hint."""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await model_registry.stop_background_refresh()
+    await model_residency.stop()
+    await session_store.stop()
+    await backend_pool.stop_health_checks()
+    await close_http_client()
+    await get_vector_db_service().shutdown()
+
 # --- Models ---
 class ImageAnalysisRequest(BaseModel):
     imageBase64: str
@@ -102,9 +175,11 @@ class EnhanceImageResponse(BaseModel):
 class BotQueryRequest(BaseModel):
     messages: List[Dict[str, Any]]
     options: Dict[str, Any] = {}
+    use_cache: Optional[bool] = None  # None: cache deterministic requests only
 
 class BotQueryResponse(BaseModel):
     response: str
+    tokens_dropped: int = 0  # Prompt tokens trimmed to fit the context window
 
 class FileInfo(BaseModel):
     filename: str
@@ -125,11 +200,28 @@ class EnhancedChatRequest(BaseModel):
     task_type: str = "conversation"  # conversation, reasoning, multimodal
     user_id: Optional[str] = None
     context: Optional[Dict[str, Any]] = None
+    use_cache: Optional[bool] = None  # None: cache deterministic requests only
 
 class EnhancedChatResponse(BaseModel):
     response: str
     model_used: str
     enhanced_context: Optional[str] = None
+    semantic_cache_hit: bool = False
+    tokens_dropped: int = 0  # Prompt tokens trimmed to fit the context window
+
+class SessionCreateRequest(BaseModel):
+    task_type: str = "conversation"  # conversation, reasoning, multimodal
+    user_id: Optional[str] = None
+    system: Optional[str] = None
+
+class SessionMessageRequest(BaseModel):
+    content: str
+
+class SessionMessageResponse(BaseModel):
+    response: str
+    model_used: str
+    context_reused: bool  # Earlier turns were continued from Ollama's context, not re-sent
+    tokens_dropped: int = 0  # Prompt tokens trimmed to fit the context window
 
 class DifixEnhanceRequest(BaseModel):
     imageBase64: str
@@ -159,6 +251,13 @@ class KnowledgeSearchRequest(BaseModel):
 class KnowledgeSearchResponse(BaseModel):
     results: List[Dict[str, Any]]
     enhanced_context: str
+    timings: Dict[str, float] = {}  # Milliseconds per retrieval stage
+
+class KnowledgeIngestRequest(BaseModel):
+    paths: List[str]  # Files or directories under KNOWLEDGE_INGEST_DIR
+    category: str = "reference"
+    chunk_words: int = KNOWLEDGE_CHUNK_WORDS
+    overlap_words: int = KNOWLEDGE_CHUNK_OVERLAP_WORDS
 
 class BlueprintAnalysisRequest(BaseModel):
     imageBase64: str
@@ -169,6 +268,182 @@ class BlueprintAnalysisResponse(BaseModel):
     analysis_result: str
     extracted_data: Dict[str, Any]
     similar_blueprints: List[Dict[str, Any]]
+    cache_hit: bool = False  # Analysis served from the blueprint cache
+
+# --- Helpers ---
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format a Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _sse_response(events, headers: Optional[Dict[str, str]] = None) -> StreamingResponse:
+    """
+    Wrap an async iterator of core stream events as an SSE response.
+
+    Each core event's ``type`` becomes the SSE event name. Events up to the
+    first generated chunk are awaited before the response starts so admission
+    rejections still surface as 429/503; later upstream failures are reported
+    as a final ``error`` event since the status line is already sent.
+    """
+    leading_events = []
+    try:
+        async for event in events:
+            leading_events.append(event)
+            if event["type"] != "start":
+                break
+    except OllamaOverloadedError:
+        raise
+    except Exception as e:
+        leading_events.append({"type": "error", "detail": str(e)})
+
+    async def body():
+        try:
+            for event in leading_events:
+                event = dict(event)
+                event_type = event.pop("type")
+                yield _sse_event(event_type, event)
+                if event_type in ("error", "done"):
+                    return
+            try:
+                async for event in events:
+                    event = dict(event)
+                    yield _sse_event(event.pop("type"), event)
+            except Exception as e:
+                yield _sse_event("error", {"detail": str(e)})
+        finally:
+            # A client disconnect closes this body; close the upstream stream now so its
+            # admission slot and Ollama connection are released rather than left to the GC
+            await events.aclose()
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **(headers or {})},
+    )
+
+
+async def _assemble_enhanced_prompt(request: "EnhancedChatRequest") -> Tuple[Optional[str], PromptAssembly]:
+    """
+    Retrieve vector-DB context when a user_id is given and fit it, with the
+    conversation, into the selected model's token budget.
+    """
+    enhanced_context = None
+    if request.user_id:
+        context_data = await enhance_query_with_context(
+            request.messages[-1]["content"] if request.messages else "",
+            request.user_id
+        )
+        enhanced_context = context_data["enhanced_context"]
+
+    model_name = await get_best_model_for_task(request.task_type)
+    # Retrieved context changes every turn, so it goes after the history to keep the prefix cacheable
+    turn_context = f"Relevant context: {enhanced_context}" if enhanced_context else None
+    return enhanced_context, prompt_assembler.assemble(request.messages, model_name, turn_context)
+
+
+async def _read_upload(request: Request) -> Tuple[bytes, Dict[str, str]]:
+    """
+    Read a binary upload: the ``file`` part of a multipart form, or a raw body.
+
+    The body is streamed into a spooled buffer, so slow clients only hold
+    UPLOAD_SPOOL_MAX_MEMORY bytes of memory until the upload completes.
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        Tuple[bytes, Dict[str, str]]: The payload, and the query parameters merged with
+        any other multipart form fields.
+    """
+    params = dict(request.query_params)
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {UPLOAD_MAX_BYTES} bytes")
+
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        async with request.form(max_files=1) as form:
+            upload = form.get("file")
+            if upload is None or isinstance(upload, str):
+                raise HTTPException(status_code=400, detail="Multipart upload needs a 'file' part")
+            if upload.size is not None and upload.size > UPLOAD_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"Upload exceeds {UPLOAD_MAX_BYTES} bytes")
+            params.update({key: value for key, value in form.items() if isinstance(value, str)})
+            return await upload.read(), params
+
+    with tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_MEMORY) as spool:
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > UPLOAD_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"Upload exceeds {UPLOAD_MAX_BYTES} bytes")
+            spool.write(chunk)
+        if not size:
+            raise HTTPException(status_code=400, detail="Empty upload")
+        spool.seek(0)
+        return spool.read(), params
+
+
+def _json_param(params: Dict[str, str], name: str) -> Optional[Dict[str, Any]]:
+    """Parse an optional JSON-object upload parameter, failing with 400."""
+    if not params.get(name):
+        return None
+    try:
+        value = json.loads(params[name])
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON in '{name}': {e}")
+    if not isinstance(value, dict):
+        raise HTTPException(status_code=400, detail=f"'{name}' must be a JSON object")
+    return value
+
+
+def _wants_binary(params: Dict[str, str]) -> bool:
+    """Whether an upload endpoint should answer with raw image bytes (the default) or base64 JSON."""
+    response_format = params.get("response_format", "binary")
+    if response_format not in ("binary", "json"):
+        raise HTTPException(status_code=400, detail="response_format must be 'binary' or 'json'")
+    return response_format == "binary"
+
+
+def _image_media_type(data: bytes) -> str:
+    """Sniff the media type of an image from its magic bytes."""
+    if data.startswith(b"\x89PNG"):
+        return "image/png"
+    if data.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if data.startswith(b"RIFF") and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data.startswith(b"GIF8"):
+        return "image/gif"
+    return "application/octet-stream"
+
+
+async def _get_session(session_id: str) -> Session:
+    """Look up a session or fail with 404."""
+    session = await session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found or expired")
+    return session
+
+
+def _semantic_cache_query(messages: List[Dict[str, Any]], use_cache: Optional[bool],
+                          user_id: Optional[str] = None) -> Optional[str]:
+    """
+    Get the question to look up in the semantic cache.
+
+    Only single-turn requests are eligible: with earlier turns in the
+    conversation, a paraphrase match says nothing about the right answer.
+    Requests with a user_id are not either, since their prompt carries that
+    user's retrieved conversation history.
+    """
+    if use_cache is False or user_id or len(messages) != 1 or messages[0].get("role") != "user":
+        return None
+    return messages[0].get("content") or None
+
+
+def _semantic_cache_scope(task_type: str, options: Optional[Dict[str, Any]]) -> str:
+    """Hash of the task type and caller options, which shape the answer as much as the question does."""
+    return make_cache_key("semantic", task_type, options or {})
+
 
 # --- Endpoints ---
 @app.get("/")
@@ -220,14 +495,26 @@ async def health():
             "critical_dependencies": "unknown"
         }
 
-@app.post("/analyze-image", response_model=AnalyzeImageResponse)
-async def analyze_image(request: ImageAnalysisRequest):
+
+@app.get("/ready")
+async def ready():
     """
-    Analyze an image using AI or OCR.
+    Readiness endpoint reporting which Ollama models are loaded.
+
+    Returns 503 until the startup warm-up of the primary models has finished,
+    so load balancers only send traffic once the first request will not pay a
+    model load, and while no Ollama backend is healthy. Models that have gone
+    cold since are reported in ``cold_models`` without failing the check.
     """
+    status = model_residency.get_status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+
+async def _analyze_image(image: Union[str, bytes], prompt: str) -> Dict[str, str]:
+    """Analyze a base64-encoded or raw image using AI or OCR."""
     try:
         if AI_PROVIDER == "ollama":
-            result = await analyze_image_with_ollama(request.prompt, request.imageBase64)
+            result = await analyze_image_with_ollama(prompt, image)
             return {"result": result}
         elif AI_PROVIDER == "openai":
             # This branch would be for direct OpenAI image analysis if this service was to handle it.
@@ -236,14 +523,33 @@ async def analyze_image(request: ImageAnalysisRequest):
                                 detail="OpenAI image analysis not directly implemented in ai-service. Backend should handle OpenAI or proxy here if configured.")
         else:
             # Fallback to OCR based analysis for generic images if AI_PROVIDER is not recognized or is for OCR
-            image_bytes = base64.b64decode(request.imageBase64)
+            image_bytes = base64.b64decode(image) if isinstance(image, str) else image
             analysis = await analyze_image_with_ocr(image_bytes)
             return {
                 "result": f"OCR Text: {analysis['ocr_text']}. Parsed Dimensions: {analysis['parsed_dimensions']}"
             }
+    except OllamaOverloadedError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Image analysis error: {str(e)}")
 
+@app.post("/analyze-image", response_model=AnalyzeImageResponse)
+async def analyze_image(request: ImageAnalysisRequest):
+    """
+    Analyze an image using AI or OCR.
+    """
+    return await _analyze_image(request.imageBase64, request.prompt)
+
+@app.post("/analyze-image/upload", response_model=AnalyzeImageResponse)
+async def analyze_image_upload(request: Request):
+    """
+    Analyze an image sent as a binary upload (multipart ``file`` or raw body).
+
+    Query or form parameters: ``prompt``.
+    """
+    image_bytes, params = await _read_upload(request)
+    return await _analyze_image(image_bytes, params.get("prompt", "Analyze this image"))
+
 @app.post("/bot-query", response_model=BotQueryResponse)
 async def bot_query(request: BotQueryRequest):
     """
@@ -251,8 +557,11 @@ async def bot_query(request: BotQueryRequest):
     """
     try:
         if AI_PROVIDER == "ollama":
-            response_content = await chat_with_ollama(request.messages, request.options)
-            return {"response": response_content}
+            prompt = prompt_assembler.assemble(request.messages, OLLAMA_MODEL_NAME)
+            response_content = await chat_with_ollama(
+                prompt.messages, request.options, use_cache=request.use_cache
+            )
+            return {"response": response_content, "tokens_dropped": prompt.tokens_dropped}
         elif AI_PROVIDER == "openai":
             # This branch would be for direct OpenAI chat if this service was to handle it.
             # For this setup, we assume the backend handles OpenAI calls directly.
@@ -260,10 +569,29 @@ async def bot_query(request: BotQueryRequest):
                                 detail="OpenAI chat not directly implemented in ai-service. Backend should handle OpenAI or proxy here if configured.")
         else:
             return {"response": "AI_PROVIDER not configured for chat or an unknown provider is set."}
+    except OllamaOverloadedError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
 
 
+@app.post("/bot-query/stream")
+async def bot_query_stream(request: BotQueryRequest):
+    """
+    Query the chatbot and stream the reply as Server-Sent Events.
+
+    Emits ``delta`` events with each chunk of content and a final ``done``
+    event with Ollama's eval statistics.
+    """
+    if AI_PROVIDER != "ollama":
+        raise HTTPException(status_code=501, detail="Streaming chat is only available with the ollama provider.")
+    prompt = prompt_assembler.assemble(request.messages, OLLAMA_MODEL_NAME)
+    return await _sse_response(
+        stream_chat_with_ollama(prompt.messages, options=request.options),
+        headers={"X-Prompt-Tokens-Dropped": str(prompt.tokens_dropped)},
+    )
+
+
 @app.post("/enhance-image", response_model=EnhanceImageResponse)
 async def enhance_image(request: EnhanceImageRequest):
     """
@@ -277,6 +605,23 @@ async def enhance_image(request: EnhanceImageRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Image enhancement error: {str(e)}")
 
+@app.post("/enhance-image/upload", response_model=EnhanceImageResponse)
+async def enhance_image_upload(request: Request):
+    """
+    Enhance an image sent as a binary upload (multipart ``file`` or raw body).
+
+    Returns the enhanced image bytes, or base64 JSON with ``response_format=json``.
+    """
+    image_bytes, params = await _read_upload(request)
+    binary = _wants_binary(params)
+    try:
+        enhanced_bytes = await enhance_image_with_difix(image_bytes, HF_API_TOKEN)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Image enhancement error: {str(e)}")
+    if binary:
+        return Response(content=enhanced_bytes, media_type=_image_media_type(enhanced_bytes))
+    return {"enhanced_image_base64": base64.b64encode(enhanced_bytes).decode("utf-8")}
+
 @app.post("/full-analyze")
 async def full_analyze(file: UploadFile = File(...)):
     """
@@ -362,49 +707,143 @@ async def enhanced_chat(request: EnhancedChatRequest):
     Enhanced chat with intelligent model selection and context awareness.
     """
     try:
-        # Get enhanced context if user_id provided
-        enhanced_context = None
-        if request.user_id:
-            context_data = await enhance_query_with_context(
-                request.messages[-1]["content"] if request.messages else "",
-                request.user_id
-            )
-            enhanced_context = context_data["enhanced_context"]
-
-            # Add context to messages
-            if enhanced_context:
-                context_message = {
-                    "role": "system",
-                    "content": f"Relevant context: {enhanced_context}"
+        # Serve paraphrases of already-answered questions without touching Ollama
+        semantic_query = _semantic_cache_query(request.messages, request.use_cache, request.user_id)
+        semantic_scope = _semantic_cache_scope(request.task_type, request.context)
+        if semantic_query:
+            model_name = await get_best_model_for_task(request.task_type)
+            cached = await get_vector_db_service().lookup_semantic_cache(semantic_query, model_name, semantic_scope)
+            if cached:
+                return {
+                    "response": cached["answer"],
+                    "model_used": model_name,
+                    "enhanced_context": None,
+                    "semantic_cache_hit": True
                 }
-                request.messages.insert(0, context_message)
 
-        # Use enhanced chat with context
-        response = await enhanced_chat_with_context(
-            request.messages, 
+        # Get enhanced context if user_id provided and fit the prompt to the context window
+        enhanced_context, prompt = await _assemble_enhanced_prompt(request)
+
+        # Use enhanced chat with context; the chat call reports the model it resolved
+        response, model_used = await enhanced_chat_with_model(
+            prompt.messages,
             request.task_type, 
-            request.context or {}
+            request.context or {},
+            use_cache=request.use_cache,
+            session_id=request.user_id
         )
 
-        # Get the model that was used
-        model_used = await get_best_model_for_task(request.task_type)
+        if semantic_query:
+            await get_vector_db_service().store_semantic_cache(semantic_query, response, model_used, semantic_scope)
 
         return {
             "response": response,
             "model_used": model_used,
-            "enhanced_context": enhanced_context
+            "enhanced_context": enhanced_context,
+            "tokens_dropped": prompt.tokens_dropped
         }
+    except OllamaOverloadedError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Enhanced chat error: {str(e)}")
 
 
+@app.post("/enhanced-chat/stream")
+async def enhanced_chat_stream(request: EnhancedChatRequest):
+    """
+    Enhanced chat streamed as Server-Sent Events.
+
+    Emits a ``start`` event with the selected model, injected context and
+    tokens trimmed from the prompt, ``delta`` events with each chunk of content, and a final ``done`` event
+    with Ollama's eval statistics.
+    """
+    try:
+        enhanced_context, prompt = await _assemble_enhanced_prompt(request)
+    except OllamaOverloadedError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Enhanced chat error: {str(e)}")
+
+    async def events():
+        async for event in stream_enhanced_chat_with_context(
+            prompt.messages,
+            request.task_type,
+            request.context or {},
+            session_id=request.user_id
+        ):
+            if event["type"] == "start":
+                event = {**event, "enhanced_context": enhanced_context, "tokens_dropped": prompt.tokens_dropped}
+            yield event
+
+    return await _sse_response(events())
+
+
+@app.post("/sessions")
+async def create_session(request: SessionCreateRequest):
+    """
+    Start a server-side conversation; later turns only send the new message.
+    """
+    return (await session_store.create(request.task_type, request.user_id, request.system)).to_dict()
+
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    """
+    Get a session's conversation history.
+    """
+    return (await _get_session(session_id)).to_dict()
+
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    """
+    End a session.
+    """
+    if not await session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found or expired")
+    return {"deleted": True}
+
+
+@app.post("/sessions/{session_id}/messages", response_model=SessionMessageResponse)
+async def session_message(session_id: str, request: SessionMessageRequest):
+    """
+    Append a user turn to a session and return the reply.
+    """
+    session = await _get_session(session_id)
+    try:
+        result = {"response": ""}
+        async for event in stream_session_reply(session, request.content):
+            if event["type"] == "start":
+                result.update(model_used=event["model"], context_reused=event["context_reused"],
+                              tokens_dropped=event["tokens_dropped"])
+            elif event["type"] == "delta":
+                result["response"] += event["content"]
+        return result
+    except OllamaOverloadedError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Session chat error: {str(e)}")
+
+
+@app.post("/sessions/{session_id}/messages/stream")
+async def session_message_stream(session_id: str, request: SessionMessageRequest):
+    """
+    Append a user turn to a session and stream the reply as Server-Sent Events.
+
+    Emits a ``start`` event with the selected model, whether Ollama's context was
+    reused and tokens trimmed from the prompt, ``delta`` events with each chunk of
+    content, and a final ``done`` event with Ollama's eval statistics.
+    """
+    session = await _get_session(session_id)
+    return await _sse_response(stream_session_reply(session, request.content))
+
+
 @app.post("/difix-enhance", response_model=DifixEnhanceResponse)
 async def difix_enhance_3d(request: DifixEnhanceRequest):
     """
     Enhance 3D deck renderings using NVIDIA Difix model.
     """
     try:
-        import time
         start_time = time.time()
 
         # Decode image
@@ -427,17 +866,45 @@ async def difix_enhance_3d(request: DifixEnhanceRequest):
         raise HTTPException(status_code=500, detail=f"Difix enhancement error: {str(e)}")
 
 
-@app.post("/transcribe-voice", response_model=VoiceTranscriptionResponse)
-async def transcribe_voice(request: VoiceTranscriptionRequest):
+@app.post("/difix-enhance/upload", response_model=DifixEnhanceResponse)
+async def difix_enhance_3d_upload(request: Request):
     """
-    Transcribe voice commands for deck design workflow.
+    Enhance a 3D deck rendering sent as a binary upload (multipart ``file`` or raw body).
+
+    Query or form parameters: ``quality_level``, ``enhancement_type`` and
+    ``response_format``. Returns the enhanced image bytes, with the enhancement
+    type and processing time in ``X-Enhancement-Type`` / ``X-Processing-Time``
+    headers, or base64 JSON with ``response_format=json``.
     """
+    image_bytes, params = await _read_upload(request)
+    binary = _wants_binary(params)
+    enhancement_type = params.get("enhancement_type", "artifact_removal")
+    try:
+        start_time = time.time()
+        enhanced_bytes = await enhance_deck_3d_preview(image_bytes, params.get("quality_level", "high"))
+        processing_time = time.time() - start_time
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Difix enhancement error: {str(e)}")
+    if binary:
+        return Response(content=enhanced_bytes, media_type=_image_media_type(enhanced_bytes), headers={
+            "X-Enhancement-Type": enhancement_type,
+            "X-Processing-Time": f"{processing_time:.3f}",
+        })
+    return {
+        "enhanced_image_base64": base64.b64encode(enhanced_bytes).decode("utf-8"),
+        "enhancement_type": enhancement_type,
+        "processing_time": processing_time
+    }
+
+
+async def _transcribe_voice(audio: Union[str, bytes], context: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Transcribe a base64-encoded or raw voice command."""
     try:
         # Decode audio
-        audio_bytes = base64.b64decode(request.audioBase64)
+        audio_bytes = base64.b64decode(audio) if isinstance(audio, str) else audio
 
         # Process voice interaction
-        result = await process_voice_interaction(audio_bytes, request.context)
+        result = await process_voice_interaction(audio_bytes, context)
 
         return {
             "transcribed_text": result["original_text"],
@@ -449,6 +916,25 @@ async def transcribe_voice(request: VoiceTranscriptionRequest):
         raise HTTPException(status_code=500, detail=f"Voice transcription error: {str(e)}")
 
 
+@app.post("/transcribe-voice", response_model=VoiceTranscriptionResponse)
+async def transcribe_voice(request: VoiceTranscriptionRequest):
+    """
+    Transcribe voice commands for deck design workflow.
+    """
+    return await _transcribe_voice(request.audioBase64, request.context)
+
+
+@app.post("/transcribe-voice/upload", response_model=VoiceTranscriptionResponse)
+async def transcribe_voice_upload(request: Request):
+    """
+    Transcribe a voice command sent as a binary upload (multipart ``file`` or raw body).
+
+    Query or form parameters: ``context``, a JSON object.
+    """
+    audio_bytes, params = await _read_upload(request)
+    return await _transcribe_voice(audio_bytes, _json_param(params, "context"))
+
+
 @app.post("/search-knowledge", response_model=KnowledgeSearchResponse)
 async def search_knowledge(request: KnowledgeSearchRequest):
     """
@@ -460,59 +946,124 @@ async def search_knowledge(request: KnowledgeSearchRequest):
 
         return {
             "results": context_data["relevant_knowledge"][:request.n_results],
-            "enhanced_context": context_data["enhanced_context"]
+            "enhanced_context": context_data["enhanced_context"],
+            "timings": context_data["timings"]
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Knowledge search error: {str(e)}")
 
 
-@app.post("/analyze-blueprint-enhanced", response_model=BlueprintAnalysisResponse)
-async def analyze_blueprint_enhanced(request: BlueprintAnalysisRequest):
+@app.post("/ingest-knowledge")
+async def ingest_knowledge(request: KnowledgeIngestRequest):
     """
-    Enhanced blueprint analysis with multimodal AI and context storage.
+    Bulk-load text, Markdown and PDF documents into the deck knowledge collection.
+
+    Paths are resolved under KNOWLEDGE_INGEST_DIR. The run is checkpointed, so
+    repeating a request after an interruption picks up where it stopped.
     """
+    root = os.path.realpath(KNOWLEDGE_INGEST_DIR)
+    paths = [os.path.realpath(os.path.join(root, path)) for path in request.paths]
+    if any(os.path.commonpath([root, path]) != root for path in paths):
+        raise HTTPException(status_code=400, detail="Paths must be inside the knowledge ingest directory")
+    missing = [name for name, path in zip(request.paths, paths) if not os.path.exists(path)]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Not found: {', '.join(missing)}")
+    if not get_vector_db_service().is_available:
+        raise HTTPException(status_code=503, detail="Vector database is not available")
+    if ingestion_lock.locked():
+        raise HTTPException(status_code=409, detail="An ingestion is already running")
+
     try:
-        # Analyze image with enhanced multimodal
-        analysis_result = await analyze_image_with_enhanced_multimodal(
-            "Analyze this deck blueprint and extract all relevant information including dimensions, materials, and structural elements.",
-            request.imageBase64,
-            request.analysis_type
-        )
+        ingestor = KnowledgeIngestor(get_vector_db_service(), category=request.category,
+                                     chunk_words=request.chunk_words, overlap_words=request.overlap_words)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    async with ingestion_lock:
+        try:
+            return await ingestor.ingest(paths)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Knowledge ingestion error: {str(e)}")
+
+
+async def _analyze_blueprint(image: Union[str, bytes], analysis_type: str, user_id: Optional[str]) -> Dict[str, Any]:
+    """
+    Run the enhanced blueprint analysis on a base64-encoded or raw image.
+
+    The analysis and extracted data are cached by image content, analysis
+    type, prompt and model, so a re-uploaded blueprint skips the model call.
+    """
+    try:
+        prompt = "Analyze this deck blueprint and extract all relevant information including dimensions, materials, and structural elements."
+        image_bytes = base64.b64decode(image) if isinstance(image, str) else image
+        model_name = await get_best_model_for_task("multimodal")
+        cache_key = blueprint_cache_key(image_bytes, analysis_type, prompt, model_name)
+        cached = await blueprint_cache.aget(cache_key)
+        if cached is not None:
+            analysis_result, extracted_data = cached["analysis_result"], cached["extracted_data"]
+        else:
+            # Analyze image with enhanced multimodal
+            analysis_result = await analyze_image_with_enhanced_multimodal(
+                prompt, image_bytes, analysis_type, model_name=model_name
+            )
+
+            # Extract structured data (basic parsing)
+            extracted_data = {
+                "analysis_type": analysis_type,
+                "has_dimensions": "dimension" in analysis_result.lower() or "feet" in analysis_result.lower(),
+                "has_materials": "wood" in analysis_result.lower() or "composite" in analysis_result.lower(),
+                "complexity": "high" if len(analysis_result) > 500 else "medium" if len(analysis_result) > 200 else "low"
+            }
+            await blueprint_cache.aset(cache_key, {"analysis_result": analysis_result, "extracted_data": extracted_data})
 
         # Search for similar blueprints
-        similar_blueprints = await vector_db_service.search_similar_blueprints(
+        similar_blueprints = await get_vector_db_service().search_similar_blueprints(
             analysis_result, n_results=3
         )
 
         # Store analysis for future reference
-        if request.user_id:
+        if user_id:
             analysis_data = {
                 "description": analysis_result,
-                "analysis_type": request.analysis_type,
-                "user_id": request.user_id,
+                "analysis_type": analysis_type,
+                "user_id": user_id,
                 "timestamp": str(time.time())
             }
-            await vector_db_service.store_blueprint_analysis(analysis_data)
-
-        # Extract structured data (basic parsing)
-        extracted_data = {
-            "analysis_type": request.analysis_type,
-            "has_dimensions": "dimension" in analysis_result.lower() or "feet" in analysis_result.lower(),
-            "has_materials": "wood" in analysis_result.lower() or "composite" in analysis_result.lower(),
-            "complexity": "high" if len(analysis_result) > 500 else "medium" if len(analysis_result) > 200 else "low"
-        }
+            await get_vector_db_service().store_blueprint_analysis(analysis_data)
 
         return {
             "analysis_result": analysis_result,
             "extracted_data": extracted_data,
-            "similar_blueprints": similar_blueprints
+            "similar_blueprints": similar_blueprints,
+            "cache_hit": cached is not None
         }
+    except OllamaOverloadedError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Enhanced blueprint analysis error: {str(e)}")
 
 
+@app.post("/analyze-blueprint-enhanced", response_model=BlueprintAnalysisResponse)
+async def analyze_blueprint_enhanced(request: BlueprintAnalysisRequest):
+    """
+    Enhanced blueprint analysis with multimodal AI and context storage.
+    """
+    return await _analyze_blueprint(request.imageBase64, request.analysis_type, request.user_id)
+
+
+@app.post("/analyze-blueprint-enhanced/upload", response_model=BlueprintAnalysisResponse)
+async def analyze_blueprint_enhanced_upload(request: Request):
+    """
+    Enhanced blueprint analysis of an image sent as a binary upload (multipart ``file`` or raw body).
+
+    Query or form parameters: ``analysis_type`` and ``user_id``.
+    """
+    image_bytes, params = await _read_upload(request)
+    return await _analyze_blueprint(image_bytes, params.get("analysis_type", "blueprint"), params.get("user_id"))
+
+
 @app.post("/deck-design-query")
-async def deck_design_query(query: str = Form(...), context: Optional[str] = Form(None)):
+async def deck_design_query(query: str = Form(...), context: Optional[str] = Form(None),
+                            use_cache: Optional[bool] = Form(None)):
     """
     Process deck design queries with reasoning-optimized models.
     """
@@ -526,10 +1077,25 @@ async def deck_design_query(query: str = Form(...), context: Optional[str] = For
             except json.JSONDecodeError:
                 context_dict = {"raw_context": context}
 
-        # Process query
-        response = await process_deck_design_query(query, context_dict)
-
-        return {"response": response}
+        # Queries without per-request context can be answered from the semantic cache
+        semantic_query = query if not context_dict and use_cache is not False else None
+        semantic_scope = _semantic_cache_scope("reasoning", None)
+        if semantic_query:
+            model_name = await get_best_model_for_task("reasoning")
+            cached = await get_vector_db_service().lookup_semantic_cache(semantic_query, model_name, semantic_scope)
+            if cached:
+                return {"response": cached["answer"], "model_used": model_name, "semantic_cache_hit": True}
+
+        # Process query; the answer is cached under the model that produced it, which may be the fallback
+        response, model_used = await process_deck_design_query_with_model(query, context_dict,
+                                                                          use_cache=use_cache)
+
+        if semantic_query:
+            await get_vector_db_service().store_semantic_cache(semantic_query, response, model_used, semantic_scope)
+
+        return {"response": response, "model_used": model_used, "semantic_cache_hit": False}
+    except OllamaOverloadedError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Deck design query error: {str(e)}")
 
@@ -543,7 +1109,7 @@ async def get_ai_capabilities():
         # Get model information
         whisper_info = await whisper_service.get_model_info()
         difix_available = difix_service.is_available()
-        vector_db_stats = vector_db_service.get_collection_stats()
+        vector_db_stats = await get_vector_db_service().get_collection_stats()
 
         return {
             "enhanced_models": {
@@ -569,3 +1135,25 @@ async def get_ai_capabilities():
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting AI capabilities: {str(e)}")
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Get runtime counters for the service's caches and queues.
+    """
+    return {
+        "model_registry": model_registry.get_stats(),
+        "response_cache": response_cache.get_stats(),
+        "blueprint_cache": blueprint_cache.get_stats(),
+        "semantic_cache": await get_vector_db_service().get_semantic_cache_stats(),
+        "embeddings": get_vector_db_service().get_embedding_stats(),
+        "single_flight": single_flight.get_stats(),
+        "ollama_queues": admission_controller.get_stats(),
+        "ollama_backends": backend_pool.get_stats(),
+        "model_scheduler": model_scheduler.get_stats(),
+        "circuit_breakers": circuit_breakers.get_stats(),
+        "prompt_assembly": prompt_assembler.get_stats(),
+        "sessions": session_store.get_stats(),
+        "vision_preprocessing": vision_preprocessor.get_stats(),
+    }
@@ -0,0 +1,121 @@
+"""
+Model Registry
+
+This module caches the set of models installed on Ollama so model selection
+does not hit /api/tags on every request. The cache has a TTL, can be kept warm
+by a background refresh task, and is invalidated when Ollama reports that a
+model is missing.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+MODEL_REGISTRY_TTL = float(os.getenv("MODEL_REGISTRY_TTL", "60.0"))
+MODEL_REGISTRY_REFRESH_INTERVAL = float(os.getenv("MODEL_REGISTRY_REFRESH_INTERVAL", "30.0"))
+
+
+class ModelRegistry:
+    """TTL cache of installed Ollama models with hit/miss accounting."""
+
+    def __init__(self, fetch_models: Callable[[], Awaitable[List[str]]],
+                 ttl_seconds: float = MODEL_REGISTRY_TTL,
+                 refresh_interval: float = MODEL_REGISTRY_REFRESH_INTERVAL):
+        """
+        Initialize the registry.
+
+        Args:
+            fetch_models (Callable[[], Awaitable[List[str]]]): Coroutine returning installed model names.
+            ttl_seconds (float): How long a fetched model list stays valid.
+            refresh_interval (float): Period of the background refresh task.
+        """
+        self.fetch_models = fetch_models
+        self.ttl_seconds = ttl_seconds
+        self.refresh_interval = refresh_interval
+        self._models: Optional[Set[str]] = None
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.invalidations = 0
+
+    def _is_fresh(self) -> bool:
+        return self._models is not None and (time.monotonic() - self._fetched_at) < self.ttl_seconds
+
+    async def get_models(self) -> Optional[Set[str]]:
+        """
+        Get the installed models, fetching them only when the cache is stale.
+
+        Returns:
+            Optional[Set[str]]: Installed model names, or None if Ollama could not be reached.
+        """
+        if self._is_fresh():
+            self.hits += 1
+            return self._models
+
+        async with self._lock:
+            # Another request may have refreshed while we waited for the lock
+            if self._is_fresh():
+                self.hits += 1
+                return self._models
+            self.misses += 1
+            return await self._refresh_locked()
+
+    async def refresh(self) -> Optional[Set[str]]:
+        """Force a refresh of the installed model list."""
+        async with self._lock:
+            return await self._refresh_locked()
+
+    async def _refresh_locked(self) -> Optional[Set[str]]:
+        try:
+            models = await self.fetch_models()
+        except Exception:
+            self.refresh_errors += 1
+            return None
+        self._models = set(models)
+        self._fetched_at = time.monotonic()
+        self.refreshes += 1
+        return self._models
+
+    def invalidate(self):
+        """Drop the cached model list, e.g. after a model-not-found error."""
+        self._models = None
+        self._fetched_at = 0.0
+        self.invalidations += 1
+
+    async def _refresh_loop(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_interval)
+
+    async def start_background_refresh(self):
+        """Start keeping the cache warm in the background."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop_background_refresh(self):
+        """Stop the background refresh task."""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache counters and the currently known models."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "invalidations": self.invalidations,
+            "cached_models": sorted(self._models) if self._models is not None else [],
+            "age_seconds": round(time.monotonic() - self._fetched_at, 3) if self._models is not None else None,
+            "background_refresh": self._refresh_task is not None and not self._refresh_task.done(),
+        }
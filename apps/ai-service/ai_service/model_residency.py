@@ -0,0 +1,187 @@
+"""
+Model Residency
+
+This module keeps the configured Ollama models loaded in memory. At startup
+each model is pre-warmed with an empty generate so the first user request does
+not pay the model load, and a background task re-sends keep_alive for models
+that saw traffic recently so they are not unloaded between requests. The
+service is ready once warm-up has finished and Ollama is reachable; models
+that are cold (never used, expired, or not installed) are reported as detail.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# How long Ollama should keep a model loaded after each request (seconds)
+OLLAMA_KEEP_ALIVE = int(os.getenv("OLLAMA_KEEP_ALIVE", "1800"))
+MODEL_RESIDENCY_REFRESH_INTERVAL = float(os.getenv("MODEL_RESIDENCY_REFRESH_INTERVAL", "300.0"))
+# Models used within this many seconds keep getting their keep_alive refreshed
+MODEL_RESIDENCY_ACTIVE_WINDOW = float(os.getenv("MODEL_RESIDENCY_ACTIVE_WINDOW", "3600.0"))
+
+
+class _ModelState:
+    """Residency bookkeeping for one model."""
+
+    def __init__(self):
+        self.loaded_at: Optional[float] = None  # Last warm-up or request Ollama served
+        self.last_used: Optional[float] = None  # Last user request
+        self.warmups = 0
+        self.warmup_errors = 0
+        self.last_error: Optional[str] = None
+        self.warmup_seconds: Optional[float] = None
+
+
+class ModelResidencyManager:
+    """Pre-warms models and refreshes keep_alive for the ones in use."""
+
+    def __init__(self, warm_model: Callable[[str], Awaitable[None]], models: List[str],
+                 is_reachable: Callable[[], bool] = lambda: True,
+                 keep_alive: int = OLLAMA_KEEP_ALIVE,
+                 refresh_interval: float = MODEL_RESIDENCY_REFRESH_INTERVAL,
+                 active_window: float = MODEL_RESIDENCY_ACTIVE_WINDOW):
+        """
+        Initialize the manager.
+
+        Args:
+            warm_model (Callable[[str], Awaitable[None]]): Coroutine that loads a model with keep_alive.
+            models (List[str]): Models to pre-warm at startup; readiness waits for their warm-up.
+            is_reachable (Callable[[], bool]): Whether Ollama can currently serve requests.
+            keep_alive (int): Seconds Ollama keeps a model loaded after a request.
+            refresh_interval (float): Period of the keep-alive refresh task.
+            active_window (float): Models used within this many seconds are kept loaded.
+        """
+        self.warm_model = warm_model
+        self.models = list(dict.fromkeys(models))
+        self.is_reachable = is_reachable
+        self.keep_alive = keep_alive
+        self.refresh_interval = refresh_interval
+        self.active_window = active_window
+        self._states: Dict[str, _ModelState] = {model: _ModelState() for model in self.models}
+        self._task: Optional[asyncio.Task] = None
+        self.warmup_complete = False
+
+    def _state(self, model: str) -> _ModelState:
+        if model not in self._states:
+            self._states[model] = _ModelState()
+        return self._states[model]
+
+    def record_use(self, model: str):
+        """Note that a request for the model was served; Ollama restarted its keep_alive timer."""
+        state = self._state(model)
+        now = time.monotonic()
+        state.last_used = now
+        state.loaded_at = now
+
+    def is_hot(self, model: str) -> bool:
+        """Whether the model is expected to still be loaded on Ollama."""
+        state = self._states.get(model)
+        return (state is not None and state.loaded_at is not None
+                and (time.monotonic() - state.loaded_at) < self.keep_alive)
+
+    async def warm(self, model: str) -> bool:
+        """
+        Load a model, or extend its keep_alive if it is already loaded.
+
+        Args:
+            model (str): The model to warm.
+
+        Returns:
+            bool: True if Ollama accepted the request.
+        """
+        state = self._state(model)
+        started = time.monotonic()
+        try:
+            await self.warm_model(model)
+        except Exception as e:
+            state.warmup_errors += 1
+            state.last_error = str(e)
+            return False
+        state.loaded_at = time.monotonic()
+        state.warmup_seconds = round(state.loaded_at - started, 3)
+        state.warmups += 1
+        state.last_error = None
+        return True
+
+    async def warm_all(self) -> Dict[str, bool]:
+        """Warm every configured model one at a time so loads do not compete for memory."""
+        results = {}
+        for model in self.models:
+            results[model] = await self.warm(model)
+        self.warmup_complete = True
+        return results
+
+    def _due_for_refresh(self, model: str, now: float) -> bool:
+        state = self._states[model]
+        if state.last_used is None or (now - state.last_used) > self.active_window:
+            return False
+        # Refresh once half the keep_alive has elapsed, well before Ollama unloads it
+        return state.loaded_at is None or (now - state.loaded_at) >= self.keep_alive / 2
+
+    async def refresh(self) -> List[str]:
+        """
+        Re-send keep_alive for recently used models.
+
+        Returns:
+            List[str]: The models that were refreshed.
+        """
+        now = time.monotonic()
+        due = [model for model in list(self._states) if self._due_for_refresh(model, now)]
+        for model in due:
+            await self.warm(model)
+        return due
+
+    async def _run(self):
+        await self.warm_all()
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.refresh()
+
+    async def start(self):
+        """Warm the configured models and start the keep-alive refresh task."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Report which models are hot.
+
+        Returns:
+            Dict[str, Any]: ``ready`` is True once warm-up has finished and Ollama is
+            reachable. A configured model that is not hot does not make the service
+            unready, since an unused model is expected to expire; it is listed in
+            ``cold_models``. ``models`` has per-model detail.
+        """
+        now = time.monotonic()
+        models = {}
+        for model, state in self._states.items():
+            models[model] = {
+                "hot": self.is_hot(model),
+                "required": model in self.models,
+                "seconds_since_load": round(now - state.loaded_at, 3) if state.loaded_at is not None else None,
+                "seconds_since_use": round(now - state.last_used, 3) if state.last_used is not None else None,
+                "warmups": state.warmups,
+                "warmup_errors": state.warmup_errors,
+                "warmup_seconds": state.warmup_seconds,
+                "last_error": state.last_error,
+            }
+        reachable = self.is_reachable()
+        return {
+            "ready": self.warmup_complete and reachable,
+            "warmup_complete": self.warmup_complete,
+            "ollama_reachable": reachable,
+            "cold_models": [model for model in self.models if not self.is_hot(model)],
+            "keep_alive_seconds": self.keep_alive,
+            "models": models,
+        }
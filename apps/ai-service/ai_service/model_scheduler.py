@@ -0,0 +1,204 @@
+"""
+Model-Affinity Scheduling
+
+This module orders Ollama requests so that a memory-constrained Ollama host
+serves one model at a time. Requests for the model that is currently loaded
+run immediately; requests for other models wait and are released together once
+the current batch drains. A batch stops accepting newcomers once it has served
+a fixed number of requests or another model has waited past a latency budget,
+so no model is starved. Priority requests (hedges and fallbacks, which exist
+to avoid waiting on a slow model) start at once alongside the running batch.
+Swap counts are recorded to show the thrash reduction.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Tuple
+
+OLLAMA_AFFINITY_SCHEDULING = os.getenv("OLLAMA_AFFINITY_SCHEDULING", "true").lower() == "true"
+# Requests a batch may admit while other models are waiting
+OLLAMA_AFFINITY_MAX_BATCH = int(os.getenv("OLLAMA_AFFINITY_MAX_BATCH", "16"))
+# Seconds another model may wait before the current batch stops admitting newcomers
+OLLAMA_AFFINITY_MAX_WAIT = float(os.getenv("OLLAMA_AFFINITY_MAX_WAIT", "2.0"))
+
+# Number of recent batch sizes kept for statistics
+_SAMPLE_WINDOW = 256
+
+
+class _Lane:
+    """Scheduling state for one Ollama host."""
+
+    def __init__(self):
+        self.active_model: Optional[str] = None
+        self.in_flight = 0
+        self.batch_served = 0
+        self.waiters: Dict[str, Deque[Tuple[float, asyncio.Future]]] = {}
+        self.last_arrival: Optional[str] = None
+        self.swaps = 0
+        self.arrival_swaps = 0
+        self.priority_admits = 0
+        self.batch_sizes: Deque[int] = deque(maxlen=_SAMPLE_WINDOW)
+
+    def oldest_wait(self, exclude: Optional[str] = None) -> Optional[float]:
+        """Enqueue time of the oldest live waiter, ignoring one model."""
+        oldest = None
+        for model, queue in self.waiters.items():
+            if model == exclude:
+                continue
+            for enqueued, waiter in queue:
+                if not waiter.done():
+                    if oldest is None or enqueued < oldest:
+                        oldest = enqueued
+                    break
+        return oldest
+
+
+class ModelAffinityScheduler:
+    """Groups Ollama requests by model and drains them in bounded batches."""
+
+    def __init__(self, enabled: bool = OLLAMA_AFFINITY_SCHEDULING,
+                 max_batch: int = OLLAMA_AFFINITY_MAX_BATCH,
+                 max_wait: float = OLLAMA_AFFINITY_MAX_WAIT):
+        """
+        Initialize the scheduler.
+
+        Args:
+            enabled (bool): When False requests pass straight through; swaps are still counted.
+            max_batch (int): Requests a batch may admit while other models are waiting.
+            max_wait (float): Seconds another model may wait before the batch closes to newcomers.
+        """
+        self.enabled = enabled
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._lanes: Dict[str, _Lane] = {}
+
+    def _lane_for(self, lane: str) -> _Lane:
+        if lane not in self._lanes:
+            self._lanes[lane] = _Lane()
+        return self._lanes[lane]
+
+    def _batch_closed(self, lane: _Lane) -> bool:
+        """Whether the active batch must stop admitting newcomers so others can run."""
+        oldest = lane.oldest_wait(exclude=lane.active_model)
+        if oldest is None:
+            return False
+        return lane.batch_served >= self.max_batch or (time.monotonic() - oldest) >= self.max_wait
+
+    def _activate(self, lane: _Lane, model: str):
+        if lane.active_model != model:
+            if lane.active_model is not None:
+                lane.swaps += 1
+                lane.batch_sizes.append(lane.batch_served)
+            lane.active_model = model
+            lane.batch_served = 0
+
+    def _admit(self, lane: _Lane, model: str):
+        self._activate(lane, model)
+        lane.in_flight += 1
+        lane.batch_served += 1
+
+    async def acquire(self, model: str, lane: str = "default", priority: bool = False):
+        """
+        Wait until the model's batch is scheduled on the lane.
+
+        Args:
+            model (str): The requested model.
+            lane (str): The Ollama host.
+            priority (bool): Start at once, next to the running batch, without taking the lane over.
+        """
+        state = self._lane_for(lane)
+        if state.last_arrival is not None and state.last_arrival != model:
+            state.arrival_swaps += 1
+        state.last_arrival = model
+
+        if not self.enabled or (state.in_flight == 0 and state.oldest_wait() is None):
+            self._admit(state, model)
+            return
+        if priority:
+            # Counted in flight so the next batch still waits for it, but the active batch is untouched
+            state.in_flight += 1
+            state.priority_admits += 1
+            return
+        if model == state.active_model and state.in_flight > 0 and not self._batch_closed(state):
+            self._admit(state, model)
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        state.waiters.setdefault(model, deque()).append((time.monotonic(), waiter))
+        if state.in_flight == 0:
+            self._dispatch(state)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(model, lane)
+            else:
+                waiter.cancel()
+            raise
+
+    def release(self, model: str, lane: str = "default"):
+        """Finish a request; when the batch drains, start the next model's batch."""
+        state = self._lane_for(lane)
+        state.in_flight -= 1
+        if self.enabled and state.in_flight == 0:
+            self._dispatch(state)
+
+    def _dispatch(self, lane: _Lane):
+        for model, queue in list(lane.waiters.items()):
+            lane.waiters[model] = deque(entry for entry in queue if not entry[1].done())
+        pending = {model: queue for model, queue in lane.waiters.items() if queue}
+        if not pending:
+            return
+
+        # The active model only goes again when nobody else is waiting
+        others = [model for model in pending if model != lane.active_model]
+        candidates = others or list(pending)
+        next_model = min(candidates, key=lambda model: pending[model][0][0])
+
+        queue = pending[next_model]
+        while queue:
+            _, waiter = queue.popleft()
+            self._admit(lane, next_model)
+            waiter.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, model: str, lane: str = "default", priority: bool = False) -> AsyncIterator[None]:
+        """Hold the lane for a model for the duration of the block."""
+        await self.acquire(model, lane, priority)
+        try:
+            yield
+        finally:
+            self.release(model, lane)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get swap counts and queue depths per lane."""
+        lanes = {}
+        for name, lane in self._lanes.items():
+            sizes = list(lane.batch_sizes)
+            lanes[name] = {
+                "active_model": lane.active_model,
+                "in_flight": lane.in_flight,
+                "queued": {
+                    model: sum(1 for _, waiter in queue if not waiter.done())
+                    for model, queue in lane.waiters.items()
+                },
+                "swaps": lane.swaps,
+                "arrival_swaps": lane.arrival_swaps,
+                "priority_admits": lane.priority_admits,
+                "avg_batch_size": round(sum(sizes) / len(sizes), 2) if sizes else None,
+            }
+        return {
+            "enabled": self.enabled,
+            "max_batch": self.max_batch,
+            "max_wait_seconds": self.max_wait,
+            "swaps": sum(lane.swaps for lane in self._lanes.values()),
+            "arrival_swaps": sum(lane.arrival_swaps for lane in self._lanes.values()),
+            "lanes": lanes,
+        }
+
+
+# Global instance shared by every Ollama inference call; lanes are Ollama hosts
+model_scheduler = ModelAffinityScheduler()
@@ -0,0 +1,210 @@
+"""
+Ollama Backend Pool
+
+This module spreads Ollama traffic across several Ollama hosts. Each request
+is routed to the least-loaded healthy node that has the requested model
+installed (learned from each node's /api/tags). Active health checks eject
+failing nodes and bring them back once they answer again, and requests that
+carry a session key stick to the same node so Ollama's prompt cache is reused.
+"""
+
+import asyncio
+import itertools
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set
+
+import httpx
+
+# Comma-separated list of Ollama hosts; falls back to the single OLLAMA_BASE_URL
+OLLAMA_BASE_URLS = [
+    url.strip().rstrip("/")
+    for url in os.getenv("OLLAMA_BASE_URLS", os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")).split(",")
+    if url.strip()
+]
+OLLAMA_HEALTH_CHECK_INTERVAL = float(os.getenv("OLLAMA_HEALTH_CHECK_INTERVAL", "15.0"))
+OLLAMA_HEALTH_CHECK_TIMEOUT = float(os.getenv("OLLAMA_HEALTH_CHECK_TIMEOUT", "5.0"))
+OLLAMA_NODE_FAILURE_THRESHOLD = int(os.getenv("OLLAMA_NODE_FAILURE_THRESHOLD", "3"))
+OLLAMA_STICKY_SESSION_TTL = float(os.getenv("OLLAMA_STICKY_SESSION_TTL", "1800.0"))
+OLLAMA_STICKY_SESSION_MAX = int(os.getenv("OLLAMA_STICKY_SESSION_MAX", "10000"))
+
+
+class OllamaNode:
+    """Routing state for a single Ollama host."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.healthy = True
+        self.models: Optional[Set[str]] = None  # Unknown until the first health check
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.requests = 0
+        self.failures = 0
+        self.last_check: Optional[float] = None
+
+    def has_model(self, model: str) -> bool:
+        return self.models is None or model in self.models
+
+
+class OllamaBackendPool:
+    """Least-outstanding router over a set of Ollama nodes."""
+
+    def __init__(self, urls: List[str] = OLLAMA_BASE_URLS,
+                 health_check_interval: float = OLLAMA_HEALTH_CHECK_INTERVAL,
+                 failure_threshold: int = OLLAMA_NODE_FAILURE_THRESHOLD,
+                 sticky_ttl: float = OLLAMA_STICKY_SESSION_TTL,
+                 sticky_max: int = OLLAMA_STICKY_SESSION_MAX):
+        """
+        Initialize the pool.
+
+        Args:
+            urls (List[str]): Base URLs of the Ollama nodes.
+            health_check_interval (float): Seconds between active health checks.
+            failure_threshold (int): Consecutive request failures that eject a node.
+            sticky_ttl (float): Seconds a session stays pinned to its node.
+            sticky_max (int): Maximum number of pinned sessions remembered.
+        """
+        if not urls:
+            raise ValueError("At least one Ollama backend URL is required")
+        self.nodes = [OllamaNode(url) for url in urls]
+        self.health_check_interval = health_check_interval
+        self.failure_threshold = failure_threshold
+        self.sticky_ttl = sticky_ttl
+        self.sticky_max = sticky_max
+        self._sticky: "OrderedDict[str, tuple]" = OrderedDict()
+        self._round_robin = itertools.count()
+        self._health_task: Optional[asyncio.Task] = None
+
+    def select(self, model: str, session_id: Optional[str] = None) -> OllamaNode:
+        """
+        Pick the node for a request.
+
+        Args:
+            model (str): The requested model.
+            session_id (Optional[str]): Session key for sticky routing.
+
+        Returns:
+            OllamaNode: Healthy nodes that have the model are preferred; if none
+            qualify, any healthy node, then any node at all, is used.
+        """
+        healthy = [node for node in self.nodes if node.healthy]
+        candidates = [node for node in healthy if node.has_model(model)] or healthy or self.nodes
+
+        if session_id:
+            pinned = self._sticky.get(session_id)
+            if pinned is not None:
+                node, pinned_at = pinned
+                if node in candidates and (time.monotonic() - pinned_at) < self.sticky_ttl:
+                    self._sticky.move_to_end(session_id)
+                    return node
+
+        # Least outstanding requests; rotate the starting point to spread ties
+        offset = next(self._round_robin) % len(candidates)
+        rotated = candidates[offset:] + candidates[:offset]
+        node = min(rotated, key=lambda candidate: candidate.outstanding)
+
+        if session_id:
+            self._sticky[session_id] = (node, time.monotonic())
+            self._sticky.move_to_end(session_id)
+            while len(self._sticky) > self.sticky_max:
+                self._sticky.popitem(last=False)
+        return node
+
+    @asynccontextmanager
+    async def lease(self, model: str, session_id: Optional[str] = None) -> AsyncIterator[OllamaNode]:
+        """
+        Route a request and track it as outstanding on the chosen node.
+
+        Connection errors and 5xx responses count as node failures; enough of
+        them in a row eject the node until a health check succeeds.
+        """
+        node = self.select(model, session_id)
+        node.outstanding += 1
+        node.requests += 1
+        try:
+            yield node
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404 and node.models is not None:
+                node.models.discard(model)
+            elif e.response.status_code >= 500:
+                self._record_failure(node)
+            raise
+        except httpx.TransportError:
+            self._record_failure(node)
+            raise
+        else:
+            node.consecutive_failures = 0
+        finally:
+            node.outstanding -= 1
+
+    def _record_failure(self, node: OllamaNode):
+        node.failures += 1
+        node.consecutive_failures += 1
+        if node.consecutive_failures >= self.failure_threshold:
+            node.healthy = False
+
+    async def _check_node(self, node: OllamaNode, client: httpx.AsyncClient):
+        try:
+            response = await client.get(f"{node.url}/api/tags", timeout=OLLAMA_HEALTH_CHECK_TIMEOUT)
+            response.raise_for_status()
+            node.models = {model["name"] for model in response.json().get("models", [])}
+            node.healthy = True
+            node.consecutive_failures = 0
+        except Exception:
+            node.healthy = False
+        node.last_check = time.monotonic()
+
+    async def check_health(self, client: httpx.AsyncClient):
+        """Probe every node's /api/tags, updating health and installed models."""
+        await asyncio.gather(*(self._check_node(node, client) for node in self.nodes))
+
+    def available_models(self) -> Set[str]:
+        """Models installed on at least one healthy node."""
+        models: Set[str] = set()
+        for node in self.nodes:
+            if node.healthy and node.models:
+                models |= node.models
+        return models
+
+    async def _health_loop(self, get_client: Callable[[], httpx.AsyncClient]):
+        while True:
+            await self.check_health(get_client())
+            await asyncio.sleep(self.health_check_interval)
+
+    async def start_health_checks(self, get_client: Callable[[], httpx.AsyncClient]):
+        """Start active health checks using the client returned by get_client."""
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.create_task(self._health_loop(get_client))
+
+    async def stop_health_checks(self):
+        """Stop the active health checks."""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-node routing and health state."""
+        return {
+            "nodes": [
+                {
+                    "url": node.url,
+                    "healthy": node.healthy,
+                    "outstanding": node.outstanding,
+                    "requests": node.requests,
+                    "failures": node.failures,
+                    "models": sorted(node.models) if node.models is not None else None,
+                }
+                for node in self.nodes
+            ],
+            "sticky_sessions": len(self._sticky),
+        }
+
+
+# Global instance used by ai_service.core for every Ollama call
+backend_pool = OllamaBackendPool()
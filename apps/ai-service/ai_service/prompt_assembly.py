@@ -0,0 +1,282 @@
+"""
+Prompt Assembly
+
+This module fits a chat request into the model's context window before it is
+sent to Ollama. System instructions are always kept, retrieved context is
+trimmed to what fits, and conversation turns are kept newest-first until the
+token budget is used up. Tokens are counted with a per-model tokenizer when one
+is registered or configured, and with a fast characters-per-token estimate
+otherwise. Configured tokenizers are loaded in a worker thread at startup; until
+one is ready, its model is counted with the estimate.
+
+Messages are laid out so that consecutive requests share the longest possible
+prefix and Ollama can reuse its cached prefill: static instructions first, then
+the conversation history, and only then the per-turn data (retrieved context)
+right before the latest turn.
+"""
+
+import asyncio
+import json
+import math
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Matches `num_ctx` / `num_predict` in the Modelfile
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "4096"))
+PROMPT_RESPONSE_RESERVE = int(os.getenv("PROMPT_RESPONSE_RESERVE", "512"))
+# Per-model context windows, e.g. '{"phi3:mini": 8192}'
+PROMPT_MODEL_BUDGETS = json.loads(os.getenv("PROMPT_MODEL_BUDGETS", "{}"))
+# Hugging Face tokenizers per model, e.g. '{"neural-chat": "Intel/neural-chat-7b-v3-1"}'
+PROMPT_TOKENIZERS = json.loads(os.getenv("PROMPT_TOKENIZERS", "{}"))
+
+# Approximate tokenizer: English text averages about four characters per token
+_CHARS_PER_TOKEN = 4
+# Role markers and separators the chat template adds around each message
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def approximate_token_count(text: str) -> int:
+    """Estimate the token count of text without a tokenizer."""
+    return math.ceil(len(text) / _CHARS_PER_TOKEN)
+
+
+def _load_hf_tokenizer(name: str) -> Optional[Callable[[str], int]]:
+    """Load a Hugging Face tokenizer if transformers is installed."""
+    try:
+        from transformers import AutoTokenizer
+    except ImportError:
+        return None
+    try:
+        tokenizer = AutoTokenizer.from_pretrained(name)
+    except Exception as e:
+        print(f"Warning: Could not load tokenizer {name}: {e}. Using approximate token counts.")
+        return None
+    return lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+
+
+class PromptAssembly:
+    """The messages that fit the budget and what was left out."""
+
+    def __init__(self, messages: List[Dict[str, Any]], budget: int, tokens_used: int,
+                 tokens_dropped: int, messages_dropped: int, context_truncated: bool,
+                 system_truncated: bool = False):
+        self.messages = messages
+        self.budget = budget
+        self.tokens_used = tokens_used
+        self.tokens_dropped = tokens_dropped
+        self.messages_dropped = messages_dropped
+        self.context_truncated = context_truncated
+        self.system_truncated = system_truncated
+
+
+class PromptAssembler:
+    """Fits system prompt, retrieved context and recent turns into a token budget."""
+
+    def __init__(self, budget: int = PROMPT_TOKEN_BUDGET,
+                 response_reserve: int = PROMPT_RESPONSE_RESERVE,
+                 model_budgets: Optional[Dict[str, int]] = None,
+                 tokenizers: Optional[Dict[str, str]] = None):
+        """
+        Initialize the assembler.
+
+        Args:
+            budget (int): Default context window in tokens.
+            response_reserve (int): Tokens left free for the model's reply.
+            model_budgets (Optional[Dict[str, int]]): Per-model context windows.
+            tokenizers (Optional[Dict[str, str]]): Hugging Face tokenizer names per model.
+        """
+        self.budget = budget
+        self.response_reserve = response_reserve
+        self.model_budgets = PROMPT_MODEL_BUDGETS if model_budgets is None else model_budgets
+        self.tokenizer_names = PROMPT_TOKENIZERS if tokenizers is None else tokenizers
+        self._counters: Dict[str, Callable[[str], int]] = {}
+        self._loading: Optional[asyncio.Task] = None
+        self.requests = 0
+        self.trimmed_requests = 0
+        self.system_truncated_requests = 0
+        self.tokens_dropped = 0
+
+    def register_tokenizer(self, model: str, count_tokens: Callable[[str], int]):
+        """
+        Use a custom token counter for a model.
+
+        Args:
+            model (str): The model name.
+            count_tokens (Callable[[str], int]): Returns the number of tokens in a text.
+        """
+        self._counters[model] = count_tokens
+
+    async def load_tokenizers(self):
+        """Load the configured tokenizers in a worker thread, so loading or downloading never blocks the loop."""
+        for model, name in self.tokenizer_names.items():
+            if model not in self._counters:
+                counter = await asyncio.to_thread(_load_hf_tokenizer, name)
+                if counter is not None:
+                    self._counters.setdefault(model, counter)
+
+    async def start(self):
+        """Start loading the configured tokenizers in the background. Called from the FastAPI startup event."""
+        if self.tokenizer_names and (self._loading is None or self._loading.done()):
+            self._loading = asyncio.create_task(self.load_tokenizers())
+
+    def count_tokens(self, text: str, model: str) -> int:
+        """Count the tokens of text for a model; estimated until the model's tokenizer is loaded."""
+        counter = self._counters.get(model)
+        return counter(text) if counter is not None else approximate_token_count(text)
+
+    def count_message(self, message: Dict[str, Any], model: str) -> int:
+        """Count the tokens of a chat message, including template overhead."""
+        return self.count_tokens(str(message.get("content", "")), model) + _MESSAGE_OVERHEAD_TOKENS
+
+    def budget_for(self, model: str) -> int:
+        """Tokens available for the prompt of a model."""
+        return max(0, self.model_budgets.get(model, self.budget) - self.response_reserve)
+
+    def _truncate(self, text: str, max_tokens: int, model: str, keep_end: bool = False) -> str:
+        """Cut text down to at most max_tokens, keeping its start (or end)."""
+        if max_tokens <= 0:
+            return ""
+        if self.count_tokens(text, model) <= max_tokens:
+            return text
+        low, high = 0, len(text)
+        while low < high:
+            mid = (low + high + 1) // 2
+            piece = text[-mid:] if keep_end else text[:mid]
+            if self.count_tokens(piece, model) <= max_tokens:
+                low = mid
+            else:
+                high = mid - 1
+        return text[-low:] if keep_end and low else text[:low]
+
+    def _fit_system(self, system: List[Dict[str, Any]], room: int, model: str) -> Tuple[List[Dict[str, Any]], int]:
+        """Keep system messages in order within room tokens; the first to overflow is cut, later ones dropped."""
+        kept: List[Dict[str, Any]] = []
+        dropped = 0
+        for message in system:
+            cost = self.count_message(message, model)
+            if cost <= room:
+                kept.append(message)
+                room -= cost
+                continue
+            content = str(message.get("content", ""))
+            text = self._truncate(content, room - _MESSAGE_OVERHEAD_TOKENS, model)
+            dropped += self.count_tokens(content, model) - self.count_tokens(text, model)
+            if text:
+                kept.append({**message, "content": text})
+                room -= self.count_message(kept[-1], model)
+            else:
+                dropped += _MESSAGE_OVERHEAD_TOKENS
+        return kept, dropped
+
+    def assemble(self, messages: List[Dict[str, Any]], model: str,
+                 context: Optional[str] = None,
+                 instructions: Optional[str] = None) -> PromptAssembly:
+        """
+        Lay out a request prefix-stably and fit it into the model's token budget.
+
+        The result is ordered: instructions, the client's leading system messages,
+        history, per-turn context, latest turn. Instructions, system messages and the
+        latest turn are kept. When they do not fit together, the system messages are cut
+        (from their end) so the latest turn keeps at least half the budget, and the
+        latest turn is cut from the front only if it alone exceeds what remains; it is
+        never cut to nothing. Per-turn context is cut to the space that remains, and
+        earlier turns are added newest-first while they fit.
+
+        Args:
+            messages (List[Dict[str, Any]]): The client's messages.
+            model (str): The model the prompt is for.
+            context (Optional[str]): Per-turn data such as retrieved context, sent as a system message.
+            instructions (Optional[str]): Static system prompt placed before everything else.
+
+        Returns:
+            PromptAssembly: The messages to send and token accounting.
+        """
+        budget = self.budget_for(model)
+        split = 0
+        while split < len(messages) and messages[split].get("role") == "system":
+            split += 1
+        system, turns = list(messages[:split]), list(messages[split:])
+        if instructions:
+            system.insert(0, {"role": "system", "content": instructions})
+
+        dropped_tokens = 0
+        dropped_messages = 0
+        last = turns.pop() if turns else None
+
+        # System text may not crowd out the question: the latest turn keeps at least half the budget
+        system_cost = sum(self.count_message(message, model) for message in system)
+        latest_cost = self.count_message(last, model) if last else 0
+        room = max(budget - latest_cost, budget // 2) if last else budget
+        system_truncated = system_cost > room
+        if system_truncated:
+            system, dropped = self._fit_system(system, room, model)
+            dropped_tokens += dropped
+            system_cost = sum(self.count_message(message, model) for message in system)
+        remaining = budget - system_cost
+
+        latest: List[Dict[str, Any]] = []
+        if last:
+            cost = latest_cost
+            if cost > remaining:
+                content = str(last.get("content", ""))
+                kept = self._truncate(content, remaining - _MESSAGE_OVERHEAD_TOKENS, model, keep_end=True)
+                # A budget too small for any of it sends the turn whole rather than an empty question
+                if kept or not content:
+                    dropped_tokens += self.count_tokens(content, model) - self.count_tokens(kept, model)
+                    last = {**last, "content": kept}
+                    cost = self.count_message(last, model)
+            latest = [last]
+            remaining -= cost
+
+        context_truncated = False
+        fitted_context: List[Dict[str, Any]] = []
+        if context:
+            kept = self._truncate(context, remaining - _MESSAGE_OVERHEAD_TOKENS, model)
+            if kept != context:
+                context_truncated = True
+                dropped_tokens += self.count_tokens(context, model) - self.count_tokens(kept, model)
+            if kept:
+                fitted_context = [{"role": "system", "content": kept}]
+                remaining -= self.count_message(fitted_context[0], model)
+
+        history: List[Dict[str, Any]] = []
+        for index in range(len(turns) - 1, -1, -1):
+            cost = self.count_message(turns[index], model)
+            if cost > remaining:
+                older = turns[:index + 1]
+                dropped_messages = len(older)
+                dropped_tokens += sum(self.count_message(message, model) for message in older)
+                break
+            history.insert(0, turns[index])
+            remaining -= cost
+
+        self.requests += 1
+        if dropped_tokens:
+            self.trimmed_requests += 1
+            self.tokens_dropped += dropped_tokens
+        if system_truncated:
+            self.system_truncated_requests += 1
+        return PromptAssembly(
+            messages=system + history + fitted_context + latest,
+            budget=budget,
+            tokens_used=budget - remaining,
+            tokens_dropped=dropped_tokens,
+            messages_dropped=dropped_messages,
+            context_truncated=context_truncated,
+            system_truncated=system_truncated,
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get trimming counters."""
+        return {
+            "requests": self.requests,
+            "trimmed_requests": self.trimmed_requests,
+            "system_truncated_requests": self.system_truncated_requests,
+            "tokens_dropped": self.tokens_dropped,
+            "default_budget": self.budget_for(""),
+            "tokenizers_loaded": sorted(self._counters),
+        }
+
+
+# Global instance used by the chat endpoints
+prompt_assembler = PromptAssembler()
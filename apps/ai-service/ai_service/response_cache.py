@@ -0,0 +1,258 @@
+"""
+Response Cache
+
+This module provides an exact-match cache for LLM responses. Entries are keyed
+on a canonical hash of the request (model, messages, options), held in an
+in-memory LRU with a TTL and optionally persisted to a SQLite tier that
+survives restarts. Lookups and stores go through ``aget``/``aset``, which serve
+memory hits inline and run the SQLite reads and writes in a worker thread.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600.0"))
+RESPONSE_CACHE_DB_PATH = os.getenv("RESPONSE_CACHE_DB_PATH")  # Disk tier disabled when unset
+RESPONSE_CACHE_MAX_DISK_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_DISK_ENTRIES", "10000"))
+# Requests sampled at or below this temperature are cached unless the caller opts out
+RESPONSE_CACHE_MAX_TEMPERATURE = float(os.getenv("RESPONSE_CACHE_MAX_TEMPERATURE", "0.2"))
+
+
+def make_cache_key(*parts: Any) -> str:
+    """
+    Build a canonical hash for a request.
+
+    Dict keys are sorted so logically identical requests map to the same key.
+
+    Returns:
+        str: Hex SHA-256 digest.
+    """
+    canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def should_cache(options: Dict[str, Any], use_cache: Optional[bool] = None) -> bool:
+    """
+    Decide whether a request may be served from / stored in the cache.
+
+    Args:
+        options (Dict[str, Any]): The effective Ollama options of the request.
+        use_cache (Optional[bool]): Per-request override. True forces caching, False bypasses it,
+            None caches only deterministic (low-temperature) requests.
+
+    Returns:
+        bool: Whether to use the cache.
+    """
+    if use_cache is not None:
+        return use_cache
+    temperature = options.get("temperature")
+    return temperature is not None and float(temperature) <= RESPONSE_CACHE_MAX_TEMPERATURE
+
+
+class ResponseCache:
+    """In-memory LRU+TTL cache with an optional SQLite tier."""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+                 ttl_seconds: float = RESPONSE_CACHE_TTL,
+                 db_path: Optional[str] = RESPONSE_CACHE_DB_PATH,
+                 max_disk_entries: int = RESPONSE_CACHE_MAX_DISK_ENTRIES,
+                 enabled: bool = RESPONSE_CACHE_ENABLED,
+                 name: str = "responses"):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries (int): Maximum entries held in memory.
+            max_bytes (int): Maximum serialized size of the in-memory entries.
+            ttl_seconds (float): Lifetime of an entry.
+            db_path (Optional[str]): SQLite file for the persistent tier; None keeps the cache in memory only.
+            max_disk_entries (int): Maximum entries kept in the SQLite tier.
+            enabled (bool): When False, every lookup misses and nothing is stored.
+            name (str): Table name, so several caches can share one SQLite file.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+        self.enabled = enabled
+        self.name = name
+        self._entries: "OrderedDict[str, Tuple[Any, int, float]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._db: Optional[sqlite3.Connection] = None
+        # The connection is shared by the worker threads of aget/aset
+        self._db_lock = threading.Lock()
+        if db_path and enabled:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path: str):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.name} "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute(f"CREATE INDEX IF NOT EXISTS {self.name}_accessed ON {self.name} (accessed)")
+        self._db.commit()
+
+    def _expired(self, created: float) -> bool:
+        return (time.time() - created) >= self.ttl_seconds
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """
+        Look up a cached value without blocking the event loop on SQLite.
+
+        Args:
+            key (str): Cache key from make_cache_key.
+
+        Returns:
+            Optional[Any]: The cached value, or None on a miss.
+        """
+        if not self.enabled:
+            return None
+        value = self._get_memory(key)
+        if value is None and self._db is not None:
+            value = self._disk_hit(key, await asyncio.to_thread(self._read_disk, key))
+        if value is None:
+            self.misses += 1
+        return value
+
+    async def aset(self, key: str, value: Any):
+        """
+        Store a JSON-serializable value without blocking the event loop on SQLite.
+
+        Args:
+            key (str): Cache key from make_cache_key.
+            value (Any): The value to cache.
+        """
+        if not self.enabled:
+            return
+        serialized, now = self._set_memory(key, value)
+        if self._db is not None:
+            self.evictions += await asyncio.to_thread(self._write_disk, key, serialized, now)
+
+    def _get_memory(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, _, created = entry
+        if self._expired(created):
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def _set_memory(self, key: str, value: Any) -> Tuple[str, float]:
+        serialized = json.dumps(value)
+        now = time.time()
+        self._store_memory(key, value, len(serialized), now)
+        return serialized, now
+
+    def _disk_hit(self, key: str, row: Optional[Tuple[str, float]]) -> Optional[Any]:
+        if row is None:
+            return None
+        serialized, created = row
+        value = json.loads(serialized)
+        self._store_memory(key, value, len(serialized), created)
+        self.disk_hits += 1
+        return value
+
+    def _read_disk(self, key: str) -> Optional[Tuple[str, float]]:
+        """Fetch an unexpired row and mark it used; expired rows are deleted."""
+        with self._db_lock:
+            row = self._db.execute(
+                f"SELECT value, created FROM {self.name} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self._expired(row[1]):
+                self._db.execute(f"DELETE FROM {self.name} WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute(f"UPDATE {self.name} SET accessed = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            return row
+
+    def _write_disk(self, key: str, serialized: str, now: float) -> int:
+        """Insert a row and trim the table; returns the number of rows evicted."""
+        with self._db_lock:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO {self.name} (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, serialized, now, now)
+            )
+            evicted = self._trim_disk()
+            self._db.commit()
+            return evicted
+
+    def _store_memory(self, key: str, value: Any, size: int, created: float):
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, size, created)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _trim_disk(self) -> int:
+        count = self._db.execute(f"SELECT COUNT(*) FROM {self.name}").fetchone()[0]
+        overflow = count - self.max_disk_entries
+        if overflow <= 0:
+            return 0
+        self._db.execute(
+            f"DELETE FROM {self.name} WHERE key IN "
+            f"(SELECT key FROM {self.name} ORDER BY accessed ASC LIMIT ?)",
+            (overflow,)
+        )
+        return overflow
+
+    def clear(self):
+        """Remove every entry from both tiers."""
+        self._entries.clear()
+        self._bytes = 0
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute(f"DELETE FROM {self.name}")
+                self._db.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and current size."""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "disk_tier": self._db is not None,
+        }
+
+
+# Global instance for easy access
+response_cache = ResponseCache()
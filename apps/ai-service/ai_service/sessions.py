@@ -0,0 +1,322 @@
+"""
+Conversation Sessions
+
+This module keeps chat conversations on the server so clients only send the
+new turn instead of the whole message history. Sessions live in an in-memory
+LRU, are optionally persisted to SQLite so they survive restarts, and are
+evicted once idle. Each session also keeps the ``context`` token array Ollama
+returns from /api/generate, so the next turn can continue from it instead of
+re-evaluating the earlier turns. SQLite reads and writes run on a
+single-thread executor, off the event loop and in the order they were issued.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import time
+import uuid
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH")  # Persistence disabled when unset
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "3600.0"))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "200"))
+SESSION_EVICTION_INTERVAL = float(os.getenv("SESSION_EVICTION_INTERVAL", "60.0"))
+
+
+def render_transcript(messages: List[Dict[str, Any]]) -> str:
+    """
+    Flatten earlier turns and the new question into a single generate prompt.
+
+    Args:
+        messages (List[Dict[str, Any]]): User/assistant turns, the new question last.
+
+    Returns:
+        str: The prompt text.
+    """
+    *history, latest = messages
+    if not history:
+        return latest["content"]
+    lines = [f"{'User' if message['role'] == 'user' else 'Assistant'}: {message['content']}" for message in history]
+    return "Conversation so far:\n" + "\n".join(lines) + "\n\n" + latest["content"]
+
+
+class Session:
+    """One conversation: its turns and the Ollama context that encodes them."""
+
+    __slots__ = ("id", "task_type", "user_id", "system", "messages", "context", "context_model",
+                 "created_at", "last_active", "lock")
+
+    def __init__(self, session_id: str, task_type: str = "conversation", user_id: Optional[str] = None,
+                 system: Optional[str] = None, messages: Optional[List[Dict[str, str]]] = None,
+                 context: Optional[array] = None, context_model: Optional[str] = None,
+                 created_at: Optional[float] = None, last_active: Optional[float] = None):
+        now = time.time()
+        self.id = session_id
+        self.task_type = task_type
+        self.user_id = user_id
+        self.system = system
+        self.messages: List[Dict[str, str]] = messages or []
+        # Token ids as a typed array: 4 bytes each instead of a list of Python ints
+        self.context = context if context is not None else array("i")
+        self.context_model = context_model
+        self.created_at = created_at or now
+        self.last_active = last_active or now
+        # Turns of one session are answered one at a time
+        self.lock = asyncio.Lock()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Describe the session for API responses."""
+        return {
+            "session_id": self.id,
+            "task_type": self.task_type,
+            "user_id": self.user_id,
+            "system": self.system,
+            "messages": list(self.messages),
+            "context_tokens": len(self.context),
+            "context_model": self.context_model,
+            "created_at": self.created_at,
+            "last_active": self.last_active,
+        }
+
+
+class SessionStore:
+    """In-memory LRU of sessions with idle eviction and an optional SQLite tier."""
+
+    def __init__(self, db_path: Optional[str] = SESSION_DB_PATH,
+                 idle_ttl: float = SESSION_IDLE_TTL,
+                 max_sessions: int = SESSION_MAX_SESSIONS,
+                 max_turns: int = SESSION_MAX_TURNS,
+                 eviction_interval: float = SESSION_EVICTION_INTERVAL):
+        """
+        Initialize the store.
+
+        Args:
+            db_path (Optional[str]): SQLite file for persistence; None keeps sessions in memory only.
+            idle_ttl (float): Sessions idle for this many seconds are deleted.
+            max_sessions (int): Maximum sessions held in memory; the least recently used are
+                dropped (and reloaded from SQLite when persistence is enabled).
+            max_turns (int): Maximum messages kept per session; the oldest are dropped.
+            eviction_interval (float): Period of the background idle-eviction task.
+        """
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self.eviction_interval = eviction_interval
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+        self.created = 0
+        self.evicted = 0
+        self.loaded = 0
+        self._db: Optional[sqlite3.Connection] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if db_path:
+            self._open_db(db_path)
+            # One worker: the connection is used by one thread and writes land in order
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sessions-db")
+
+    def _open_db(self, db_path: str):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions "
+            "(id TEXT PRIMARY KEY, task_type TEXT NOT NULL, user_id TEXT, system TEXT, messages TEXT NOT NULL, "
+            "context BLOB, context_model TEXT, created_at REAL NOT NULL, last_active REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_last_active ON sessions (last_active)")
+        self._db.commit()
+
+    def _expired(self, session: Session) -> bool:
+        return (time.time() - session.last_active) >= self.idle_ttl
+
+    def _cache(self, session: Session):
+        self._sessions[session.id] = session
+        self._sessions.move_to_end(session.id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            if self._db is None:
+                self.evicted += 1
+
+    async def _run_db(self, func: Callable[..., T], *args) -> T:
+        """Run a blocking SQLite call on the store's executor."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _execute(self, sql: str, params: Tuple[Any, ...]) -> int:
+        cursor = self._db.execute(sql, params)
+        self._db.commit()
+        return cursor.rowcount
+
+    async def _save(self, session: Session):
+        if self._db is None:
+            return
+        # Serialized on the loop, so later changes to the session cannot race the write
+        await self._run_db(
+            self._execute,
+            "INSERT OR REPLACE INTO sessions "
+            "(id, task_type, user_id, system, messages, context, context_model, created_at, last_active) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (session.id, session.task_type, session.user_id, session.system, json.dumps(session.messages),
+             session.context.tobytes(), session.context_model, session.created_at, session.last_active)
+        )
+
+    def _fetch(self, session_id: str) -> Optional[Tuple[Any, ...]]:
+        return self._db.execute(
+            "SELECT task_type, user_id, system, messages, context, context_model, created_at, last_active "
+            "FROM sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+
+    async def _load(self, session_id: str) -> Optional[Session]:
+        if self._db is None:
+            return None
+        row = await self._run_db(self._fetch, session_id)
+        if row is None:
+            return None
+        # Another request may have loaded it while this one waited on SQLite
+        cached = self._sessions.get(session_id)
+        if cached is not None:
+            return cached
+        task_type, user_id, system, messages, context_bytes, context_model, created_at, last_active = row
+        context = array("i")
+        if context_bytes:
+            context.frombytes(context_bytes)
+        self.loaded += 1
+        return Session(session_id, task_type, user_id, system, json.loads(messages), context, context_model,
+                       created_at, last_active)
+
+    async def create(self, task_type: str = "conversation", user_id: Optional[str] = None,
+                     system: Optional[str] = None) -> Session:
+        """
+        Start a new session.
+
+        Args:
+            task_type (str): Task type used to pick the model for every turn.
+            user_id (Optional[str]): Owner of the session, informational.
+            system (Optional[str]): System prompt for the conversation.
+
+        Returns:
+            Session: The new session.
+        """
+        session = Session(uuid.uuid4().hex, task_type, user_id, system)
+        self._cache(session)
+        await self._save(session)
+        self.created += 1
+        return session
+
+    async def get(self, session_id: str) -> Optional[Session]:
+        """
+        Look up a session that has not expired.
+
+        Args:
+            session_id (str): The session id.
+
+        Returns:
+            Optional[Session]: The session, or None if it is unknown or idle too long.
+        """
+        session = self._sessions.get(session_id) or await self._load(session_id)
+        if session is None:
+            return None
+        if self._expired(session):
+            await self.delete(session_id)
+            self.evicted += 1
+            return None
+        self._cache(session)
+        return session
+
+    async def add_turn(self, session: Session, user_content: str, assistant_content: str,
+                       model: Optional[str] = None, context: Optional[List[int]] = None):
+        """
+        Record a completed exchange and the Ollama context that now encodes it.
+
+        Args:
+            session (Session): The session.
+            user_content (str): The user's message.
+            assistant_content (str): The model's reply.
+            model (Optional[str]): Model that produced the reply and the context.
+            context (Optional[List[int]]): Ollama's returned context; None clears the stored one.
+        """
+        session.messages.append({"role": "user", "content": user_content})
+        session.messages.append({"role": "assistant", "content": assistant_content})
+        if len(session.messages) > self.max_turns:
+            del session.messages[:len(session.messages) - self.max_turns]
+        session.context = array("i", context or [])
+        session.context_model = model if context else None
+        session.last_active = time.time()
+        self._cache(session)
+        await self._save(session)
+
+    async def delete(self, session_id: str) -> bool:
+        """
+        Delete a session.
+
+        Args:
+            session_id (str): The session id.
+
+        Returns:
+            bool: Whether the session existed.
+        """
+        existed = self._sessions.pop(session_id, None) is not None
+        if self._db is not None:
+            deleted = await self._run_db(self._execute, "DELETE FROM sessions WHERE id = ?", (session_id,))
+            existed = existed or deleted > 0
+        return existed
+
+    async def evict_idle(self) -> int:
+        """
+        Delete every session that has been idle longer than the TTL.
+
+        Returns:
+            int: Number of sessions deleted.
+        """
+        cutoff = time.time() - self.idle_ttl
+        idle = [session_id for session_id, session in self._sessions.items() if session.last_active <= cutoff]
+        for session_id in idle:
+            del self._sessions[session_id]
+        removed = len(idle)
+        if self._db is not None:
+            deleted = await self._run_db(self._execute, "DELETE FROM sessions WHERE last_active <= ?", (cutoff,))
+            removed = max(removed, deleted)
+        self.evicted += removed
+        return removed
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.eviction_interval)
+            await self.evict_idle()
+
+    async def start(self):
+        """Start the background idle-eviction task."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get session counters."""
+        return {
+            "active": len(self._sessions),
+            "created": self.created,
+            "evicted": self.evicted,
+            "loaded_from_disk": self.loaded,
+            "persistent": self._db is not None,
+            "idle_ttl": self.idle_ttl,
+        }
+
+
+# Global instance used by the session endpoints
+session_store = SessionStore()
@@ -0,0 +1,88 @@
+"""
+Single-Flight Request Coalescing
+
+This module lets concurrent identical requests share one upstream call. The
+first caller for a key starts the work; callers arriving while it is still in
+flight await the same result instead of repeating the work.
+"""
+
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+def make_flight_key(*parts: Any) -> str:
+    """
+    Build a content hash from request parts.
+
+    Bytes are hashed directly so large images are not copied into a string;
+    everything else is hashed through its canonical JSON form.
+
+    Returns:
+        str: Hex SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, (bytes, bytearray, memoryview)):
+            digest.update(b"b:")
+            digest.update(part)
+        else:
+            digest.update(b"j:")
+            digest.update(json.dumps(part, sort_keys=True, default=str).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one in-flight task."""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.shared = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run ``fn`` once for all concurrent callers with the same key.
+
+        The shared work runs in its own task, so a caller that is cancelled
+        (e.g. a client disconnect) does not cancel it for the other waiters.
+
+        Args:
+            key (str): Key identifying identical work, e.g. from make_flight_key.
+            fn (Callable[[], Awaitable[T]]): Coroutine factory doing the work.
+
+        Returns:
+            T: The shared result. Exceptions are re-raised to every caller.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self.leaders += 1
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved when every waiter has gone away
+        if not task.cancelled():
+            task.exception()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get coalescing counters."""
+        return {
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "coalesced": self.shared,
+        }
+
+
+# Global instance shared by the Ollama and OCR call sites
+single_flight = SingleFlight()
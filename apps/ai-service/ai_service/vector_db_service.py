@@ -5,11 +5,19 @@ This module provides vector database functionality for enhanced knowledge retrie
 and contextual responses as recommended in the research report.
 """
 
+import asyncio
+import functools
+import hashlib
 import os
 import json
-from typing import List, Dict, Any, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Callable, Tuple, TypeVar
 import uuid
 
+from ai_service.embedding_batcher import EmbeddingBatcher
+from ai_service.embedding_cache import EmbeddingCache, normalize_text
+
 # Try to import chromadb, but provide a fallback if it's not available
 try:
     # Monkey patch for ChromaDB telemetry issue
@@ -46,13 +54,81 @@ except ImportError:
     print("Warning: sentence_transformers not available. Using stub implementation.")
     SENTENCE_TRANSFORMERS_AVAILABLE = False
 
+# Semantic response cache configuration
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+# Threads running SentenceTransformer.encode and the synchronous Chroma calls
+VECTOR_DB_MAX_WORKERS = int(os.getenv("VECTOR_DB_MAX_WORKERS", "4"))
+
+T = TypeVar("T")
+
+# Bump when the manifest layout or the seeding procedure changes
+SEED_MANIFEST_VERSION = 1
+SEED_MANIFEST_FILE = "seed_manifest.json"
+# Generation counter of the deck knowledge base, bumped by every write and delete
+KNOWLEDGE_GENERATION_FILE = "knowledge_generation.json"
+
+# Seeded into deck_knowledge at startup
+DEFAULT_KNOWLEDGE = [
+    {
+        "content": "Standard deck joist spacing is typically 16 inches on center for residential decks. This provides adequate support for most decking materials.",
+        "metadata": {"category": "structural", "topic": "joists", "importance": "high"}
+    },
+    {
+        "content": "Deck railing height must be at least 36 inches for decks less than 30 inches above grade, and 42 inches for higher decks according to most building codes.",
+        "metadata": {"category": "safety", "topic": "railings", "importance": "critical"}
+    },
+    {
+        "content": "Pressure-treated lumber is the most common material for deck framing due to its resistance to moisture and insects.",
+        "metadata": {"category": "materials", "topic": "lumber", "importance": "medium"}
+    },
+    {
+        "content": "Deck footings should extend below the frost line in your area to prevent heaving and structural damage.",
+        "metadata": {"category": "foundation", "topic": "footings", "importance": "high"}
+    },
+    {
+        "content": "Composite decking requires less maintenance than wood but may have specific installation requirements for expansion gaps.",
+        "metadata": {"category": "materials", "topic": "composite", "importance": "medium"}
+    }
+]
+
+
+def knowledge_id(content: str) -> str:
+    """
+    Get the content-addressed ID of a knowledge document.
+
+    The same content always maps to the same ID, so adding it again replaces
+    the existing document instead of duplicating it.
+
+    Args:
+        content (str): The knowledge content
+
+    Returns:
+        str: Document ID
+    """
+    return "kb-" + hashlib.sha256(normalize_text(content).encode("utf-8")).hexdigest()[:32]
+
 
 class VectorDBService:
     """Service for managing vector embeddings and semantic search."""
 
-    def __init__(self, persist_directory: str = "./chroma_db"):
+    def __init__(self, persist_directory: str = "./chroma_db", max_workers: int = VECTOR_DB_MAX_WORKERS):
         self.persist_directory = persist_directory
+        # Encoding and Chroma calls block; they run here so they never stall the event loop.
+        # The pool bounds how many run at once, the rest queue. It is created on first use,
+        # so the service keeps working after a shutdown/startup cycle.
+        self._max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Concurrent single-text embeds are coalesced into batched encode calls
+        self.embedding_batcher = EmbeddingBatcher(self._encode_batch)
+        self.embedding_model_name = EMBEDDING_MODEL_NAME
+        self.embedding_cache = EmbeddingCache()
+        self._embedding_flush: Optional[asyncio.Future] = None
         self.is_available = CHROMADB_AVAILABLE and SENTENCE_TRANSFORMERS_AVAILABLE
+        self.semantic_cache_threshold = SEMANTIC_CACHE_THRESHOLD
+        self.semantic_cache_stats = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0}
+        self.knowledge_version = "unavailable"
 
         if not self.is_available:
             print("VectorDBService is running in stub mode due to missing dependencies.")
@@ -61,6 +137,7 @@ class VectorDBService:
             self.deck_knowledge_collection = None
             self.conversation_history_collection = None
             self.blueprint_analysis_collection = None
+            self.semantic_cache_collection = None
             return
 
         # Only initialize if dependencies are available
@@ -73,12 +150,14 @@ class VectorDBService:
         )
 
         # Initialize embedding model
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.embedding_model = SentenceTransformer(self.embedding_model_name)
 
         # Initialize collections
         self.deck_knowledge_collection = self._get_or_create_collection("deck_knowledge")
         self.conversation_history_collection = self._get_or_create_collection("conversation_history")
         self.blueprint_analysis_collection = self._get_or_create_collection("blueprint_analysis")
+        self.semantic_cache_collection = self._get_or_create_collection("semantic_cache")
+        self.knowledge_version = f"gen-{self._read_knowledge_generation()}"
 
     def _get_or_create_collection(self, name: str):
         """Get or create a ChromaDB collection."""
@@ -93,6 +172,119 @@ class VectorDBService:
                 metadata={"hnsw:space": "cosine"}
             )
 
+    async def _run(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """Run a blocking embedding or vector-store call on the service's executor."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="vector-db")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    def _encode_texts(self, texts: List[str]) -> List[List[float]]:
+        return self.embedding_model.encode(texts, batch_size=len(texts)).tolist()
+
+    async def _encode_batch(self, texts: List[str]) -> List[List[float]]:
+        return await self._run(self._encode_texts, texts)
+
+    async def embed(self, text: str) -> List[float]:
+        """
+        Embed a text with the service's SentenceTransformer.
+
+        Cached embeddings are returned directly; other texts are batched with
+        concurrent embed calls.
+
+        Args:
+            text (str): The text to embed
+
+        Returns:
+            List[float]: The embedding, usable as ``query_embedding`` of the search methods
+        """
+        embedding = await self._cached_embedding(text)
+        if embedding is not None:
+            return embedding
+        embedding = await self.embedding_batcher.encode(text)
+        self.embedding_cache.set(self.embedding_model_name, text, embedding)
+        self._schedule_embedding_flush()
+        return embedding
+
+    async def _cached_embedding(self, text: str) -> Optional[List[float]]:
+        """Look up a cached embedding; a memory miss goes to the disk tier on the executor."""
+        cache = self.embedding_cache
+        if not cache.has_disk_tier:
+            return cache.get(self.embedding_model_name, text)
+        embedding = cache.get_from_memory(self.embedding_model_name, text)
+        if embedding is not None:
+            return embedding
+        return await self._run(cache.get, self.embedding_model_name, text)
+
+    def _schedule_embedding_flush(self):
+        """Write new cached embeddings to the disk tier in the background, one flush at a time."""
+        if not self.embedding_cache.pending_writes:
+            return
+        if self._embedding_flush is None or self._embedding_flush.done():
+            self._embedding_flush = asyncio.ensure_future(self._flush_embedding_cache())
+
+    async def _flush_embedding_cache(self):
+        try:
+            await self._run(self.embedding_cache.flush)
+        except OSError as e:
+            # The vectors stay cached in memory; only the restart copy is lost
+            print(f"Failed to write the embedding cache disk tier: {e}")
+
+    async def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed a list of texts for a bulk load.
+
+        Cached embeddings are reused; the remaining texts go to the model in a
+        single encode call on the executor rather than through the micro-batcher.
+
+        Args:
+            texts (List[str]): The texts to embed
+
+        Returns:
+            List[List[float]]: One embedding per text, in order
+        """
+        cache = self.embedding_cache
+        if cache.has_disk_tier:
+            embeddings = await self._run(cache.get_many, self.embedding_model_name, texts)
+        else:
+            embeddings = cache.get_many(self.embedding_model_name, texts)
+        missing = list(dict.fromkeys(text for text, embedding in zip(texts, embeddings) if embedding is None))
+        if missing:
+            encoded = dict(zip(missing, await self._encode_batch(missing)))
+            for text, embedding in encoded.items():
+                self.embedding_cache.set(self.embedding_model_name, text, embedding)
+            await self._run(self.embedding_cache.flush)
+            embeddings = [encoded[text] if embedding is None else embedding
+                          for text, embedding in zip(texts, embeddings)]
+        return embeddings
+
+    def get_embedding_stats(self) -> Dict[str, Any]:
+        """Get embedding cache and batching metrics."""
+        return {
+            "cache": self.embedding_cache.get_stats(),
+            "batching": self.embedding_batcher.get_stats(),
+        }
+
+    def _query(self, collection, query_embedding: List[float], n_results: int,
+               where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Run a similarity query and format the hits with their similarity scores."""
+        results = collection.query(
+            query_embeddings=[query_embedding],
+            n_results=n_results,
+            include=["documents", "metadatas", "distances"],
+            **({"where": where} if where else {})
+        )
+        return [
+            {
+                "content": document,
+                "metadata": metadata,
+                "similarity_score": 1 - distance  # Convert distance to similarity
+            }
+            for document, metadata, distance in zip(
+                results["documents"][0], results["metadatas"][0], results["distances"][0]
+            )
+        ]
+
     async def add_deck_knowledge(self, content: str, metadata: Dict[str, Any]) -> str:
         """
         Add deck design knowledge to the vector database.
@@ -102,34 +294,85 @@ class VectorDBService:
             metadata (Dict[str, Any]): Associated metadata
 
         Returns:
-            str: Document ID
+            str: Document ID, derived from the content
         """
-        doc_id = str(uuid.uuid4())
+        return (await self.upsert_deck_knowledge([(content, metadata)]))[0]
 
-        if not self.is_available:
-            print(f"Skipping add_deck_knowledge in stub mode: {content[:50]}...")
-            return doc_id
+    async def upsert_deck_knowledge(self, documents: List[Tuple[str, Dict[str, Any]]],
+                                    embeddings: Optional[List[List[float]]] = None) -> List[str]:
+        """
+        Add or replace deck design knowledge under content-addressed IDs.
 
-        # Generate embedding
-        embedding = self.embedding_model.encode(content).tolist()
+        The documents are embedded together and written in one upsert.
 
-        # Add to collection
-        self.deck_knowledge_collection.add(
-            embeddings=[embedding],
-            documents=[content],
-            metadatas=[metadata],
-            ids=[doc_id]
+        Args:
+            documents (List[Tuple[str, Dict[str, Any]]]): (content, metadata) pairs
+            embeddings (Optional[List[List[float]]]): Precomputed embeddings of the contents
+
+        Returns:
+            List[str]: Document IDs, in order
+        """
+        doc_ids = [knowledge_id(content) for content, _ in documents]
+
+        if not self.is_available:
+            print(f"Skipping upsert_deck_knowledge in stub mode: {len(documents)} documents")
+            return doc_ids
+
+        # Generate embeddings
+        if embeddings is None:
+            embeddings = await self.embed_many([content for content, _ in documents])
+
+        # Upsert into collection
+        await self._run(
+            self.deck_knowledge_collection.upsert,
+            embeddings=embeddings,
+            documents=[content for content, _ in documents],
+            metadatas=[metadata for _, metadata in documents],
+            ids=doc_ids
         )
+        await self._on_knowledge_changed()
 
-        return doc_id
+        return doc_ids
 
-    async def search_deck_knowledge(self, query: str, n_results: int = 5) -> List[Dict[str, Any]]:
+    async def find_deck_knowledge_ids(self, doc_ids: List[str]) -> List[str]:
+        """
+        Find which of the given document IDs are already in the deck knowledge collection.
+
+        Args:
+            doc_ids (List[str]): Document IDs to look up
+
+        Returns:
+            List[str]: The IDs that exist
+        """
+        if not self.is_available or not doc_ids:
+            return []
+        return (await self._run(self.deck_knowledge_collection.get, ids=doc_ids, include=[]))["ids"]
+
+    async def delete_deck_knowledge(self, doc_ids: List[str]) -> int:
+        """
+        Delete deck design knowledge by ID.
+
+        Args:
+            doc_ids (List[str]): Document IDs to delete; IDs not in the collection are ignored
+
+        Returns:
+            int: Number of documents deleted
+        """
+        present = await self.find_deck_knowledge_ids(doc_ids)
+        if present:
+            await self._run(self.deck_knowledge_collection.delete, ids=present)
+            await self._on_knowledge_changed()
+        return len(present)
+
+    async def search_deck_knowledge(self, query: str, n_results: int = 5,
+                                    query_embedding: Optional[List[float]] = None) -> List[Dict[str, Any]]:
         """
         Search for relevant deck knowledge based on query.
 
         Args:
             query (str): Search query
             n_results (int): Number of results to return
+            query_embedding (Optional[List[float]]): Precomputed embedding of the query
 
         Returns:
             List[Dict[str, Any]]: Search results with content and metadata
@@ -139,25 +382,11 @@ class VectorDBService:
             return []
 
         # Generate query embedding
-        query_embedding = self.embedding_model.encode(query).tolist()
+        if query_embedding is None:
+            query_embedding = await self.embed(query)
 
         # Search collection
-        results = self.deck_knowledge_collection.query(
-            query_embeddings=[query_embedding],
-            n_results=n_results,
-            include=["documents", "metadatas", "distances"]
-        )
-
-        # Format results
-        formatted_results = []
-        for i in range(len(results["documents"][0])):
-            formatted_results.append({
-                "content": results["documents"][0][i],
-                "metadata": results["metadatas"][0][i],
-                "similarity_score": 1 - results["distances"][0][i]  # Convert distance to similarity
-            })
-
-        return formatted_results
+        return await self._run(self._query, self.deck_knowledge_collection, query_embedding, n_results)
 
     async def store_conversation_context(self, user_id: str, conversation_data: Dict[str, Any]) -> str:
         """
@@ -180,7 +409,7 @@ class VectorDBService:
         content = f"User: {conversation_data.get('user_message', '')} Assistant: {conversation_data.get('assistant_response', '')}"
 
         # Generate embedding
-        embedding = self.embedding_model.encode(content).tolist()
+        embedding = await self.embed(content)
 
         # Add metadata
         metadata = {
@@ -192,7 +421,8 @@ class VectorDBService:
         metadata.update(conversation_data.get("metadata", {}))
 
         # Store in collection
-        self.conversation_history_collection.add(
+        await self._run(
+            self.conversation_history_collection.add,
             embeddings=[embedding],
             documents=[content],
             metadatas=[metadata],
@@ -201,7 +431,8 @@ class VectorDBService:
 
         return context_id
 
-    async def get_conversation_context(self, user_id: str, query: str, n_results: int = 3) -> List[Dict[str, Any]]:
+    async def get_conversation_context(self, user_id: str, query: str, n_results: int = 3,
+                                       query_embedding: Optional[List[float]] = None) -> List[Dict[str, Any]]:
         """
         Retrieve relevant conversation context for a user.
 
@@ -209,6 +440,7 @@ class VectorDBService:
             user_id (str): User identifier
             query (str): Current query to find relevant context
             n_results (int): Number of context items to return
+            query_embedding (Optional[List[float]]): Precomputed embedding of the query
 
         Returns:
             List[Dict[str, Any]]: Relevant conversation context
@@ -218,29 +450,14 @@ class VectorDBService:
             return []
 
         # Generate query embedding
-        query_embedding = self.embedding_model.encode(query).tolist()
+        if query_embedding is None:
+            query_embedding = await self.embed(query)
 
-        # Search with user filter
-        results = self.conversation_history_collection.query(
-            query_embeddings=[query_embedding],
-            n_results=n_results * 2,  # Get more results to filter by user
-            include=["documents", "metadatas", "distances"],
-            where={"user_id": user_id}
+        # Search with user filter, getting more results to filter by user
+        results = await self._run(
+            self._query, self.conversation_history_collection, query_embedding, n_results * 2, {"user_id": user_id}
         )
-
-        # Format and filter results
-        formatted_results = []
-        for i in range(len(results["documents"][0])):
-            if len(formatted_results) >= n_results:
-                break
-
-            formatted_results.append({
-                "content": results["documents"][0][i],
-                "metadata": results["metadatas"][0][i],
-                "similarity_score": 1 - results["distances"][0][i]
-            })
-
-        return formatted_results
+        return results[:n_results]
 
     async def store_blueprint_analysis(self, analysis_data: Dict[str, Any]) -> str:
         """
@@ -262,7 +479,7 @@ class VectorDBService:
         content = f"Blueprint Analysis: {analysis_data.get('description', '')} Dimensions: {analysis_data.get('dimensions', '')} Materials: {analysis_data.get('materials', '')}"
 
         # Generate embedding
-        embedding = self.embedding_model.encode(content).tolist()
+        embedding = await self.embed(content)
 
         # Prepare metadata
         metadata = {
@@ -274,7 +491,8 @@ class VectorDBService:
         metadata.update(analysis_data.get("metadata", {}))
 
         # Store in collection
-        self.blueprint_analysis_collection.add(
+        await self._run(
+            self.blueprint_analysis_collection.add,
             embeddings=[embedding],
             documents=[content],
             metadatas=[metadata],
@@ -283,13 +501,15 @@ class VectorDBService:
 
         return analysis_id
 
-    async def search_similar_blueprints(self, query: str, n_results: int = 5) -> List[Dict[str, Any]]:
+    async def search_similar_blueprints(self, query: str, n_results: int = 5,
+                                        query_embedding: Optional[List[float]] = None) -> List[Dict[str, Any]]:
         """
         Search for similar blueprint analyses.
 
         Args:
             query (str): Search query (description, dimensions, etc.)
             n_results (int): Number of results to return
+            query_embedding (Optional[List[float]]): Precomputed embedding of the query
 
         Returns:
             List[Dict[str, Any]]: Similar blueprint analyses
@@ -299,59 +519,223 @@ class VectorDBService:
             return []
 
         # Generate query embedding
-        query_embedding = self.embedding_model.encode(query).tolist()
+        if query_embedding is None:
+            query_embedding = await self.embed(query)
 
         # Search collection
-        results = self.blueprint_analysis_collection.query(
+        return await self._run(self._query, self.blueprint_analysis_collection, query_embedding, n_results)
+
+    def _read_knowledge_generation(self) -> int:
+        try:
+            with open(os.path.join(self.persist_directory, KNOWLEDGE_GENERATION_FILE)) as f:
+                return int(json.load(f)["generation"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return 0
+
+    def _bump_knowledge_generation(self):
+        generation = self._read_knowledge_generation() + 1
+        path = os.path.join(self.persist_directory, KNOWLEDGE_GENERATION_FILE)
+        os.makedirs(self.persist_directory, exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"generation": generation}, f)
+        os.replace(path + ".tmp", path)
+        self.knowledge_version = f"gen-{generation}"
+
+    async def _on_knowledge_changed(self):
+        """
+        Bump the knowledge version and drop semantic cache entries built on the old one.
+
+        The version is a generation counter persisted next to the Chroma data, so
+        replacing a document changes it even when the document count does not.
+        """
+        await self._run(self._bump_knowledge_generation)
+        await self.invalidate_semantic_cache(keep_current=True)
+
+    async def invalidate_semantic_cache(self, keep_current: bool = False):
+        """
+        Remove cached answers from the semantic cache.
+
+        Args:
+            keep_current (bool): Only remove entries built on an older knowledge version.
+        """
+        if not self.is_available:
+            return
+
+        await self._run(self._invalidate_semantic_cache, keep_current)
+
+    def _invalidate_semantic_cache(self, keep_current: bool):
+        where = {"kb_version": {"$ne": self.knowledge_version}} if keep_current else None
+        existing = self.semantic_cache_collection.get(where=where, include=[])
+        if existing["ids"]:
+            self.semantic_cache_collection.delete(ids=existing["ids"])
+            self.semantic_cache_stats["invalidations"] += len(existing["ids"])
+
+    async def lookup_semantic_cache(self, query: str, model: str, scope: str = "") -> Optional[Dict[str, Any]]:
+        """
+        Find a cached answer to a semantically equivalent query.
+
+        Args:
+            query (str): The user query
+            model (str): The model that would answer it
+            scope (str): Hash of the request options the answer depends on; only entries stored with it match
+
+        Returns:
+            Optional[Dict[str, Any]]: The cached answer with its similarity score, or None on a miss
+        """
+        if not self.is_available or not SEMANTIC_CACHE_ENABLED:
+            return None
+
+        if await self._run(self.semantic_cache_collection.count) == 0:
+            self.semantic_cache_stats["misses"] += 1
+            return None
+
+        query_embedding = await self.embed(query)
+        results = await self._run(
+            self.semantic_cache_collection.query,
             query_embeddings=[query_embedding],
-            n_results=n_results,
-            include=["documents", "metadatas", "distances"]
+            n_results=1,
+            include=["documents", "metadatas", "distances"],
+            where={"$and": [{"model": model}, {"kb_version": self.knowledge_version}, {"scope": scope}]}
         )
 
-        # Format results
-        formatted_results = []
-        for i in range(len(results["documents"][0])):
-            formatted_results.append({
-                "content": results["documents"][0][i],
-                "metadata": results["metadatas"][0][i],
-                "similarity_score": 1 - results["distances"][0][i]
-            })
+        if results["documents"] and results["documents"][0]:
+            similarity = 1 - results["distances"][0][0]
+            if similarity >= self.semantic_cache_threshold:
+                self.semantic_cache_stats["hits"] += 1
+                metadata = results["metadatas"][0][0]
+                return {
+                    "answer": metadata["answer"],
+                    "cached_query": results["documents"][0][0],
+                    "model": model,
+                    "similarity_score": similarity
+                }
+
+        self.semantic_cache_stats["misses"] += 1
+        return None
+
+    async def store_semantic_cache(self, query: str, answer: str, model: str, scope: str = "") -> Optional[str]:
+        """
+        Store an answer so paraphrased queries can reuse it.
 
-        return formatted_results
+        Args:
+            query (str): The user query
+            answer (str): The generated answer
+            model (str): The model that produced the answer
+            scope (str): Hash of the request options the answer depends on
+
+        Returns:
+            Optional[str]: Cache entry ID, or None when the cache is unavailable
+        """
+        if not self.is_available or not SEMANTIC_CACHE_ENABLED:
+            return None
 
-    async def initialize_default_knowledge(self):
-        """Initialize the database with default deck design knowledge."""
+        entry_id = str(uuid.uuid4())
+        embedding = await self.embed(query)
+        await self._run(
+            self.semantic_cache_collection.add,
+            embeddings=[embedding],
+            documents=[query],
+            metadatas=[{"answer": answer, "model": model, "kb_version": self.knowledge_version, "scope": scope}],
+            ids=[entry_id]
+        )
+        self.semantic_cache_stats["stores"] += 1
+        return entry_id
+
+    async def get_semantic_cache_stats(self) -> Dict[str, Any]:
+        """Get semantic cache hit-rate metrics."""
+        lookups = self.semantic_cache_stats["hits"] + self.semantic_cache_stats["misses"]
+        return {
+            **self.semantic_cache_stats,
+            "hit_rate": round(self.semantic_cache_stats["hits"] / lookups, 4) if lookups else 0.0,
+            "threshold": self.semantic_cache_threshold,
+            "knowledge_version": self.knowledge_version,
+            "entries": await self._run(self.semantic_cache_collection.count) if self.is_available else 0,
+            "enabled": self.is_available and SEMANTIC_CACHE_ENABLED
+        }
+
+    def _seed_manifest(self, knowledge: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Manifest describing a seed corpus: its digest, the embedding model and the document IDs."""
+        corpus = json.dumps([[item["content"], item["metadata"]] for item in knowledge], sort_keys=True)
+        return {
+            "version": SEED_MANIFEST_VERSION,
+            "embedding_model": self.embedding_model_name,
+            "digest": hashlib.sha256(corpus.encode("utf-8")).hexdigest(),
+            "ids": [knowledge_id(item["content"]) for item in knowledge],
+        }
+
+    def _read_seed_manifest(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self.persist_directory, SEED_MANIFEST_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_seed_manifest(self, manifest: Dict[str, Any]):
+        path = os.path.join(self.persist_directory, SEED_MANIFEST_FILE)
+        os.makedirs(self.persist_directory, exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def _seed_is_current(self, manifest: Dict[str, Any]) -> bool:
+        """Whether the stored manifest matches and all of its documents are still in the collection."""
+        if self._read_seed_manifest() != manifest:
+            return False
+        present = self.deck_knowledge_collection.get(ids=manifest["ids"], include=[])["ids"]
+        return len(present) == len(manifest["ids"])
+
+    def _remove_stale_seed_documents(self, knowledge: List[Dict[str, Any]], manifest: Dict[str, Any]) -> int:
+        """Delete documents of an older seed corpus and copies of the seed stored under random IDs."""
+        current_ids = set(manifest["ids"])
+        previous = self._read_seed_manifest() or {}
+        stale_ids = [doc_id for doc_id in previous.get("ids", []) if doc_id not in current_ids]
+        for item in knowledge:
+            # Seeding before content-addressed IDs inserted another uuid4 copy on every startup
+            copies = self.deck_knowledge_collection.get(
+                where_document={"$contains": item["content"]}, include=["documents"]
+            )
+            stale_ids.extend(
+                doc_id for doc_id, document in zip(copies["ids"], copies["documents"])
+                if document == item["content"] and doc_id not in current_ids
+            )
+        if stale_ids:
+            self.deck_knowledge_collection.delete(ids=stale_ids)
+            print(f"Removed {len(stale_ids)} stale or duplicate seed documents from deck_knowledge")
+        return len(stale_ids)
+
+    async def initialize_default_knowledge(self, knowledge: Optional[List[Dict[str, Any]]] = None) -> bool:
+        """
+        Initialize the database with default deck design knowledge.
+
+        Seeding is idempotent. A manifest stored next to the Chroma data records
+        what was seeded. While it matches, startup skips seeding and embedding
+        entirely. Otherwise stale and duplicate seed documents are removed and the
+        corpus is upserted under content-addressed IDs.
+
+        Args:
+            knowledge (Optional[List[Dict[str, Any]]]): Seed documents with content and metadata.
+                Defaults to DEFAULT_KNOWLEDGE.
+
+        Returns:
+            bool: Whether the corpus was (re)seeded
+        """
         if not self.is_available:
             print("Skipping initialize_default_knowledge in stub mode")
-            return
+            return False
 
-        default_knowledge = [
-            {
-                "content": "Standard deck joist spacing is typically 16 inches on center for residential decks. This provides adequate support for most decking materials.",
-                "metadata": {"category": "structural", "topic": "joists", "importance": "high"}
-            },
-            {
-                "content": "Deck railing height must be at least 36 inches for decks less than 30 inches above grade, and 42 inches for higher decks according to most building codes.",
-                "metadata": {"category": "safety", "topic": "railings", "importance": "critical"}
-            },
-            {
-                "content": "Pressure-treated lumber is the most common material for deck framing due to its resistance to moisture and insects.",
-                "metadata": {"category": "materials", "topic": "lumber", "importance": "medium"}
-            },
-            {
-                "content": "Deck footings should extend below the frost line in your area to prevent heaving and structural damage.",
-                "metadata": {"category": "foundation", "topic": "footings", "importance": "high"}
-            },
-            {
-                "content": "Composite decking requires less maintenance than wood but may have specific installation requirements for expansion gaps.",
-                "metadata": {"category": "materials", "topic": "composite", "importance": "medium"}
-            }
-        ]
+        knowledge = DEFAULT_KNOWLEDGE if knowledge is None else knowledge
+        manifest = self._seed_manifest(knowledge)
+        if await self._run(self._seed_is_current, manifest):
+            print("Default knowledge is up to date; skipping seeding")
+            return False
 
-        for knowledge in default_knowledge:
-            await self.add_deck_knowledge(knowledge["content"], knowledge["metadata"])
+        if await self._run(self._remove_stale_seed_documents, knowledge, manifest):
+            await self._on_knowledge_changed()
+        await self.upsert_deck_knowledge([(item["content"], item["metadata"]) for item in knowledge])
+        await self._run(self._write_seed_manifest, manifest)
+        return True
 
-    def get_collection_stats(self) -> Dict[str, int]:
+    async def get_collection_stats(self) -> Dict[str, int]:
         """Get statistics about the vector database collections."""
         if not self.is_available:
             return {
@@ -361,10 +745,15 @@ class VectorDBService:
                 "status": "unavailable"
             }
 
+        deck_knowledge, conversation_history, blueprint_analysis = await asyncio.gather(
+            self._run(self.deck_knowledge_collection.count),
+            self._run(self.conversation_history_collection.count),
+            self._run(self.blueprint_analysis_collection.count),
+        )
         return {
-            "deck_knowledge_count": self.deck_knowledge_collection.count(),
-            "conversation_history_count": self.conversation_history_collection.count(),
-            "blueprint_analysis_count": self.blueprint_analysis_collection.count(),
+            "deck_knowledge_count": deck_knowledge,
+            "conversation_history_count": conversation_history,
+            "blueprint_analysis_count": blueprint_analysis,
             "status": "available"
         }
 
@@ -374,14 +763,33 @@ class VectorDBService:
             print("Skipping reset_collections in stub mode")
             return
 
+        await self._run(self._reset_collections)
+        await self._on_knowledge_changed()
+
+    def _reset_collections(self):
         self.client.reset()
         self.deck_knowledge_collection = self._get_or_create_collection("deck_knowledge")
         self.conversation_history_collection = self._get_or_create_collection("conversation_history")
         self.blueprint_analysis_collection = self._get_or_create_collection("blueprint_analysis")
+        self.semantic_cache_collection = self._get_or_create_collection("semantic_cache")
 
+    async def shutdown(self):
+        """Stop the executor once queued calls have finished, then write any queued embeddings."""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            await asyncio.to_thread(executor.shutdown, wait=True)
+        await asyncio.to_thread(self.embedding_cache.flush)
 
-# Global instance for easy access
-vector_db_service = VectorDBService()
+
+@functools.lru_cache(maxsize=None)
+def get_vector_db_service() -> VectorDBService:
+    """
+    Get the global instance, building it on first use.
+
+    It loads the embedding model, so tools that build their own VectorDBService
+    do not load the model twice.
+    """
+    return VectorDBService()
 
 
 async def enhance_query_with_context(query: str, user_id: str = None) -> Dict[str, Any]:
@@ -393,8 +801,9 @@ async def enhance_query_with_context(query: str, user_id: str = None) -> Dict[st
         user_id (str, optional): User identifier for personalized context
 
     Returns:
-        Dict[str, Any]: Enhanced query with context
+        Dict[str, Any]: Enhanced query with context, and ``timings`` in milliseconds per retrieval stage
     """
+    vector_db_service = get_vector_db_service()
     # Check if vector_db_service is available
     if not vector_db_service.is_available:
         print(f"Skipping enhance_query_with_context in stub mode: {query}")
@@ -403,26 +812,46 @@ async def enhance_query_with_context(query: str, user_id: str = None) -> Dict[st
             "relevant_knowledge": [],
             "conversation_context": [],
             "similar_blueprints": [],
-            "enhanced_context": f"Note: Vector database is not available. Query: {query}"
+            "enhanced_context": f"Note: Vector database is not available. Query: {query}",
+            "timings": {}
         }
 
-    # Search for relevant knowledge
-    knowledge_results = await vector_db_service.search_deck_knowledge(query, n_results=3)
-
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+
+    async def timed(stage: str, search):
+        stage_started = time.perf_counter()
+        results = await search
+        timings[stage] = round((time.perf_counter() - stage_started) * 1000, 3)
+        return results
+
+    # Embed the query once and share it between the collection searches, which run concurrently
+    query_embedding = await timed("embed", vector_db_service.embed(query))
+
+    searches = [
+        # Search for relevant knowledge
+        timed("deck_knowledge", vector_db_service.search_deck_knowledge(
+            query, n_results=3, query_embedding=query_embedding)),
+        # Search for similar blueprints
+        timed("similar_blueprints", vector_db_service.search_similar_blueprints(
+            query, n_results=2, query_embedding=query_embedding)),
+    ]
     # Get conversation context if user_id provided
-    conversation_context = []
     if user_id:
-        conversation_context = await vector_db_service.get_conversation_context(user_id, query, n_results=2)
+        searches.append(timed("conversation_context", vector_db_service.get_conversation_context(
+            user_id, query, n_results=2, query_embedding=query_embedding)))
 
-    # Search for similar blueprints
-    blueprint_context = await vector_db_service.search_similar_blueprints(query, n_results=2)
+    knowledge_results, blueprint_context, *rest = await asyncio.gather(*searches)
+    conversation_context = rest[0] if rest else []
+    timings["total"] = round((time.perf_counter() - started) * 1000, 3)
 
     return {
         "original_query": query,
         "relevant_knowledge": knowledge_results,
         "conversation_context": conversation_context,
         "similar_blueprints": blueprint_context,
-        "enhanced_context": _format_context_for_prompt(knowledge_results, conversation_context, blueprint_context)
+        "enhanced_context": _format_context_for_prompt(knowledge_results, conversation_context, blueprint_context),
+        "timings": timings
     }
 
 
@@ -0,0 +1,290 @@
+"""
+Vision Input Preprocessing
+
+This module shrinks images before they are sent to a multimodal model. Vision
+models resize their input to a fixed resolution anyway, so a 12 MP phone photo
+only adds payload and vision-encoder time. Each image is decoded once,
+auto-oriented from its EXIF tag, optionally cropped to its content, resized to
+the target model's native input resolution and re-encoded (JPEG, or PNG for
+line drawings that compress better losslessly). Processed variants are cached
+by content hash, so the same upload is processed once. The cache holds the
+base64 strings as they are, sized by length, so a hit never serializes a
+multi-megabyte payload on the event loop.
+"""
+
+import asyncio
+import base64
+import binascii
+import hashlib
+import io
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple, Union
+
+from PIL import Image, ImageChops, ImageOps, UnidentifiedImageError
+
+from ai_service.single_flight import single_flight, make_flight_key
+
+VISION_PREPROCESSING_ENABLED = os.getenv("VISION_PREPROCESSING_ENABLED", "true").lower() == "true"
+# Longest image side each model's vision encoder works at; larger inputs are downscaled
+VISION_MODEL_INPUT_SIZES = {
+    "qwen2.5-vl": 1288,  # 46 patches of 28 px
+    "llava-deckbot": 672,  # LLaVA-1.6 any-resolution grid
+    "llava": 672,
+    **json.loads(os.getenv("VISION_MODEL_INPUT_SIZES", "{}")),
+}
+VISION_DEFAULT_INPUT_SIZE = int(os.getenv("VISION_DEFAULT_INPUT_SIZE", "1024"))
+VISION_CROP_BORDERS = os.getenv("VISION_CROP_BORDERS", "true").lower() == "true"
+VISION_JPEG_QUALITY = int(os.getenv("VISION_JPEG_QUALITY", "90"))
+VISION_CACHE_MAX_ENTRIES = int(os.getenv("VISION_CACHE_MAX_ENTRIES", "256"))
+VISION_CACHE_MAX_BYTES = int(os.getenv("VISION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+VISION_CACHE_TTL = float(os.getenv("VISION_CACHE_TTL", "3600.0"))
+
+# Pixels within this distance of the border colour count as border
+_BORDER_TOLERANCE = 24
+# Crops that would keep less than this fraction of either side are ignored as misdetections
+_MIN_CROP_FRACTION = 0.2
+_EXIF_ORIENTATION = 0x0112
+
+
+def _crop_borders(image: Image.Image) -> Image.Image:
+    """Crop uniform margins (scanner bed, paper edge) around the content."""
+    gray = image.convert("L")
+    background = Image.new("L", gray.size, gray.getpixel((0, 0)))
+    mask = ImageChops.difference(gray, background).point(lambda value: 255 if value > _BORDER_TOLERANCE else 0)
+    bbox = mask.getbbox()
+    if bbox is None:
+        return image
+    left, top, right, bottom = bbox
+    width, height = image.size
+    if (right - left) < width * _MIN_CROP_FRACTION or (bottom - top) < height * _MIN_CROP_FRACTION:
+        return image
+    if (left, top, right, bottom) == (0, 0, width, height):
+        return image
+    return image.crop(bbox)
+
+
+class ProcessedImageCache:
+    """In-memory LRU+TTL cache of base64 images, bounded by entry count and total length."""
+
+    def __init__(self, max_entries: int = VISION_CACHE_MAX_ENTRIES, max_bytes: int = VISION_CACHE_MAX_BYTES,
+                 ttl_seconds: float = VISION_CACHE_TTL):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries (int): Maximum images held.
+            max_bytes (int): Maximum total length of the held base64 strings.
+            ttl_seconds (float): Lifetime of an entry.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """Look up an image; None on a miss or an expired entry."""
+        entry = self._entries.get(key)
+        if entry is not None and time.time() - entry[1] >= self.ttl_seconds:
+            self._remove(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key: str, value: str):
+        """Store an image, evicting the least recently used ones past the limits."""
+        if len(value) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, time.time())
+        self._bytes += len(value)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        value, _ = self._entries.pop(key)
+        self._bytes -= len(value)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+        }
+
+
+class VisionPreprocessor:
+    """Downsizes and re-encodes images for a multimodal model, with a content-hash cache."""
+
+    def __init__(self, enabled: bool = VISION_PREPROCESSING_ENABLED,
+                 model_input_sizes: Optional[Dict[str, int]] = None,
+                 default_input_size: int = VISION_DEFAULT_INPUT_SIZE,
+                 crop_borders: bool = VISION_CROP_BORDERS,
+                 jpeg_quality: int = VISION_JPEG_QUALITY,
+                 cache: Optional[ProcessedImageCache] = None):
+        """
+        Initialize the preprocessor.
+
+        Args:
+            enabled (bool): When False, images are passed through untouched.
+            model_input_sizes (Optional[Dict[str, int]]): Longest side per model. Defaults to VISION_MODEL_INPUT_SIZES.
+            default_input_size (int): Longest side for models not in model_input_sizes.
+            crop_borders (bool): Crop uniform margins around the content.
+            jpeg_quality (int): Quality of the re-encoded JPEG.
+            cache (Optional[ProcessedImageCache]): Cache of processed images. Defaults to one sized by the
+                VISION_CACHE_* settings.
+        """
+        self.enabled = enabled
+        self.model_input_sizes = VISION_MODEL_INPUT_SIZES if model_input_sizes is None else model_input_sizes
+        self.default_input_size = default_input_size
+        self.crop_borders = crop_borders
+        self.jpeg_quality = jpeg_quality
+        self.cache = cache or ProcessedImageCache()
+        self.processed = 0
+        self.passed_through = 0
+        self.errors = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds = 0.0
+
+    def input_size(self, model: str) -> int:
+        """Longest image side for a model."""
+        if model in self.model_input_sizes:
+            return self.model_input_sizes[model]
+        # Tagged variants ("qwen2.5-vl:7b") share the base model's encoder
+        return self.model_input_sizes.get(model.split(":", 1)[0], self.default_input_size)
+
+    def _process(self, image_bytes: bytes, max_side: int) -> Optional[bytes]:
+        """Decode, orient, crop, resize and re-encode; None when the image needs no changes."""
+        image = Image.open(io.BytesIO(image_bytes))
+        source_format = image.format
+        full_size = image.size
+        # Let the JPEG decoder downscale by 1/2..1/8 while decoding instead of after
+        image.draft("RGB", (max_side, max_side))
+        drafted = image.size != full_size
+
+        # exif_transpose copies the image even when there is nothing to undo, so check the tag itself
+        rotated = image.getexif().get(_EXIF_ORIENTATION, 1) != 1
+        if rotated:
+            image = ImageOps.exif_transpose(image)
+        changed = drafted or rotated
+        if self.crop_borders:
+            cropped = _crop_borders(image)
+            changed = changed or cropped is not image
+            image = cropped
+        if max(image.size) > max_side:
+            image = image.copy()
+            image.thumbnail((max_side, max_side), Image.LANCZOS)
+            changed = True
+        if not changed:
+            return None
+
+        if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+            # Flatten transparency onto white, as a printed blueprint would be
+            rgba = image.convert("RGBA")
+            image = Image.new("RGB", rgba.size, "white")
+            image.paste(rgba, mask=rgba.getchannel("A"))
+        elif image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=self.jpeg_quality, optimize=True)
+        if source_format == "PNG" and buffer.tell() >= len(image_bytes):
+            # Flat line drawings compress better losslessly, and without JPEG ringing on thin lines
+            buffer = io.BytesIO()
+            image.save(buffer, format="PNG", optimize=True)
+        return buffer.getvalue()
+
+    def _prepare_sync(self, image_bytes: bytes, model: str, original_base64: Optional[str]) -> Tuple[str, bool]:
+        started = time.perf_counter()
+        try:
+            processed = self._process(image_bytes, self.input_size(model))
+        except (UnidentifiedImageError, OSError, ValueError):
+            # Let the model report on inputs Pillow cannot read
+            processed = None
+            self.errors += 1
+        if processed is None:
+            self.passed_through += 1
+            result = original_base64 or base64.b64encode(image_bytes).decode("utf-8")
+        else:
+            self.processed += 1
+            result = base64.b64encode(processed).decode("utf-8")
+        self.bytes_in += len(image_bytes)
+        self.bytes_out += len(result) * 3 // 4
+        self.seconds += time.perf_counter() - started
+        return result, processed is not None
+
+    async def prepare(self, image: Union[bytes, str], model: str) -> str:
+        """
+        Prepare an image for a multimodal model.
+
+        Args:
+            image (Union[bytes, str]): Raw image bytes or a base64-encoded image.
+            model (str): The model the image is for, which sets the target resolution.
+
+        Returns:
+            str: The base64-encoded image to send to Ollama.
+
+        Raises:
+            ValueError: If a base64 string does not decode.
+        """
+        if not self.enabled:
+            return image if isinstance(image, str) else base64.b64encode(image).decode("utf-8")
+        if isinstance(image, str):
+            try:
+                image_bytes = base64.b64decode(image, validate=False)
+            except binascii.Error as e:
+                raise ValueError(f"Invalid base64 image: {e}")
+        else:
+            image_bytes = image
+
+        max_side = self.input_size(model)
+        key = f"{hashlib.sha256(image_bytes).hexdigest()}:{max_side}:{int(self.crop_borders)}:{self.jpeg_quality}"
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        async def process() -> Tuple[str, bool]:
+            # Decoding and resampling are CPU-bound; keep them off the event loop
+            return await asyncio.to_thread(self._prepare_sync, image_bytes, model,
+                                           image if isinstance(image, str) else None)
+
+        result, processed = await single_flight.do(make_flight_key("vision", key), process)
+        if processed:
+            # Pass-through images are not worth the memory
+            self.cache.set(key, result)
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get processing counters and the size reduction achieved."""
+        return {
+            "enabled": self.enabled,
+            "processed": self.processed,
+            "passed_through": self.passed_through,
+            "errors": self.errors,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "size_ratio": round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else None,
+            "seconds": round(self.seconds, 3),
+            "cache": self.cache.get_stats(),
+        }
+
+
+# Global instance used by the image analysis functions
+vision_preprocessor = VisionPreprocessor()
@@ -0,0 +1,236 @@
+"""
+Micro-benchmarks for the CPU-bound hot paths of ai-service.
+
+Covers dimension parsing and OCR (lib2.square_footage), blueprint SVG
+generation, VectorDBService embedding and search, voice-command parsing, and
+the base64 image/audio handling done by the endpoints in main.py. Fixtures are
+built in-process: synthetic blueprint scans at screen and 300-dpi sizes, short
+and long OCR text, and WAV audio of 1, 10 and 60 seconds. Point
+``BENCH_IMAGE_DIR`` at a directory of real blueprint images (PNG/JPEG) to add
+them as fixtures too. Benchmarks whose dependency is missing (tesseract,
+sentence-transformers, chromadb, whisper) are reported as skipped.
+
+Usage:
+    python -m benchmarks.bench_hot_paths --save baseline.json
+    python -m benchmarks.bench_hot_paths --compare baseline.json --threshold 0.10
+    python -m benchmarks.bench_hot_paths -k parse_dimensions base64
+"""
+
+import asyncio
+import base64
+import glob
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import wave
+from typing import Dict
+
+from PIL import Image, ImageDraw
+
+from benchmarks.microbench import SkipBenchmark, benchmark, main
+
+BENCH_IMAGE_DIR = os.getenv("BENCH_IMAGE_DIR")
+SEED = 1234
+
+_OCR_NOISE = [
+    # No "AxB" tokens, so the parser has to scan to the end of the text
+    "DECK FRAMING PLAN", "SCALE 1/4\" = 1'-0\"", "JOISTS @ 16\" O.C.", "DOUBLE BEAM",
+    "12\" DIA. FOOTING", "LEDGER W/ 1/2\" LAG SCREWS", "SIMPSON H2.5A", "GUARD 36\" MIN.",
+    "STAIR 7-3/4\" MAX RISE", "NOTE: ALL LUMBER PT", "DETAIL A", "SEE SHEET S-2", "|", "—", "~", "l1",
+]
+
+
+def _ocr_text(lines: int, dimensions: bool, seed: int = SEED) -> str:
+    """OCR-like output of a blueprint sheet, optionally ending with the deck dimensions."""
+    rng = random.Random(seed)
+    text = "\n".join(" ".join(rng.choice(_OCR_NOISE) for _ in range(rng.randint(1, 4))) for _ in range(lines))
+    return text + ("\nOVERALL DECK 12ft x 16ft" if dimensions else "")
+
+
+def _blueprint_png(width: int, height: int) -> bytes:
+    """A deck framing plan drawn like a scanned blueprint: outline, joists, footings and labels."""
+    image = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    margin = width // 10
+    left, top, right, bottom = margin, margin, width - margin, height - margin * 2
+    draw.rectangle((left, top, right, bottom), outline=0, width=max(2, width // 400))
+    spacing = max(8, (right - left) // 24)
+    for x in range(left + spacing, right, spacing):
+        draw.line((x, top, x, bottom), fill=60, width=1)
+    for x in range(left, right + 1, (right - left) // 4):
+        draw.ellipse((x - spacing // 3, bottom - spacing // 3, x + spacing // 3, bottom + spacing // 3), outline=0)
+    for i, label in enumerate(["DECK FRAMING PLAN", "12ft x 16ft", "2x8 JOISTS @ 16\" O.C.", "(2) 2x10 BEAM"]):
+        draw.text((left, bottom + margin // 2 + i * 14), label, fill=0)
+    rng = random.Random(SEED)
+    pixels = image.load()
+    for _ in range(width * height // 200):  # Scanner speckle
+        pixels[rng.randrange(width), rng.randrange(height)] = rng.choice((0, 255))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _wav(seconds: float, rate: int = 16000) -> bytes:
+    """Mono 16-bit WAV of low-level noise."""
+    rng = random.Random(SEED)
+    frames = bytes(rng.getrandbits(8) & 0x0F for _ in range(int(seconds * rate) * 2))
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(frames)
+    return buffer.getvalue()
+
+
+def _images() -> Dict[str, bytes]:
+    images = {"plan_800x600": _blueprint_png(800, 600), "scan_2550x3300": _blueprint_png(2550, 3300)}
+    if BENCH_IMAGE_DIR:
+        for path in sorted(glob.glob(os.path.join(BENCH_IMAGE_DIR, "*"))):
+            if path.lower().endswith((".png", ".jpg", ".jpeg")):
+                with open(path, "rb") as f:
+                    images[os.path.splitext(os.path.basename(path))[0]] = f.read()
+    return images
+
+
+IMAGES = _images()
+OCR_TEXTS = {
+    "short": "Deck is 12ft x 16ft",
+    "long_ocr": _ocr_text(2000, dimensions=True),
+    "long_ocr_no_match": _ocr_text(2000, dimensions=False),
+}
+AUDIO = {f"{seconds}s": _wav(seconds) for seconds in (1, 10, 60)}
+TRANSCRIPTS = {
+    "command": "Change the deck width to 14 feet and show the railing",
+    "dictation": " ".join(["Measure the joists at 16 inches and calculate 2.5 feet of overhang"] * 50),
+}
+
+
+# --- lib2.square_footage ---
+
+for _name, _text in OCR_TEXTS.items():
+    @benchmark(f"parse_dimensions[{_name}]", group="square_footage")
+    def _parse_dimensions(text=_text):
+        from lib2.square_footage import parse_dimensions_from_text
+        return lambda: parse_dimensions_from_text(text)
+
+
+for _name, _image in IMAGES.items():
+    @benchmark(f"extract_text_from_image[{_name}]", group="square_footage")
+    def _extract_text(image=_image):
+        import pytesseract
+        from lib2.square_footage import extract_text_from_image
+        try:
+            pytesseract.get_tesseract_version()
+        except pytesseract.TesseractNotFoundError:
+            raise SkipBenchmark("tesseract binary not installed")
+        return lambda: extract_text_from_image(image)
+
+
+# --- blueprint ---
+
+@benchmark("generate_blueprint_svg", group="blueprint")
+def _generate_blueprint_svg():
+    from ai_service.blueprint import AnalysisResult, generate_blueprint_svg
+    analysis = AnalysisResult(gross_living_area=192.0, net_square_footage=180.5, linear_railing_footage=44.0,
+                              stair_cutouts=1)
+    return lambda: generate_blueprint_svg(analysis)
+
+
+# --- vector database ---
+
+def _vector_db():
+    from ai_service import vector_db_service
+    if not vector_db_service.SENTENCE_TRANSFORMERS_AVAILABLE:
+        raise SkipBenchmark("sentence-transformers not installed")
+    return vector_db_service
+
+
+def _embedding_model():
+    module = _vector_db()
+    # The service only loads its model when chromadb is installed too
+    return module.get_vector_db_service().embedding_model or module.SentenceTransformer(module.EMBEDDING_MODEL_NAME)
+
+
+@benchmark("vector_db_encode[query]", group="vector_db")
+def _encode_query():
+    model = _embedding_model()
+    return lambda: model.encode(TRANSCRIPTS["command"])
+
+
+@benchmark("vector_db_encode[batch_32]", group="vector_db")
+def _encode_batch():
+    model = _embedding_model()
+    documents = [f"{TRANSCRIPTS['command']} ({i})" for i in range(32)]
+    return lambda: model.encode(documents)
+
+
+@benchmark("vector_db_search_deck_knowledge", group="vector_db")
+def _search_deck_knowledge():
+    module = _vector_db()
+    if not module.CHROMADB_AVAILABLE:
+        raise SkipBenchmark("chromadb not installed")
+    directory = tempfile.mkdtemp(prefix="bench_chroma_")
+    service = module.VectorDBService(persist_directory=directory)
+    asyncio.run(service.initialize_default_knowledge())
+
+    async def search():
+        await service.search_deck_knowledge("What joist spacing do I need for composite decking?")
+    return search
+
+
+# --- whisper ---
+
+for _name, _transcript in TRANSCRIPTS.items():
+    @benchmark(f"process_deck_commands[{_name}]", group="whisper")
+    def _process_deck_commands(transcript=_transcript):
+        from ai_service.whisper_service import whisper_service
+
+        async def process():
+            await whisper_service._process_deck_commands(transcript)
+        return process
+
+
+for _name, _audio in AUDIO.items():
+    @benchmark(f"audio_to_temp_file[{_name}]", group="whisper")
+    def _audio_to_temp_file(audio=_audio):
+        from ai_service.whisper_service import whisper_service
+
+        async def spool():
+            os.unlink(await whisper_service._bytes_to_temp_file(audio))
+        return spool
+
+
+for _name in ("1s", "10s"):
+    @benchmark(f"transcribe_audio[{_name}]", group="whisper")
+    def _transcribe(audio=AUDIO[_name]):
+        from ai_service.whisper_service import WHISPER_AVAILABLE, WhisperService
+        if not WHISPER_AVAILABLE or shutil.which("ffmpeg") is None:
+            raise SkipBenchmark("whisper or ffmpeg not installed")
+        service = WhisperService(model_size="tiny")
+        asyncio.run(service.load_model())
+
+        async def transcribe():
+            await service.transcribe_audio(audio, language="en")
+        return transcribe
+
+
+# --- base64 handling in main.py endpoints ---
+
+for _name, _payload in {**IMAGES, **{f"wav_{name}": audio for name, audio in AUDIO.items()}}.items():
+    @benchmark(f"base64_decode[{_name}]", group="base64")
+    def _base64_decode(encoded=base64.b64encode(_payload).decode("utf-8")):
+        # e.g. base64.b64decode(request.imageBase64)
+        return lambda: base64.b64decode(encoded)
+
+    @benchmark(f"base64_encode[{_name}]", group="base64")
+    def _base64_encode(raw=_payload):
+        # e.g. base64.b64encode(enhanced_bytes).decode("utf-8")
+        return lambda: base64.b64encode(raw).decode("utf-8")
+
+
+if __name__ == "__main__":
+    sys.exit(main(description=__doc__))
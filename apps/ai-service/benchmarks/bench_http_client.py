@@ -0,0 +1,73 @@
+"""
+Benchmark: per-call vs pooled HTTP client for Ollama calls.
+
+Drives ``chat_with_ollama`` against the stub Ollama server twice: once with a
+fresh ``httpx.AsyncClient`` per call (the previous behaviour) and once with the
+shared pooled client. Prints requests/sec for both.
+
+Usage:
+    python -m benchmarks.bench_http_client --requests 2000 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+PORT = int(os.getenv("STUB_OLLAMA_PORT", "11435"))
+os.environ["OLLAMA_BASE_URL"] = f"http://127.0.0.1:{PORT}"
+
+import httpx  # noqa: E402
+
+from ai_service import core  # noqa: E402
+from benchmarks.stub_ollama import run_in_thread  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "What is the standard joist spacing?"}]
+
+
+async def _run(total: int, concurrency: int, pooled: bool) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            if pooled:
+                await core.chat_with_ollama(MESSAGES)
+            else:
+                async with httpx.AsyncClient() as client:
+                    await core.chat_with_ollama(MESSAGES, client=client)
+
+    await core.init_http_client()
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    await core.close_http_client()
+    return total / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    server = run_in_thread(PORT)
+    try:
+        # Warm up both paths once so import/JIT costs don't skew the first run
+        asyncio.run(_run(50, args.concurrency, pooled=True))
+        per_call = asyncio.run(_run(args.requests, args.concurrency, pooled=False))
+        pooled = asyncio.run(_run(args.requests, args.concurrency, pooled=True))
+    finally:
+        server.should_exit = True
+
+    print(json.dumps({
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "per_call_client_rps": round(per_call, 1),
+        "pooled_client_rps": round(pooled, 1),
+        "speedup": round(pooled / per_call, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark: legacy vs prefix-stable prompt layout.
+
+Replays multi-turn deck-design conversations against Ollama with two message
+layouts and sums the prompt_eval_count / prompt_eval_duration Ollama reports:
+
+* legacy: per-request context first (retrieved context inserted at index 0,
+  the JSON context before the system prompt), as the service used to do;
+* stable: ``prompt_assembler`` layout, with static instructions first and
+  per-turn data right before the latest user turn.
+
+Conversations are interleaved round-robin, as concurrent users would be. By
+default a stub Ollama with prefix-cache emulation is started; pass
+``--ollama-url`` and ``--model`` to measure a real server.
+
+Usage:
+    python -m benchmarks.bench_prompt_layout --conversations 4 --turns 6
+"""
+
+import argparse
+import asyncio
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from ai_service.core import DECK_DESIGN_SYSTEM_PROMPT
+from ai_service.prompt_assembly import PromptAssembler
+from benchmarks.stub_ollama import run_in_thread
+
+PORT = int(os.getenv("STUB_OLLAMA_PORT", "11435"))
+
+QUESTIONS = [
+    "How many joists do I need for this deck?",
+    "What beam size should I use for that span?",
+    "How many footings and how deep?",
+    "Estimate the decking boards including waste.",
+    "What railing height does code require here?",
+    "Summarize the full material list.",
+    "What fasteners should I order?",
+    "How long will installation take a two-person crew?",
+]
+
+
+def _retrieved_context(conversation: int, turn: int) -> str:
+    """Stand-in for the vector-DB context retrieved for each turn."""
+    return (f"Project {conversation}, lookup {turn}: joists 2x8 @ 16in o.c. span up to 12ft; "
+            f"beams doubled 2x10; footings 12in diameter below frost line; ")
+
+
+def _request_context(conversation: int, turn: int) -> Dict[str, Any]:
+    """Stand-in for the per-request JSON context (measurements, materials)."""
+    return {"deck": {"width_ft": 12 + conversation, "length_ft": 16}, "turn": turn, "material": "pressure-treated"}
+
+
+def _legacy_messages(history: List[Dict[str, str]], question: str, conversation: int,
+                     turn: int) -> List[Dict[str, str]]:
+    messages = [
+        {"role": "system", "content": f"Context: {json.dumps(_request_context(conversation, turn), indent=2)}"},
+        {"role": "system", "content": DECK_DESIGN_SYSTEM_PROMPT},
+    ] + history + [{"role": "user", "content": question}]
+    messages.insert(0, {"role": "system", "content": f"Relevant context: {_retrieved_context(conversation, turn)}"})
+    return messages
+
+
+def _stable_messages(assembler: PromptAssembler, model: str, history: List[Dict[str, str]], question: str,
+                     conversation: int, turn: int) -> List[Dict[str, str]]:
+    turn_context = (f"Relevant context: {_retrieved_context(conversation, turn)}\n"
+                    f"Context: {json.dumps(_request_context(conversation, turn), indent=2, sort_keys=True)}")
+    return assembler.assemble(history + [{"role": "user", "content": question}], model,
+                              context=turn_context, instructions=DECK_DESIGN_SYSTEM_PROMPT).messages
+
+
+async def _replay(base_url: str, model: str, layout: str, conversations: int, turns: int) -> Dict[str, Any]:
+    assembler = PromptAssembler(model_budgets={}, tokenizers={})
+    histories: List[List[Dict[str, str]]] = [[] for _ in range(conversations)]
+    prompt_eval_count = 0
+    prompt_eval_duration = 0
+    async with httpx.AsyncClient(timeout=300) as client:
+        for turn in range(turns):
+            for conversation in range(conversations):
+                question = QUESTIONS[turn % len(QUESTIONS)]
+                history = histories[conversation]
+                if layout == "legacy":
+                    messages = _legacy_messages(history, question, conversation, turn)
+                else:
+                    messages = _stable_messages(assembler, model, history, question, conversation, turn)
+                response = await client.post(f"{base_url}/api/chat", json={
+                    "model": model, "messages": messages, "stream": False, "options": {"temperature": 0},
+                })
+                response.raise_for_status()
+                reply, done = "", {}
+                for line in response.text.splitlines():
+                    if line.strip():
+                        chunk = json.loads(line)
+                        reply += chunk.get("message", {}).get("content", "")
+                        if chunk.get("done"):
+                            done = chunk
+                prompt_eval_count += done.get("prompt_eval_count", 0)
+                prompt_eval_duration += done.get("prompt_eval_duration", 0)
+                history.extend([{"role": "user", "content": question}, {"role": "assistant", "content": reply}])
+    return {
+        "prompt_eval_count": prompt_eval_count,
+        "prompt_eval_ms": round(prompt_eval_duration / 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=4)
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--ollama-url", default=None, help="Measure a real Ollama instead of the stub")
+    parser.add_argument("--model", default="phi3:mini")
+    args = parser.parse_args()
+
+    server: Optional[Any] = None
+    base_url = args.ollama_url
+    if base_url is None:
+        server = run_in_thread(PORT)
+        base_url = f"http://127.0.0.1:{PORT}"
+    try:
+        legacy = asyncio.run(_replay(base_url, args.model, "legacy", args.conversations, args.turns))
+        stable = asyncio.run(_replay(base_url, args.model, "stable", args.conversations, args.turns))
+    finally:
+        if server is not None:
+            server.should_exit = True
+
+    print(json.dumps({
+        "backend": "stub" if server is not None else base_url,
+        "model": args.model,
+        "conversations": args.conversations,
+        "turns": args.turns,
+        "legacy": legacy,
+        "stable": stable,
+        "prompt_eval_reduction": round(1 - stable["prompt_eval_count"] / max(1, legacy["prompt_eval_count"]), 3),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
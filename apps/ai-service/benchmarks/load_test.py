@@ -0,0 +1,440 @@
+"""
+End-to-end load test for every ai-service endpoint.
+
+Starts the stub Ollama/Hugging Face server and ai-service (uvicorn) as
+subprocesses, waits for ``/ready``, then drives each endpoint at every
+concurrency level with a fixed number of requests. Reports throughput and
+p50/p95/p99 latency per endpoint and concurrency (plus time to first byte for
+streaming endpoints) as JSON, tagged with the git commit so runs can be
+compared across commits.
+
+Prompts are made unique per request so the response and semantic caches do not
+hide the Ollama path; pass ``--repeat-prompts`` to measure cache hits instead.
+
+Usage:
+    python -m benchmarks.load_test --concurrency 1 8 32 --requests 200 --output load.json
+    python -m benchmarks.load_test --endpoints chat session --latency 0.2 --tokens-per-second 40
+    python -m benchmarks.load_test --service-url http://localhost:8000  # an already running service
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUB_PORT = int(os.getenv("STUB_OLLAMA_PORT", "11435"))
+SERVICE_PORT = int(os.getenv("LOAD_TEST_SERVICE_PORT", "8765"))
+
+QUESTION = "How far apart should joists be for a 12 ft span?"
+CONVERSATION = [
+    {"role": "user", "content": "I am building a 12x16 ft deck."},
+    {"role": "assistant", "content": "Great, what material are you planning to use?"},
+]
+# Written into KNOWLEDGE_INGEST_DIR by start_servers; with --service-url it must exist there already
+INGEST_DOCUMENT = "load-test-knowledge.md"
+INGEST_TEXT = (
+    "# Joist spacing\n\nJoists are usually set 16 inches on center. Composite decking often needs 12 inches "
+    "on center, and diagonal decking needs closer spacing still.\n"
+)
+
+
+def _png_base64() -> str:
+    """A small PNG with some structure, so image code paths do real work."""
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGB", (320, 240), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((40, 40, 280, 200), outline="black", width=3)
+    draw.text((120, 110), "12' x 16'", fill="black")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def _wav_base64(seconds: float = 1.0, rate: int = 16000) -> str:
+    """One second of silence as 16-bit mono WAV."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(b"\0\0" * int(seconds * rate))
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+# A scenario sends one request and returns (status code, seconds to first byte or None)
+Scenario = Callable[[httpx.AsyncClient, int], Awaitable[Tuple[int, Optional[float]]]]
+
+
+def build_scenarios(repeat_prompts: bool) -> Dict[str, Scenario]:
+    """
+    Build one request function per endpoint.
+
+    Args:
+        repeat_prompts (bool): Send the same prompt every time instead of a unique one per request.
+
+    Returns:
+        Dict[str, Scenario]: Scenario name ("METHOD /path") to request function.
+    """
+    image = _png_base64()
+    audio = _wav_base64()
+    image_bytes = base64.b64decode(image)
+    audio_bytes = base64.b64decode(audio)
+    sessions: Dict[int, str] = {}
+
+    def question(i: int) -> str:
+        return QUESTION if repeat_prompts else f"{QUESTION} (request {i})"
+
+    def chat_messages(i: int) -> List[Dict[str, str]]:
+        return CONVERSATION + [{"role": "user", "content": question(i)}]
+
+    def simple(method: str, path: str, body: Callable[[int], Dict[str, Any]] = None) -> Scenario:
+        async def run(client: httpx.AsyncClient, i: int):
+            kwargs = body(i) if body else {}
+            response = await client.request(method, path, **kwargs)
+            return response.status_code, None
+        return run
+
+    def streaming(path: Callable[[httpx.AsyncClient, int], Awaitable[str]],
+                  body: Callable[[int], Dict[str, Any]]) -> Scenario:
+        async def run(client: httpx.AsyncClient, i: int):
+            url = await path(client, i)
+            started = time.perf_counter()
+            first_byte = None
+            async with client.stream("POST", url, json=body(i)) as response:
+                async for chunk in response.aiter_bytes():
+                    if first_byte is None and chunk:
+                        first_byte = time.perf_counter() - started
+                return response.status_code, first_byte
+        return run
+
+    async def session_url(client: httpx.AsyncClient, i: int) -> str:
+        # One session per worker slot, reused across turns like a real client
+        slot = i % 1024
+        if slot not in sessions:
+            response = await client.post("/sessions", json={"task_type": "conversation"})
+            response.raise_for_status()
+            sessions[slot] = response.json()["session_id"]
+        return f"/sessions/{sessions[slot]}/messages"
+
+    async def session_message(client: httpx.AsyncClient, i: int):
+        response = await client.post(await session_url(client, i), json={"content": question(i)})
+        return response.status_code, None
+
+    async def session_stream_url(client: httpx.AsyncClient, i: int) -> str:
+        return await session_url(client, i) + "/stream"
+
+    async def bot_query_stream_url(client, i):
+        return "/bot-query/stream"
+
+    async def enhanced_stream_url(client, i):
+        return "/enhanced-chat/stream"
+
+    async def get_session(client: httpx.AsyncClient, i: int):
+        url = await session_url(client, i)
+        response = await client.get(url.rsplit("/", 1)[0])
+        return response.status_code, None
+
+    async def delete_session(client: httpx.AsyncClient, i: int):
+        # Each request ends a fresh session, so the latency includes creating it
+        response = await client.post("/sessions", json={"task_type": "conversation"})
+        response.raise_for_status()
+        response = await client.delete(f"/sessions/{response.json()['session_id']}")
+        return response.status_code, None
+
+    def multipart(path: str) -> Scenario:
+        async def run(client: httpx.AsyncClient, i: int):
+            response = await client.post(path, files={"file": ("deck.png", image_bytes, "image/png")})
+            return response.status_code, None
+        return run
+
+    def upload(path: str, content: bytes, media_type: str) -> Scenario:
+        # Raw body: the path clients are steered to for large files
+        return simple("POST", path, lambda i: {"content": content, "headers": {"Content-Type": media_type}})
+
+    async def deck_design(client: httpx.AsyncClient, i: int):
+        response = await client.post("/deck-design-query", data={"query": question(i)})
+        return response.status_code, None
+
+    return {
+        "GET /": simple("GET", "/"),
+        "GET /health": simple("GET", "/health"),
+        "GET /ready": simple("GET", "/ready"),
+        "GET /metrics": simple("GET", "/metrics"),
+        "GET /ai-capabilities": simple("GET", "/ai-capabilities"),
+        "POST /bot-query": simple("POST", "/bot-query", lambda i: {"json": {"messages": chat_messages(i)}}),
+        "POST /bot-query/stream": streaming(bot_query_stream_url, lambda i: {"messages": chat_messages(i)}),
+        "POST /enhanced-chat": simple("POST", "/enhanced-chat", lambda i: {"json": {
+            "messages": chat_messages(i), "user_id": "load-test"}}),
+        "POST /enhanced-chat/stream": streaming(enhanced_stream_url, lambda i: {
+            "messages": chat_messages(i), "user_id": "load-test"}),
+        "POST /sessions": simple("POST", "/sessions", lambda i: {"json": {"task_type": "conversation"}}),
+        "GET /sessions/{id}": get_session,
+        "DELETE /sessions/{id}": delete_session,
+        "POST /sessions/{id}/messages": session_message,
+        "POST /sessions/{id}/messages/stream": streaming(session_stream_url, lambda i: {"content": question(i)}),
+        "POST /deck-design-query": deck_design,
+        "POST /search-knowledge": simple("POST", "/search-knowledge", lambda i: {"json": {"query": question(i)}}),
+        # Ingestion runs one at a time: above concurrency 1, overlapping requests answer 409 by design.
+        # Repeats skip the unchanged document through the checkpoint.
+        "POST /ingest-knowledge": simple("POST", "/ingest-knowledge", lambda i: {"json": {
+            "paths": [INGEST_DOCUMENT], "category": "load-test"}}),
+        "POST /analyze-image": simple("POST", "/analyze-image", lambda i: {"json": {
+            "imageBase64": image, "prompt": question(i)}}),
+        "POST /analyze-image/upload": simple("POST", "/analyze-image/upload", lambda i: {
+            "content": image_bytes, "headers": {"Content-Type": "image/png"}, "params": {"prompt": question(i)}}),
+        "POST /analyze-blueprint-enhanced": simple("POST", "/analyze-blueprint-enhanced", lambda i: {"json": {
+            "imageBase64": image}}),
+        "POST /analyze-blueprint-enhanced/upload": upload("/analyze-blueprint-enhanced/upload", image_bytes,
+                                                          "image/png"),
+        "POST /enhance-image": simple("POST", "/enhance-image", lambda i: {"json": {"imageBase64": image}}),
+        "POST /enhance-image/upload": upload("/enhance-image/upload", image_bytes, "image/png"),
+        "POST /difix-enhance": simple("POST", "/difix-enhance", lambda i: {"json": {"imageBase64": image}}),
+        "POST /difix-enhance/upload": upload("/difix-enhance/upload", image_bytes, "image/png"),
+        "POST /full-analyze": multipart("/full-analyze"),
+        "POST /full-analyze-debug": multipart("/full-analyze-debug"),
+        "POST /analyze-files": simple("POST", "/analyze-files", lambda i: {"json": [
+            {"filename": "deck.png", "type": "image/png"}]}),
+        "POST /generate-blueprint": simple("POST", "/generate-blueprint", lambda i: {"json": {"analysisData": {
+            "gross_living_area": 192.0, "net_square_footage": 180.0,
+            "linear_railing_footage": 44.0, "stair_cutouts": 1}}}),
+        "POST /transcribe-voice": simple("POST", "/transcribe-voice", lambda i: {"json": {"audioBase64": audio}}),
+        "POST /transcribe-voice/upload": upload("/transcribe-voice/upload", audio_bytes, "audio/wav"),
+    }
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of values (q in 0..100)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def _summary_ms(values: List[float]) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    return {
+        "p50": round(percentile(values, 50) * 1000, 2),
+        "p95": round(percentile(values, 95) * 1000, 2),
+        "p99": round(percentile(values, 99) * 1000, 2),
+        "mean": round(sum(values) / len(values) * 1000, 2),
+        "max": round(max(values) * 1000, 2),
+    }
+
+
+async def run_level(client: httpx.AsyncClient, scenario: Scenario, requests: int,
+                    concurrency: int) -> Dict[str, Any]:
+    """
+    Send requests with a fixed number of workers and summarize the results.
+
+    Args:
+        client (httpx.AsyncClient): Client bound to the service.
+        scenario (Scenario): The request to send.
+        requests (int): Total requests.
+        concurrency (int): Requests in flight at once.
+
+    Returns:
+        Dict[str, Any]: Throughput, latency and time-to-first-byte percentiles, status codes.
+    """
+    latencies: List[float] = []
+    first_bytes: List[float] = []
+    statuses: Dict[str, int] = {}
+    next_index = iter(range(requests))
+
+    async def worker():
+        for i in next_index:
+            started = time.perf_counter()
+            try:
+                status, first_byte = await scenario(client, i)
+            except httpx.HTTPError as e:
+                status, first_byte = type(e).__name__, None
+            latencies.append(time.perf_counter() - started)
+            if first_byte is not None:
+                first_bytes.append(first_byte)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    errors = sum(count for status, count in statuses.items() if not status.startswith("2"))
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "status_codes": statuses,
+        "throughput_rps": round(requests / elapsed, 2),
+        "latency_ms": _summary_ms(latencies),
+        "ttfb_ms": _summary_ms(first_bytes),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SERVICE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _wait_for(url: str, timeout: float, expect_ok: bool = True):
+    """Poll a URL until it answers (with 2xx when expect_ok) or the timeout passes."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            response = httpx.get(url, timeout=2.0)
+            if response.is_success or not expect_ok:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout:.0f}s")
+
+
+def start_servers(args: argparse.Namespace) -> Tuple[str, List[subprocess.Popen]]:
+    """
+    Start the stub and ai-service as subprocesses.
+
+    Returns:
+        Tuple[str, List[subprocess.Popen]]: The service base URL and the processes to stop.
+    """
+    stub_url = f"http://127.0.0.1:{args.stub_port}"
+    stub = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.stub_ollama", "--port", str(args.stub_port),
+        "--latency", str(args.latency), "--tokens-per-second", str(args.tokens_per_second),
+        "--reply-tokens", str(args.reply_tokens), "--error-rate", str(args.error_rate),
+        "--load-delay", str(args.load_delay), "--max-loaded-models", str(args.max_loaded_models), "--seed", "0",
+    ], cwd=SERVICE_DIR)
+    processes = [stub]
+    try:
+        _wait_for(f"{stub_url}/api/tags", 30)
+        ingest_dir = tempfile.mkdtemp(prefix="load_test_knowledge_")
+        with open(os.path.join(ingest_dir, INGEST_DOCUMENT), "w") as f:
+            f.write(INGEST_TEXT)
+        env = {
+            **os.environ,
+            "OLLAMA_BASE_URL": stub_url,
+            "OLLAMA_BASE_URLS": stub_url,
+            "DIFIX_API_URL": f"{stub_url}/models/nvidia/difix",
+            "DIFIX_SPACE_URL": f"{stub_url}/api/predict",
+            "HF_API_TOKEN": os.getenv("HF_API_TOKEN", "stub"),
+            "HUGGING_FACE_API_KEY": os.getenv("HUGGING_FACE_API_KEY", "stub"),
+            "KNOWLEDGE_INGEST_DIR": ingest_dir,
+        }
+        service = subprocess.Popen([
+            sys.executable, "-m", "uvicorn", "ai_service.main:app", "--port", str(args.service_port),
+            "--log-level", "warning", "--no-access-log",
+        ], cwd=SERVICE_DIR, env=env)
+        processes.append(service)
+        service_url = f"http://127.0.0.1:{args.service_port}"
+        _wait_for(f"{service_url}/health", 120)
+        _wait_for(f"{service_url}/ready", 120)
+    except Exception:
+        stop_servers(processes)
+        raise
+    return service_url, processes
+
+
+def stop_servers(processes: List[subprocess.Popen]):
+    for process in reversed(processes):
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def run_load_test(service_url: str, scenarios: Dict[str, Scenario], levels: List[int], requests: int,
+                        warmup: int) -> List[Dict[str, Any]]:
+    """Run every scenario at every concurrency level and return one result row per pair."""
+    limits = httpx.Limits(max_connections=max(levels) * 2, max_keepalive_connections=max(levels) * 2)
+    rows = []
+    async with httpx.AsyncClient(base_url=service_url, timeout=300.0, limits=limits) as client:
+        for name, scenario in scenarios.items():
+            if warmup:
+                await run_level(client, scenario, warmup, 1)
+            for concurrency in levels:
+                result = await run_level(client, scenario, requests, concurrency)
+                rows.append({"endpoint": name, **result})
+                latency = result["latency_ms"] or {}
+                print(f"{name:40s} c={concurrency:<4d} {result['throughput_rps']:>9.1f} req/s  "
+                      f"p50={latency.get('p50')}ms p99={latency.get('p99')}ms errors={result['errors']}",
+                      file=sys.stderr)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=100, help="Requests per endpoint and concurrency level")
+    parser.add_argument("--warmup", type=int, default=3, help="Unmeasured requests per endpoint")
+    parser.add_argument("--endpoints", nargs="*", default=None,
+                        help="Only run endpoints whose name contains one of these substrings")
+    parser.add_argument("--repeat-prompts", action="store_true", help="Reuse one prompt so caches can hit")
+    parser.add_argument("--output", default=None, help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--service-url", default=None, help="Drive a running service instead of starting one")
+    parser.add_argument("--service-port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--stub-port", type=int, default=STUB_PORT)
+    parser.add_argument("--latency", type=float, default=0.0, help="Stub seconds before the first chunk")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Stub token rate (0: unpaced)")
+    parser.add_argument("--reply-tokens", type=int, default=0, help="Stub words per reply")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Stub fraction of HTTP 500s")
+    parser.add_argument("--load-delay", type=float, default=0.0, help="Stub seconds to load a model")
+    parser.add_argument("--max-loaded-models", type=int, default=0, help="Stub resident models (0: all)")
+    args = parser.parse_args()
+
+    scenarios = build_scenarios(args.repeat_prompts)
+    if args.endpoints:
+        scenarios = {name: scenario for name, scenario in scenarios.items()
+                     if any(pattern in name for pattern in args.endpoints)}
+
+    processes: List[subprocess.Popen] = []
+    service_url = args.service_url
+    if service_url is None:
+        service_url, processes = start_servers(args)
+    try:
+        rows = asyncio.run(run_load_test(service_url, scenarios, args.concurrency, args.requests, args.warmup))
+    finally:
+        stop_servers(processes)
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "backend": "stub" if processes else service_url,
+        "config": {
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "repeat_prompts": args.repeat_prompts,
+            "stub": None if not processes else {
+                "latency": args.latency,
+                "tokens_per_second": args.tokens_per_second,
+                "reply_tokens": args.reply_tokens,
+                "error_rate": args.error_rate,
+                "load_delay": args.load_delay,
+                "max_loaded_models": args.max_loaded_models,
+            },
+        },
+        "results": rows,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Micro-benchmark runner.
+
+A small pytest-benchmark style harness for in-process benchmarks of CPU-bound
+functions. Benchmarks are registered with ``@benchmark``; the decorated
+function does the setup (building fixtures) and returns the zero-argument
+callable to time. Each benchmark is calibrated so one round takes at least
+``min_time``, then timed for several rounds; per-call statistics are reported.
+
+Results can be saved as a baseline JSON file and later compared against it.
+A benchmark whose chosen statistic got slower by more than the threshold is
+flagged as a regression and the run exits non-zero.
+
+Cases live in benchmark modules such as ``benchmarks.bench_hot_paths``, which
+call ``main()`` from their ``__main__`` block.
+"""
+
+import argparse
+import asyncio
+import fnmatch
+import inspect
+import json
+import platform
+import statistics
+import subprocess
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+MIN_TIME = 0.05  # Seconds per timed round
+ROUNDS = 7
+THRESHOLD = 0.10  # Relative slowdown reported as a regression
+STATS = ("min", "median", "mean")
+
+
+class SkipBenchmark(Exception):
+    """Raised by a benchmark's setup when it cannot run here (missing dependency, binary...)."""
+
+
+class _Benchmark:
+    def __init__(self, name: str, group: str, setup: Callable[[], Any]):
+        self.name = name
+        self.group = group
+        self.setup = setup
+
+
+_REGISTRY: Dict[str, _Benchmark] = {}
+
+
+def benchmark(name: str, group: str = "default"):
+    """
+    Register a benchmark.
+
+    The decorated function runs once, untimed, and returns the callable to time.
+    A coroutine function returned instead is run to completion on an event loop
+    for each call.
+
+    Args:
+        name (str): Unique benchmark name, e.g. "parse_dimensions[long_ocr]".
+        group (str): Group shown in the report.
+    """
+    def register(setup: Callable[[], Any]):
+        if name in _REGISTRY:
+            raise ValueError(f"Duplicate benchmark name: {name}")
+        _REGISTRY[name] = _Benchmark(name, group, setup)
+        return setup
+    return register
+
+
+def _as_sync(target: Callable[[], Any], loop: asyncio.AbstractEventLoop) -> Callable[[], Any]:
+    if inspect.iscoroutinefunction(target):
+        return lambda: loop.run_until_complete(target())
+    return target
+
+
+def measure(target: Callable[[], Any], min_time: float = MIN_TIME, rounds: int = ROUNDS) -> Dict[str, float]:
+    """
+    Time a callable.
+
+    Args:
+        target (Callable[[], Any]): The code under test.
+        min_time (float): Minimum duration of one round; the loop count is calibrated to reach it.
+        rounds (int): Number of timed rounds.
+
+    Returns:
+        Dict[str, float]: Per-call min/median/mean/stddev in seconds, ops per second,
+        and the loops per round and rounds used.
+    """
+    timer = time.perf_counter
+    target()  # Warm up caches, lazy imports and compiled regexes
+    loops = 1
+    while True:
+        started = timer()
+        for _ in range(loops):
+            target()
+        elapsed = timer() - started
+        if elapsed >= min_time or loops >= 1 << 24:
+            break
+        # Aim a little past min_time so the next attempt usually succeeds
+        loops = max(loops * 2, int(loops * min_time * 1.2 / max(elapsed, 1e-9)))
+
+    samples = []
+    for _ in range(rounds):
+        started = timer()
+        for _ in range(loops):
+            target()
+        samples.append((timer() - started) / loops)
+
+    mean = statistics.fmean(samples)
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": mean,
+        "stddev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "ops": 1 / mean if mean else float("inf"),
+        "loops": loops,
+        "rounds": rounds,
+    }
+
+
+def run(patterns: Optional[List[str]] = None, min_time: float = MIN_TIME,
+        rounds: int = ROUNDS) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, str]]:
+    """
+    Run the registered benchmarks.
+
+    Args:
+        patterns (Optional[List[str]]): Substrings or glob patterns; only matching names run.
+        min_time (float): Minimum duration of one round.
+        rounds (int): Number of timed rounds.
+
+    Returns:
+        Tuple[Dict[str, Dict[str, Any]], Dict[str, str]]: Stats per benchmark name,
+        and the reason per skipped benchmark.
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    skipped: Dict[str, str] = {}
+    loop = asyncio.new_event_loop()
+    try:
+        for name, bench in _REGISTRY.items():
+            if patterns and not any(pattern in name or fnmatch.fnmatch(name, pattern) for pattern in patterns):
+                continue
+            try:
+                target = bench.setup()
+            except SkipBenchmark as e:
+                skipped[name] = str(e)
+                continue
+            results[name] = {"group": bench.group, **measure(_as_sync(target, loop), min_time, rounds)}
+    finally:
+        loop.close()
+    return results, skipped
+
+
+def compare(current: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            threshold: float = THRESHOLD, stat: str = "median") -> List[Dict[str, Any]]:
+    """
+    Compare results against a baseline.
+
+    Args:
+        current (Dict[str, Dict[str, Any]]): Stats from run().
+        baseline (Dict[str, Dict[str, Any]]): The ``benchmarks`` of a saved baseline.
+        threshold (float): Relative slowdown (0.10 = 10%) flagged as a regression.
+        stat (str): Statistic to compare: "min", "median" or "mean".
+
+    Returns:
+        List[Dict[str, Any]]: One row per benchmark present in both, with the relative
+        ``change`` (positive is slower) and a ``status`` of "regression", "improvement" or "ok".
+    """
+    rows = []
+    for name, stats in current.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name][stat], stats[stat]
+        change = after / before - 1 if before else 0.0
+        status = "ok"
+        if change > threshold:
+            status = "regression"
+        elif change < -threshold:
+            status = "improvement"
+        rows.append({"name": name, "baseline": before, "current": after, "change": change, "status": status})
+    return rows
+
+
+def _format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1.0), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f}{unit}"
+    return f"{seconds / 1e-9:.0f}ns"
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv: Optional[List[str]] = None, description: Optional[str] = None) -> int:
+    """
+    Command-line entry point for benchmark modules.
+
+    Returns:
+        int: Process exit code; 1 when a comparison found regressions.
+    """
+    parser = argparse.ArgumentParser(description=description or __doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="patterns", nargs="*", default=None,
+                        help="Only run benchmarks whose name contains (or globs) one of these")
+    parser.add_argument("--min-time", type=float, default=MIN_TIME, help="Minimum seconds per round")
+    parser.add_argument("--rounds", type=int, default=ROUNDS)
+    parser.add_argument("--save", default=None, help="Write the results as a baseline JSON file")
+    parser.add_argument("--compare", default=None, help="Baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="Relative slowdown flagged as a regression (default: 0.10)")
+    parser.add_argument("--stat", choices=STATS, default="median", help="Statistic to compare")
+    parser.add_argument("--list", action="store_true", help="List the benchmarks and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, bench in _REGISTRY.items():
+            print(f"{bench.group:16s} {name}")
+        return 0
+
+    results, skipped = run(args.patterns, args.min_time, args.rounds)
+    for name, stats in results.items():
+        print(f"{stats['group']:16s} {name:48s} median {_format_time(stats['median']):>10s}  "
+              f"min {_format_time(stats['min']):>10s}  stddev {_format_time(stats['stddev']):>10s}  "
+              f"{stats['ops']:>12.1f} ops/s")
+    for name, reason in skipped.items():
+        print(f"{'skipped':16s} {name:48s} {reason}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "commit": _git_commit(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                            "processor": platform.processor()},
+                "benchmarks": results,
+                "skipped": skipped,
+            }, f, indent=2)
+            f.write("\n")
+        print(f"Saved baseline to {args.save}")
+
+    if not args.compare:
+        return 0
+    with open(args.compare) as f:
+        baseline = json.load(f)
+    rows = compare(results, baseline["benchmarks"], args.threshold, args.stat)
+    print(f"\nCompared with {args.compare} (commit {baseline.get('commit')}, {args.stat}, "
+          f"threshold {args.threshold:.0%}):")
+    for row in rows:
+        print(f"{row['status']:12s} {row['name']:48s} {_format_time(row['baseline']):>10s} -> "
+              f"{_format_time(row['current']):>10s}  {row['change']:+.1%}")
+    regressions = [row for row in rows if row["status"] == "regression"]
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+        return 1
+    return 0
@@ -0,0 +1,344 @@
+"""
+Stub Ollama Server
+
+A minimal stand-in for the Ollama and Hugging Face HTTP APIs used to benchmark
+ai-service without a GPU box or network access. It implements Ollama's
+/api/chat and /api/generate (streaming and non-streaming) and /api/tags, plus
+the Difix Inference API (/models/...) and Space (/api/predict) endpoints, which
+echo the uploaded image back.
+
+Like Ollama, it keeps the last prompt per model and only "evaluates" the part
+that does not share a prefix with it, which shows up in prompt_eval_count and
+prompt_eval_duration. /api/generate returns a ``context`` that encodes the
+exchange and accepts it back to continue the conversation.
+
+Latency before the first chunk, token rate, reply length, injected errors and
+model-load delay are configurable through create_app, the STUB_* environment
+variables or the command line.
+
+Run standalone:
+    python -m benchmarks.stub_ollama --port 11435 --latency 0.2 --tokens-per-second 40
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+STUB_MODELS = ["neural-chat", "llama3.1:8b", "qwen2.5-vl", "llava-deckbot", "phi3:mini"]
+STUB_REPLY = "Standard deck joist spacing is 16 inches on center."
+# Simulated prefill cost per uncached prompt token (about 4,000 tokens/s)
+STUB_PREFILL_NS_PER_TOKEN = 250_000
+# Seconds before the first chunk (headers included), like prefill on a real server
+STUB_LATENCY = float(os.getenv("STUB_LATENCY", "0.0"))
+# Generated tokens per second; 0 sends the reply as fast as possible
+STUB_TOKENS_PER_SECOND = float(os.getenv("STUB_TOKENS_PER_SECOND", "0.0"))
+# Words per reply; 0 sends STUB_REPLY once
+STUB_REPLY_TOKENS = int(os.getenv("STUB_REPLY_TOKENS", "0"))
+# Fraction of inference requests answered with HTTP 500
+STUB_ERROR_RATE = float(os.getenv("STUB_ERROR_RATE", "0.0"))
+# Seconds to "load" a model that is not resident
+STUB_LOAD_DELAY = float(os.getenv("STUB_LOAD_DELAY", "0.0"))
+# Models resident at once; loading another unloads the least recently used (0: unlimited)
+STUB_MAX_LOADED_MODELS = int(os.getenv("STUB_MAX_LOADED_MODELS", "0"))
+
+
+def _chunks(text: str) -> List[str]:
+    """Split the canned reply into word-sized deltas."""
+    words = text.split(" ")
+    return [word + (" " if i < len(words) - 1 else "") for i, word in enumerate(words)]
+
+
+def _reply_text(tokens: int) -> str:
+    """STUB_REPLY repeated or cut to the given number of words."""
+    if tokens <= 0:
+        return STUB_REPLY
+    words = STUB_REPLY.split(" ")
+    return " ".join(words[i % len(words)] for i in range(tokens))
+
+
+def _done_stats(prompt_tokens: int, eval_tokens: int, prompt_eval_duration: int = 0,
+                load_duration: int = 0, eval_duration: int = 0) -> dict:
+    """Final-chunk statistics in Ollama's format (durations in nanoseconds)."""
+    return {
+        "total_duration": load_duration + prompt_eval_duration + eval_duration,
+        "load_duration": load_duration,
+        "prompt_eval_count": prompt_tokens,
+        "prompt_eval_duration": prompt_eval_duration,
+        "eval_count": eval_tokens,
+        "eval_duration": eval_duration,
+    }
+
+
+def _render_chat(messages: List[dict]) -> str:
+    """Flatten chat messages the way a chat template would."""
+    return "".join(f"<|{message.get('role', '')}|>\n{message.get('content', '')}\n" for message in messages)
+
+
+def _encode_context(text: str) -> List[int]:
+    """Pack text into int32 "token ids", four UTF-8 bytes each."""
+    data = text.encode("utf-8")
+    data += b"\0" * (-len(data) % 4)
+    return [int.from_bytes(data[i:i + 4], "big", signed=True) for i in range(0, len(data), 4)]
+
+
+def _decode_context(context: List[int]) -> str:
+    """Inverse of _encode_context."""
+    data = b"".join(int(token).to_bytes(4, "big", signed=True) for token in context)
+    return data.rstrip(b"\0").decode("utf-8", errors="ignore")
+
+
+class _PrefixCache:
+    """Per-model last prompt, standing in for Ollama's KV cache slot."""
+
+    def __init__(self, ns_per_token: int):
+        self.ns_per_token = ns_per_token
+        self.last_prompt = {}
+
+    def evaluate(self, model: str, prompt: str):
+        """Return (tokens evaluated, prompt_eval_duration) for a prompt, then cache it."""
+        cached_chars = len(os.path.commonprefix([self.last_prompt.get(model, ""), prompt]))
+        self.last_prompt[model] = prompt
+        # Roughly four characters per token, as with real tokenizers on English text
+        evaluated = max(1, (len(prompt) - cached_chars) // 4)
+        return evaluated, evaluated * self.ns_per_token
+
+
+class _ModelSlots:
+    """Resident models; loading one takes load_delay and may unload the least recently used."""
+
+    def __init__(self, load_delay: float, max_loaded: int):
+        self.load_delay = load_delay
+        self.max_loaded = max_loaded
+        self.loaded: "OrderedDict[str, None]" = OrderedDict()
+        self.loads = 0
+        self._lock = asyncio.Lock()
+
+    async def ensure_loaded(self, model: str) -> int:
+        """Load the model if needed; return the load_duration in nanoseconds."""
+        if model in self.loaded:
+            self.loaded.move_to_end(model)
+            return 0
+        # Like Ollama, one model loads at a time and concurrent requests share the load
+        async with self._lock:
+            if model in self.loaded:
+                self.loaded.move_to_end(model)
+                return 0
+            await asyncio.sleep(self.load_delay)
+            self.loaded[model] = None
+            self.loads += 1
+            while self.max_loaded and len(self.loaded) > self.max_loaded:
+                self.loaded.popitem(last=False)
+        return int(self.load_delay * 1e9)
+
+
+def _ndjson(objects, tokens_per_second: float = 0.0) -> StreamingResponse:
+    async def body():
+        for i, obj in enumerate(objects):
+            if tokens_per_second and i:
+                await asyncio.sleep(1 / tokens_per_second)
+            yield json.dumps(obj) + "\n"
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
+def create_app(models: Optional[List[str]] = None,
+               prefill_ns_per_token: int = STUB_PREFILL_NS_PER_TOKEN,
+               latency: float = STUB_LATENCY,
+               tokens_per_second: float = STUB_TOKENS_PER_SECOND,
+               reply_tokens: int = STUB_REPLY_TOKENS,
+               error_rate: float = STUB_ERROR_RATE,
+               load_delay: float = STUB_LOAD_DELAY,
+               max_loaded_models: int = STUB_MAX_LOADED_MODELS,
+               seed: Optional[int] = None) -> FastAPI:
+    """
+    Build a stub Ollama app.
+
+    Args:
+        models (Optional[List[str]]): Models reported by /api/tags. Requests for any other
+            model get Ollama's 404 "model not found" error. Defaults to STUB_MODELS.
+        prefill_ns_per_token (int): Reported prefill cost per uncached prompt token.
+        latency (float): Seconds before the first chunk of every inference or Difix response.
+        tokens_per_second (float): Pace of streamed chunks; 0 sends them at once.
+        reply_tokens (int): Words per reply; 0 sends STUB_REPLY once.
+        error_rate (float): Fraction of inference and Difix requests answered with HTTP 500.
+        load_delay (float): Seconds to load a model that is not resident.
+        max_loaded_models (int): Models resident at once; 0 keeps every model loaded.
+        seed (Optional[int]): Seed for error injection, for reproducible runs.
+    """
+    installed = list(STUB_MODELS if models is None else models)
+    prefix_cache = _PrefixCache(prefill_ns_per_token)
+    slots = _ModelSlots(load_delay, max_loaded_models)
+    rng = random.Random(seed)
+    reply = _reply_text(reply_tokens)
+    stub = FastAPI(title="Stub Ollama")
+
+    def _missing(model: str) -> Optional[JSONResponse]:
+        if model in installed:
+            return None
+        return JSONResponse(status_code=404, content={"error": f"model '{model}' not found, try pulling it first"})
+
+    def _injected_error() -> Optional[JSONResponse]:
+        if error_rate and rng.random() < error_rate:
+            return JSONResponse(status_code=500, content={"error": "stub: injected failure"})
+        return None
+
+    def _eval_duration(tokens: int) -> int:
+        return int(tokens / tokens_per_second * 1e9) if tokens_per_second else 0
+
+    async def _respond(payload: dict, chunks: List[dict], final: dict, text_field: Optional[str]):
+        """Stream the chunks as NDJSON, or fold them into one object when stream is false."""
+        if payload.get("stream", True):
+            return _ndjson(chunks + [final], tokens_per_second)
+        await asyncio.sleep(len(chunks) / tokens_per_second if tokens_per_second else 0)
+        if text_field == "message":
+            text = "".join(chunk["message"]["content"] for chunk in chunks)
+            return {**final, "message": {"role": "assistant", "content": text}}
+        return {**final, "response": "".join(chunk["response"] for chunk in chunks)}
+
+    @stub.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": name} for name in installed]}
+
+    @stub.post("/api/chat")
+    async def chat(request: Request):
+        payload = await request.json()
+        model = payload.get("model", "")
+        failure = _missing(model) or _injected_error()
+        if failure:
+            return failure
+        load_duration = await slots.ensure_loaded(model)
+        await asyncio.sleep(latency)
+        deltas = _chunks(reply)
+        chunks = [
+            {"model": model, "message": {"role": "assistant", "content": delta}, "done": False}
+            for delta in deltas
+        ]
+        prompt_tokens, prefill = prefix_cache.evaluate(model, _render_chat(payload.get("messages", [])))
+        final = {"model": model, "message": {"role": "assistant", "content": ""}, "done": True,
+                 **_done_stats(prompt_tokens, len(deltas), prefill, load_duration, _eval_duration(len(deltas)))}
+        return await _respond(payload, chunks, final, "message")
+
+    @stub.post("/api/generate")
+    async def generate(request: Request):
+        payload = await request.json()
+        model = payload.get("model", "")
+        missing = _missing(model)
+        if missing:
+            return missing
+        if not payload.get("prompt"):
+            # Ollama just loads the model when the prompt is empty
+            load_duration = await slots.ensure_loaded(model)
+            return {"model": model, "response": "", "done": True, "done_reason": "load",
+                    "load_duration": load_duration}
+        failure = _injected_error()
+        if failure:
+            return failure
+        load_duration = await slots.ensure_loaded(model)
+        await asyncio.sleep(latency)
+        deltas = _chunks(reply)
+        chunks = [{"model": model, "response": delta, "done": False} for delta in deltas]
+        turn = [{"role": "user", "content": payload["prompt"]}]
+        if payload.get("system"):
+            turn.insert(0, {"role": "system", "content": payload["system"]})
+        prompt = _decode_context(payload.get("context") or []) + _render_chat(turn)
+        prompt_tokens, prefill = prefix_cache.evaluate(model, prompt)
+        context = _encode_context(prompt + _render_chat([{"role": "assistant", "content": reply}]))
+        final = {"model": model, "response": "", "done": True, "context": context,
+                 **_done_stats(prompt_tokens, len(deltas), prefill, load_duration, _eval_duration(len(deltas)))}
+        return await _respond(payload, chunks, final, "response")
+
+    @stub.post("/models/{model_id:path}")
+    async def difix_inference(model_id: str, request: Request):
+        """Hugging Face Inference API: raw image or {"inputs": base64} in, image bytes out."""
+        failure = _injected_error()
+        if failure:
+            return failure
+        await asyncio.sleep(latency)
+        if request.headers.get("content-type", "").startswith("application/json"):
+            image = base64.b64decode((await request.json()).get("inputs", ""))
+        else:
+            image = await request.body()
+        return Response(content=image, media_type="image/png")
+
+    @stub.post("/api/predict")
+    async def difix_space(request: Request):
+        """Gradio Space: multipart image in, data-URL image out."""
+        failure = _injected_error()
+        if failure:
+            return failure
+        await asyncio.sleep(latency)
+        form = await request.form()
+        upload = form.get("data")
+        image = await upload.read() if upload is not None and hasattr(upload, "read") else b""
+        return {"data": ["data:image/png;base64," + base64.b64encode(image).decode()]}
+
+    @stub.get("/stub/stats")
+    async def stats():
+        return {"model_loads": slots.loads, "loaded_models": list(slots.loaded)}
+
+    return stub
+
+
+app = create_app()
+
+
+def run_in_thread(port: int, host: str = "127.0.0.1", stub_app: Optional[FastAPI] = None) -> uvicorn.Server:
+    """
+    Start a stub server in a daemon thread and wait until it accepts requests.
+
+    Args:
+        port (int): Port to listen on.
+        host (str): Interface to bind.
+        stub_app (Optional[FastAPI]): App from create_app. Defaults to the module-level app.
+
+    Returns:
+        uvicorn.Server: The running server; set ``should_exit = True`` to stop it.
+    """
+    config = uvicorn.Config(stub_app or app, host=host, port=port, log_level="warning", access_log=False)
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.time() + 10
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError(f"Stub Ollama failed to start on port {port}")
+        time.sleep(0.05)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a stub Ollama server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=STUB_LATENCY, help="Seconds before the first chunk")
+    parser.add_argument("--tokens-per-second", type=float, default=STUB_TOKENS_PER_SECOND)
+    parser.add_argument("--reply-tokens", type=int, default=STUB_REPLY_TOKENS)
+    parser.add_argument("--error-rate", type=float, default=STUB_ERROR_RATE)
+    parser.add_argument("--load-delay", type=float, default=STUB_LOAD_DELAY)
+    parser.add_argument("--max-loaded-models", type=int, default=STUB_MAX_LOADED_MODELS)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    stub_app = create_app(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        reply_tokens=args.reply_tokens,
+        error_rate=args.error_rate,
+        load_delay=args.load_delay,
+        max_loaded_models=args.max_loaded_models,
+        seed=args.seed,
+    )
+    uvicorn.run(stub_app, host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Tests for per-model admission control in front of Ollama.
+"""
+
+import asyncio
+
+import pytest
+
+from ai_service.admission import ModelAdmissionController, OllamaOverloadedError
+
+
+def test_limits_in_flight_per_model():
+    controller = ModelAdmissionController(max_in_flight=2, max_queue_depth=10, queue_timeout=5, model_limits={})
+    peak = {"value": 0, "current": 0}
+
+    async def call():
+        async with controller.slot("neural-chat"):
+            peak["current"] += 1
+            peak["value"] = max(peak["value"], peak["current"])
+            await asyncio.sleep(0.01)
+            peak["current"] -= 1
+
+    async def run():
+        await asyncio.gather(*(call() for _ in range(8)))
+
+    asyncio.run(run())
+    assert peak["value"] == 2
+    stats = controller.get_stats()["neural-chat"]
+    assert stats["admitted"] == 8
+    assert stats["in_flight"] == 0
+    assert stats["queue_depth"] == 0
+
+
+def test_models_are_limited_independently():
+    controller = ModelAdmissionController(max_in_flight=1, max_queue_depth=0, queue_timeout=5, model_limits={})
+
+    async def run():
+        await controller.acquire("neural-chat")
+        await controller.acquire("phi3:mini")  # Different model, separate slot
+
+    asyncio.run(run())
+
+
+def test_full_queue_is_rejected_with_429():
+    controller = ModelAdmissionController(max_in_flight=1, max_queue_depth=1, queue_timeout=5, model_limits={})
+
+    async def run():
+        await controller.acquire("neural-chat")
+        waiting = asyncio.ensure_future(controller.acquire("neural-chat"))
+        await asyncio.sleep(0)
+        with pytest.raises(OllamaOverloadedError) as error:
+            await controller.acquire("neural-chat")
+        waiting.cancel()
+        return error.value
+
+    error = asyncio.run(run())
+    assert error.status_code == 429
+    assert error.retry_after >= 1
+
+
+def test_queue_deadline_is_rejected_with_503():
+    controller = ModelAdmissionController(max_in_flight=1, max_queue_depth=5, queue_timeout=0.02, model_limits={})
+
+    async def run():
+        await controller.acquire("neural-chat")
+        with pytest.raises(OllamaOverloadedError) as error:
+            await controller.acquire("neural-chat")
+        return error.value
+
+    error = asyncio.run(run())
+    assert error.status_code == 503
+    stats = controller.get_stats()["neural-chat"]
+    assert stats["rejected_timeout"] == 1
+    assert stats["queue_depth"] == 0
+
+
+def test_per_model_overrides():
+    controller = ModelAdmissionController(
+        max_in_flight=4, max_queue_depth=0, queue_timeout=5,
+        model_limits={"qwen2.5-vl": {"max_in_flight": 1}}
+    )
+
+    async def run():
+        await controller.acquire("qwen2.5-vl")
+        with pytest.raises(OllamaOverloadedError):
+            await controller.acquire("qwen2.5-vl")
+
+    asyncio.run(run())
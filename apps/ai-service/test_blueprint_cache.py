@@ -0,0 +1,94 @@
+"""
+Tests for the blueprint analysis cache behind /analyze-blueprint-enhanced.
+"""
+
+import asyncio
+import base64
+import threading
+
+import httpx
+
+from ai_service import main
+from ai_service.blueprint_cache import blueprint_cache_key
+from ai_service.response_cache import ResponseCache
+
+BLUEPRINT = b"\x89PNG\r\n\x1a\n deck blueprint"
+
+
+def _post(path, **kwargs):
+    async def post():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+            return await client.post(path, **kwargs)
+    return asyncio.run(post())
+
+
+def _setup(monkeypatch, cache):
+    calls = []
+
+    async def analyze(prompt, image, analysis_type, model_name=None):
+        calls.append((image, analysis_type, model_name))
+        return "A 12 feet by 16 feet composite deck on 2x8 joists"
+
+    async def best_model(task_type):
+        return "qwen2.5-vl"
+
+    async def similar(description, n_results=3):
+        return [{"description": "a similar deck"}]
+
+    monkeypatch.setattr(main, "blueprint_cache", cache)
+    monkeypatch.setattr(main, "analyze_image_with_enhanced_multimodal", analyze)
+    monkeypatch.setattr(main, "get_best_model_for_task", best_model)
+    monkeypatch.setattr(main.get_vector_db_service(), "search_similar_blueprints", similar)
+    return calls
+
+
+def test_reuploaded_blueprint_is_served_from_cache(monkeypatch):
+    calls = _setup(monkeypatch, ResponseCache(db_path=None, enabled=True, name="blueprint_analyses"))
+    body = {"imageBase64": base64.b64encode(BLUEPRINT).decode()}
+
+    first = _post("/analyze-blueprint-enhanced", json=body).json()
+    # The binary upload of the same image shares the entry
+    second = _post("/analyze-blueprint-enhanced/upload", content=BLUEPRINT).json()
+    technical = _post("/analyze-blueprint-enhanced", json={**body, "analysis_type": "technical"}).json()
+
+    assert (first["cache_hit"], second["cache_hit"], technical["cache_hit"]) == (False, True, False)
+    assert second["analysis_result"] == first["analysis_result"]
+    assert second["extracted_data"] == first["extracted_data"] == {
+        "analysis_type": "blueprint", "has_dimensions": True, "has_materials": True, "complexity": "low",
+    }
+    assert second["similar_blueprints"] == [{"description": "a similar deck"}]
+    assert calls == [(BLUEPRINT, "blueprint", "qwen2.5-vl"), (BLUEPRINT, "technical", "qwen2.5-vl")]
+
+
+def test_cached_analyses_survive_restarts(monkeypatch, tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    calls = _setup(monkeypatch, ResponseCache(db_path=db_path, enabled=True, name="blueprint_analyses"))
+    sqlite_threads = []
+    for name in ("_read_disk", "_write_disk"):
+        method = getattr(ResponseCache, name)
+        monkeypatch.setattr(ResponseCache, name, lambda *args, method=method: sqlite_threads.append(
+            threading.current_thread()) or method(*args))
+    _post("/analyze-blueprint-enhanced/upload", content=BLUEPRINT)
+
+    monkeypatch.setattr(main, "blueprint_cache", ResponseCache(db_path=db_path, enabled=True,
+                                                               name="blueprint_analyses"))
+    response = _post("/analyze-blueprint-enhanced/upload", content=BLUEPRINT).json()
+
+    assert response["cache_hit"] is True
+    assert len(calls) == 1
+    # Lookup and store of the first upload, then the lookup after the restart, all off the event loop
+    assert len(sqlite_threads) == 3
+    assert threading.main_thread() not in sqlite_threads
+
+
+def test_cache_key_covers_content_type_prompt_and_model():
+    key = blueprint_cache_key(BLUEPRINT, "blueprint", "prompt", "llava")
+
+    assert key == blueprint_cache_key(bytes(BLUEPRINT), "blueprint", "prompt", "llava")
+    assert len({
+        key,
+        blueprint_cache_key(BLUEPRINT + b"!", "blueprint", "prompt", "llava"),
+        blueprint_cache_key(BLUEPRINT, "technical", "prompt", "llava"),
+        blueprint_cache_key(BLUEPRINT, "blueprint", "other prompt", "llava"),
+        blueprint_cache_key(BLUEPRINT, "blueprint", "prompt", "qwen2.5-vl"),
+    }) == 5
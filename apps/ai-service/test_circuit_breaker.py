@@ -0,0 +1,209 @@
+"""
+Tests for per-model circuit breakers and hedged fallback.
+"""
+
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from ai_service import core
+from ai_service.circuit_breaker import CircuitOpenError, ModelCircuitBreakers
+from ai_service.model_scheduler import ModelAffinityScheduler
+
+
+def _breakers(**kwargs):
+    settings = dict(enabled=True, window=10, min_calls=4, failure_rate=0.5, slow_call_seconds=60, open_seconds=0.05)
+    settings.update(kwargs)
+    return ModelCircuitBreakers(**settings)
+
+
+async def _call(breakers, model, error=None, latency=0.0):
+    async with breakers.call(model) as timer:
+        timer.start()
+        timer.first_token = timer.started + latency
+        if error is not None:
+            raise error
+
+
+async def _fail(breakers, model, times):
+    for _ in range(times):
+        with pytest.raises(httpx.ConnectError):
+            await _call(breakers, model, httpx.ConnectError("refused"))
+
+
+def test_opens_after_failure_rate_and_rejects_fast():
+    breakers = _breakers()
+
+    async def run():
+        await _call(breakers, "neural-chat")
+        await _fail(breakers, "neural-chat", 3)
+        assert not breakers.is_available("neural-chat")
+        with pytest.raises(CircuitOpenError) as rejected:
+            await _call(breakers, "neural-chat")
+        return rejected.value
+
+    rejected = asyncio.run(run())
+    assert rejected.status_code == 503
+    stats = breakers.get_stats()["models"]["neural-chat"]
+    assert stats["state"] == "open"
+    assert stats["rejected"] == 1
+    assert breakers.is_available("phi3:mini")
+
+
+def test_half_open_probe_closes_or_reopens():
+    breakers = _breakers()
+
+    async def run():
+        await _fail(breakers, "neural-chat", 4)
+        await asyncio.sleep(0.06)
+        assert breakers.is_available("neural-chat")
+
+        # Failed probe reopens the circuit
+        await _fail(breakers, "neural-chat", 1)
+        assert breakers.get_stats()["models"]["neural-chat"]["state"] == "open"
+
+        await asyncio.sleep(0.06)
+        await _call(breakers, "neural-chat")
+        assert breakers.get_stats()["models"]["neural-chat"]["state"] == "closed"
+
+    asyncio.run(run())
+
+
+def test_only_one_probe_while_half_open():
+    breakers = _breakers()
+
+    async def run():
+        await _fail(breakers, "neural-chat", 4)
+        await asyncio.sleep(0.06)
+        async with breakers.call("neural-chat"):
+            assert not breakers.is_available("neural-chat")
+            with pytest.raises(CircuitOpenError):
+                await _call(breakers, "neural-chat")
+
+    asyncio.run(run())
+
+
+def test_slow_first_tokens_count_as_failures_and_client_errors_do_not():
+    breakers = _breakers(slow_call_seconds=1.0)
+    not_found = httpx.HTTPStatusError(
+        "404", request=httpx.Request("POST", "http://ollama"), response=httpx.Response(404)
+    )
+
+    async def run():
+        for _ in range(4):
+            with pytest.raises(httpx.HTTPStatusError):
+                await _call(breakers, "qwen2.5-vl", not_found)
+        assert breakers.get_stats()["models"]["qwen2.5-vl"]["calls"] == 0
+
+        for _ in range(4):
+            await _call(breakers, "qwen2.5-vl", latency=2.0)
+
+    asyncio.run(run())
+    stats = breakers.get_stats()["models"]["qwen2.5-vl"]
+    assert stats["slow_calls"] == 4
+    assert stats["state"] == "open"
+
+
+def test_hedge_delay_tracks_p95_first_token_latency():
+    breakers = _breakers()
+
+    async def run():
+        for i in range(40):
+            await _call(breakers, "neural-chat", latency=2.0 if i < 38 else 9.0)
+
+    asyncio.run(run())
+    assert breakers.hedge_delay("neural-chat") == 9.0
+    assert breakers.hedge_delay("phi3:mini") == core.circuit_breakers.hedge_delay("phi3:mini")
+
+
+def _ollama_transport(delays):
+    """Mock Ollama that answers /api/chat after a per-model delay (None means HTTP 500)."""
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        delay = delays[payload["model"]]
+        if delay is None:
+            return httpx.Response(500, json={"error": "runner crashed"})
+        await asyncio.sleep(delay)
+        lines = [
+            {"message": {"role": "assistant", "content": payload["model"]}, "done": False},
+            {"message": {"role": "assistant", "content": ""}, "done": True},
+        ]
+        return httpx.Response(200, content="".join(json.dumps(line) + "\n" for line in lines))
+
+    return httpx.MockTransport(handler)
+
+
+@pytest.fixture
+def isolated_core(monkeypatch):
+    monkeypatch.setattr(core, "circuit_breakers", _breakers(open_seconds=30))
+    monkeypatch.setattr(core.model_scheduler, "enabled", False)
+    return core
+
+
+def test_hedged_chat_takes_the_fallback_when_primary_is_slow(isolated_core, monkeypatch):
+    monkeypatch.setattr(isolated_core.circuit_breakers, "hedge_delay", lambda model: 0.05)
+
+    async def run():
+        async with httpx.AsyncClient(transport=_ollama_transport({"neural-chat": 5.0, "llama3.1:8b": 0.0})) as client:
+            started = time.monotonic()
+            answer = await isolated_core._hedged_chat(
+                "neural-chat", "llama3.1:8b", [{"role": "user", "content": "hi"}], {}, client, None
+            )
+            return answer, time.monotonic() - started
+
+    (text, model), elapsed = asyncio.run(run())
+    assert (text, model) == ("llama3.1:8b", "llama3.1:8b")
+    assert elapsed < 1.0
+    assert isolated_core.circuit_breakers.get_stats()["hedge_wins"] == 1
+
+
+def test_hedge_is_not_queued_behind_the_primary_by_the_scheduler(monkeypatch):
+    monkeypatch.setattr(core, "circuit_breakers", _breakers(open_seconds=30))
+    monkeypatch.setattr(core.circuit_breakers, "hedge_delay", lambda model: 0.05)
+    monkeypatch.setattr(core, "model_scheduler", ModelAffinityScheduler(enabled=True))
+
+    async def run():
+        async with httpx.AsyncClient(transport=_ollama_transport({"phi3:mini": 2.0, "neural-chat": 0.0})) as client:
+            started = time.monotonic()
+            answer = await core._hedged_chat(
+                "phi3:mini", "neural-chat", [{"role": "user", "content": "hi"}], {}, client, None
+            )
+            return answer, time.monotonic() - started
+
+    answer, elapsed = asyncio.run(run())
+    assert answer == ("neural-chat", "neural-chat")
+    assert elapsed < 1.0
+    lane = next(iter(core.model_scheduler.get_stats()["lanes"].values()))
+    assert (lane["priority_admits"], lane["in_flight"]) == (1, 0)
+
+
+def test_hedged_chat_keeps_a_fast_primary(isolated_core, monkeypatch):
+    monkeypatch.setattr(isolated_core.circuit_breakers, "hedge_delay", lambda model: 1.0)
+
+    async def run():
+        async with httpx.AsyncClient(transport=_ollama_transport({"neural-chat": 0.0, "llama3.1:8b": 0.0})) as client:
+            return await isolated_core._hedged_chat(
+                "neural-chat", "llama3.1:8b", [{"role": "user", "content": "hi"}], {}, client, None
+            )
+
+    assert asyncio.run(run()) == ("neural-chat", "neural-chat")
+    assert isolated_core.circuit_breakers.get_stats()["hedges"] == 0
+
+
+def test_enhanced_chat_falls_back_when_primary_errors(isolated_core, monkeypatch):
+    async def best_model(task_type):
+        return "neural-chat"
+
+    monkeypatch.setattr(isolated_core, "get_best_model_for_task", best_model)
+
+    async def run():
+        async with httpx.AsyncClient(transport=_ollama_transport({"neural-chat": None, "llama3.1:8b": 0.0})) as client:
+            return await isolated_core.enhanced_chat_with_model(
+                [{"role": "user", "content": "hi"}], "conversation", client=client, use_cache=False
+            )
+
+    assert asyncio.run(run()) == ("llama3.1:8b", "llama3.1:8b")
@@ -0,0 +1,100 @@
+"""
+Tests for embedding micro-batching.
+"""
+
+import asyncio
+
+import pytest
+
+from ai_service.embedding_batcher import EmbeddingBatcher, Histogram
+
+
+class RecordingEncoder:
+    """encode_batch stand-in returning [len(text), index in batch] per text."""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.batches = []
+
+    async def __call__(self, texts):
+        self.batches.append(list(texts))
+        await asyncio.sleep(0)
+        if self.fail:
+            raise RuntimeError("model crashed")
+        return [[float(len(text)), float(i)] for i, text in enumerate(texts)]
+
+
+def test_concurrent_requests_are_batched_up_to_max_size():
+    encoder = RecordingEncoder()
+    batcher = EmbeddingBatcher(encoder, enabled=True, max_batch_size=4, max_delay=0.01)
+
+    async def run():
+        return await asyncio.gather(*(batcher.encode("x" * (i + 1)) for i in range(10)))
+
+    vectors = asyncio.run(run())
+
+    assert [len(batch) for batch in encoder.batches] == [4, 4, 2]
+    assert [vector[0] for vector in vectors] == [float(i + 1) for i in range(10)]
+    stats = batcher.get_stats()
+    assert (stats["texts"], stats["batches"]) == (10, 3)
+    assert stats["batch_size"]["buckets"]["2"] == 1 and stats["batch_size"]["buckets"]["4"] == 3
+
+
+def test_lone_request_waits_at_most_max_delay():
+    encoder = RecordingEncoder()
+    batcher = EmbeddingBatcher(encoder, enabled=True, max_batch_size=32, max_delay=0.02)
+
+    assert asyncio.run(batcher.encode("deck")) == [4.0, 0.0]
+
+    delays = batcher.get_stats()["queue_delay_ms"]
+    assert delays["count"] == 1
+    assert 15 <= delays["mean"] < 100
+
+
+def test_duplicate_texts_in_a_batch_are_encoded_once():
+    encoder = RecordingEncoder()
+    batcher = EmbeddingBatcher(encoder, enabled=True, max_batch_size=8, max_delay=0.005)
+
+    async def run():
+        return await asyncio.gather(batcher.encode("joists"), batcher.encode("beam"), batcher.encode("joists"))
+
+    first, _, third = asyncio.run(run())
+
+    assert encoder.batches == [["joists", "beam"]]
+    assert first == third
+
+
+def test_encode_errors_reach_every_caller():
+    batcher = EmbeddingBatcher(RecordingEncoder(fail=True), enabled=True, max_batch_size=8, max_delay=0.005)
+
+    async def run():
+        return await asyncio.gather(batcher.encode("a"), batcher.encode("b"), return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert batcher.get_stats()["errors"] == 1
+
+
+def test_disabled_batcher_encodes_each_text_alone():
+    encoder = RecordingEncoder()
+    batcher = EmbeddingBatcher(encoder, enabled=False)
+
+    async def run():
+        await asyncio.gather(batcher.encode("a"), batcher.encode("b"))
+
+    asyncio.run(run())
+
+    assert encoder.batches == [["a"], ["b"]]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram((1, 5, 10))
+    for value in (0.5, 3, 3, 7, 50):
+        histogram.observe(value)
+
+    stats = histogram.to_dict()
+
+    assert stats["buckets"] == {"1": 1, "5": 3, "10": 4, "+Inf": 5}
+    assert stats["count"] == 5
+    assert stats["mean"] == pytest.approx(12.7)
@@ -0,0 +1,109 @@
+"""
+Tests for the embedding cache and its memory-mapped disk tier.
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from ai_service.embedding_cache import EmbeddingCache, embedding_cache_key
+
+VECTOR = [0.1, -0.25, 0.5, 0.125]
+
+
+def test_keys_ignore_whitespace_but_not_model_or_case():
+    key = embedding_cache_key("all-MiniLM-L6-v2", "Joist spacing?")
+
+    assert key == embedding_cache_key("all-MiniLM-L6-v2", "  Joist \n spacing?\t")
+    assert key != embedding_cache_key("other-model", "Joist spacing?")
+    assert key != embedding_cache_key("all-MiniLM-L6-v2", "joist spacing?")
+
+
+def test_vectors_are_stored_compactly():
+    half = EmbeddingCache(enabled=True, dtype="float16", directory=None)
+    full = EmbeddingCache(enabled=True, dtype="float32", directory=None)
+    for cache in (half, full):
+        cache.set("m", "deck", VECTOR)
+
+    assert half.get("m", "deck") == pytest.approx(VECTOR, abs=1e-3)
+    assert full.get("m", "deck") == pytest.approx(VECTOR)
+    assert half.get_stats()["memory_bytes"] == 8
+    assert full.get_stats()["memory_bytes"] == 16
+    with pytest.raises(ValueError):
+        EmbeddingCache(enabled=True, dtype="int8", directory=None)
+
+
+def test_least_recently_used_vectors_are_evicted():
+    cache = EmbeddingCache(enabled=True, max_entries=2, directory=None)
+    cache.set("m", "a", VECTOR)
+    cache.set("m", "b", VECTOR)
+    cache.get("m", "a")
+    cache.set("m", "c", VECTOR)
+
+    assert cache.get("m", "b") is None
+    assert cache.get("m", "a") is not None
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["entries"]) == (2, 1, 1, 2)
+    assert stats["hit_rate"] == pytest.approx(2 / 3, abs=1e-4)
+
+
+def test_disk_tier_survives_restarts(tmp_path):
+    directory = str(tmp_path / "embeddings")
+    first = EmbeddingCache(enabled=True, dtype="float16", directory=directory)
+    for i in range(5):
+        first.set("m", f"text {i}", [float(i)] * 4)
+    first.flush()
+
+    restarted = EmbeddingCache(enabled=True, dtype="float16", directory=directory)
+
+    assert restarted.get("m", "text 3") == [3.0] * 4
+    restarted.set("m", "text 5", [5.0] * 4)
+    assert restarted.get("m", "text 5") == [5.0] * 4
+    assert restarted.get_stats()["disk_pending"] == 1
+    restarted.flush()
+    stats = restarted.get_stats()
+    assert (stats["disk_hits"], stats["hits"], stats["disk_entries"], stats["disk_bytes"]) == (1, 1, 6, 48)
+
+
+def test_disk_tier_recovers_from_torn_writes_and_dtype_changes(tmp_path):
+    directory = str(tmp_path / "embeddings")
+    cache = EmbeddingCache(enabled=True, dtype="float32", directory=directory)
+    cache.set("m", "kept", VECTOR)
+    cache.set("m", "torn", VECTOR)
+    cache.flush()
+    # Simulate a crash that left the second vector half written
+    with open(os.path.join(directory, "vectors.bin"), "r+b") as f:
+        f.truncate(16 + 8)
+
+    recovered = EmbeddingCache(enabled=True, dtype="float32", directory=directory)
+    assert recovered.get("m", "kept") == pytest.approx(VECTOR)
+    assert recovered.get("m", "torn") is None
+
+    converted = EmbeddingCache(enabled=True, dtype="float16", directory=directory)
+    assert converted.get("m", "kept") is None
+    assert converted.get_stats()["disk_entries"] == 0
+
+
+def test_disabled_cache_stores_nothing(tmp_path):
+    cache = EmbeddingCache(enabled=False, directory=str(tmp_path / "embeddings"))
+    cache.set("m", "deck", VECTOR)
+
+    assert cache.get("m", "deck") is None
+    assert not cache.get_stats()["disk_tier"]
+    assert not os.path.exists(tmp_path / "embeddings")
+    assert np.dtype(cache.get_stats()["dtype"]) == np.float16
+
+
+def test_memory_lookups_never_touch_the_disk_tier(tmp_path):
+    directory = str(tmp_path / "embeddings")
+    first = EmbeddingCache(enabled=True, dtype="float32", directory=directory)
+    first.set("m", "on disk", VECTOR)
+    first.flush()
+
+    restarted = EmbeddingCache(enabled=True, dtype="float32", directory=directory)
+
+    assert restarted.get_from_memory("m", "on disk") is None
+    assert restarted.get_stats()["misses"] == 0
+    assert restarted.get_many("m", ["on disk", "unknown"]) == [pytest.approx(VECTOR), None]
+    assert restarted.get_from_memory("m", "on disk") == pytest.approx(VECTOR)
@@ -37,10 +37,11 @@ async def test_enhanced_services():
     # Test 2: Vector Database Service
     print("\n2. Testing Vector Database Service...")
     try:
-        from ai_service.vector_db_service import vector_db_service
+        from ai_service.vector_db_service import get_vector_db_service
+        vector_db_service = get_vector_db_service()
         
         # Test basic functionality
-        stats = vector_db_service.get_collection_stats()
+        stats = await vector_db_service.get_collection_stats()
         print(f"✓ Vector DB collections: {stats}")
         
         # Test knowledge search
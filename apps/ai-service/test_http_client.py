@@ -0,0 +1,48 @@
+"""
+Tests for the lifecycle of the shared, pooled Ollama HTTP client.
+"""
+
+import httpx
+from fastapi.testclient import TestClient
+
+from ai_service import core, main
+from ai_service.admission import ModelAdmissionController
+from ai_service.circuit_breaker import ModelCircuitBreakers
+from benchmarks.stub_ollama import create_app
+
+MESSAGES = [{"role": "user", "content": "How far apart should joists be?"}]
+
+
+def test_one_client_is_created_at_startup_shared_and_closed_at_shutdown(monkeypatch):
+    monkeypatch.setattr(core, "circuit_breakers", ModelCircuitBreakers())
+    monkeypatch.setattr(core, "admission_controller", ModelAdmissionController())
+    monkeypatch.setattr(core, "_http_client", None)
+    stub = create_app()
+    created = []
+    # Chat calls per client; warm-up generates, /api/tags and health probes run in the background
+    chats = {}
+
+    def create_http_client():
+        async def record(request):
+            if request.url.path == "/api/chat":
+                chats[client] += 1
+
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=stub), event_hooks={"request": [record]})
+        created.append(client)
+        chats[client] = 0
+        return client
+
+    monkeypatch.setattr(core, "create_http_client", create_http_client)
+
+    with TestClient(main.app) as app:
+        assert len(created) == 1
+        client = created[0]
+        assert core.get_http_client() is client
+        for path in ("/bot-query", "/bot-query", "/enhanced-chat", "/bot-query/stream"):
+            assert app.post(path, json={"messages": MESSAGES}).status_code == 200
+        assert not client.is_closed
+
+    assert len(created) == 1
+    assert chats[client] == 4
+    assert client.is_closed
+    assert core._http_client is None
@@ -0,0 +1,186 @@
+"""
+Tests for bulk knowledge ingestion, using the vector DB stand-ins of
+test_vector_db_service.
+"""
+
+import asyncio
+import importlib
+
+import httpx
+import pytest
+
+from ai_service import knowledge_ingestion as ki
+from ai_service import main
+from test_vector_db_service import _service
+
+
+def _words(start, count):
+    return " ".join(f"w{i}" for i in range(start, start + count))
+
+
+def _record_upserts(collection, fail_on=None):
+    """Record upsert sizes; raise on the fail_on-th call to simulate a crash."""
+    sizes = []
+    upsert = collection.upsert
+
+    def recording_upsert(embeddings, documents, metadatas, ids):
+        if fail_on is not None and len(sizes) + 1 == fail_on:
+            raise RuntimeError("interrupted")
+        sizes.append(len(ids))
+        upsert(embeddings, documents, metadatas, ids)
+
+    collection.upsert = recording_upsert
+    return sizes
+
+
+def test_chunks_overlap_and_cover_the_text():
+    chunks = ki.chunk_text(_words(0, 10), chunk_words=4, overlap_words=1)
+
+    assert chunks == [_words(0, 4), _words(3, 4), _words(6, 4)]
+    assert ki.chunk_text("  short \n text ", chunk_words=4, overlap_words=1) == ["short text"]
+    assert ki.chunk_text("", chunk_words=4, overlap_words=1) == []
+    with pytest.raises(ValueError):
+        ki.chunk_text("text", chunk_words=4, overlap_words=4)
+
+
+def test_duplicates_and_stored_chunks_are_not_embedded(monkeypatch, tmp_path):
+    service = _service(monkeypatch, tmp_path / "chroma")
+    sizes = _record_upserts(service.deck_knowledge_collection)
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "a.md").write_text(_words(0, 20))
+    (docs / "b.txt").write_text(_words(0, 20))  # Same text as a.md
+    (docs / "notes.docx").write_text("unsupported")
+    stored = ki.chunk_text(_words(0, 20), chunk_words=8, overlap_words=2)[0]
+    asyncio.run(service.upsert_deck_knowledge([(stored, {"category": "seed"})]))
+    service.embedding_cache.clear()
+    service.embedding_model.encoded.clear()
+    service.embedding_model.calls = 0
+    sizes.clear()
+
+    ingestor = ki.KnowledgeIngestor(service, category="code", chunk_words=8, overlap_words=2,
+                                    embed_batch_size=1, upsert_batch_size=3,
+                                    checkpoint_path=str(tmp_path / "checkpoint.json"))
+    report = asyncio.run(ingestor.ingest([str(docs)]))
+
+    # 20 words in windows of 8 every 6 words: 3 chunks per file
+    assert (report["files"], report["chunks"], report["duplicates"], report["existing"]) == (2, 6, 3, 1)
+    assert (report["embedded"], report["upserted"]) == (2, 2)
+    assert sizes == [2]
+    assert len(service.embedding_model.encoded) == 2
+    assert service.embedding_model.calls == 2  # One encode call per embed batch
+    assert report["chunks_per_second"] > 0
+    metadata = [meta for _, meta in service.deck_knowledge_collection.documents.values() if meta["category"] == "code"]
+    assert sorted((meta["source"], meta["chunk"]) for meta in metadata) == [("a.md", 1), ("a.md", 2)]
+
+
+def test_interrupted_ingestion_resumes_from_the_checkpoint(monkeypatch, tmp_path):
+    service = _service(monkeypatch, tmp_path / "chroma")
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "a.txt").write_text(_words(0, 20))
+    (docs / "b.txt").write_text(_words(100, 20))
+
+    def ingestor():
+        return ki.KnowledgeIngestor(service, chunk_words=8, overlap_words=2, upsert_batch_size=4)
+
+    sizes = _record_upserts(service.deck_knowledge_collection, fail_on=2)
+    with pytest.raises(RuntimeError):
+        asyncio.run(ingestor().ingest([str(docs)]))
+    assert sizes == [4]
+    service.embedding_model.encoded.clear()
+
+    del service.deck_knowledge_collection.upsert
+    report = asyncio.run(ingestor().ingest([str(docs)]))
+
+    # a.txt and the first chunk of b.txt were stored before the crash
+    assert (report["files"], report["chunks"], report["upserted"]) == (1, 2, 2)
+    assert service.deck_knowledge_collection.count() == 6
+    assert asyncio.run(ingestor().ingest([str(docs)]))["files_skipped"] == 2
+
+    # A changed file is read again; its unchanged chunks are already stored
+    (docs / "a.txt").write_text(_words(0, 26))
+    report = asyncio.run(ingestor().ingest([str(docs)]))
+    assert (report["files"], report["chunks"], report["existing"], report["upserted"]) == (1, 4, 3, 1)
+
+
+def test_changed_files_drop_their_stale_chunks(monkeypatch, tmp_path):
+    service = _service(monkeypatch, tmp_path / "chroma")
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "a.txt").write_text(_words(0, 16))
+    (docs / "b.txt").write_text(_words(8, 8))  # Same text as the second chunk of a.txt
+
+    def ingest():
+        return asyncio.run(ki.KnowledgeIngestor(service, chunk_words=8, overlap_words=0).ingest([str(docs)]))
+
+    ingest()
+    assert service.deck_knowledge_collection.count() == 2
+    (docs / "a.txt").write_text(_words(0, 8) + " " + _words(100, 8))
+    version = service.knowledge_version
+
+    report = ingest()
+
+    # The second chunk left a.txt but is still in b.txt, so it is kept
+    assert (report["removed"], report["existing"], report["upserted"]) == (0, 1, 1)
+    assert service.deck_knowledge_collection.count() == 3
+    (docs / "a.txt").write_text(_words(0, 8))
+    (docs / "b.txt").write_text(_words(200, 8))
+
+    report = ingest()
+
+    contents = sorted(document for document, _ in service.deck_knowledge_collection.documents.values())
+    assert contents == sorted([_words(0, 8), _words(200, 8)])
+    assert report["removed"] == 2
+    assert service.knowledge_version != version
+
+
+def test_cli_does_not_build_the_global_service(monkeypatch, tmp_path):
+    from ai_service import vector_db_service as vdb
+
+    def accessor_calls():
+        info = vdb.get_vector_db_service.cache_info()
+        return info.hits + info.misses
+
+    calls = accessor_calls()
+    importlib.reload(ki)
+    assert accessor_calls() == calls
+    service = _service(monkeypatch, tmp_path / "chroma")
+    built = []
+    monkeypatch.setattr(ki, "VectorDBService", lambda persist_directory: built.append(persist_directory) or service)
+    (tmp_path / "irc.md").write_text("Joists are 16 inches on center.")
+
+    assert ki.main([str(tmp_path / "irc.md"), "--persist-directory", str(tmp_path / "chroma")]) == 0
+    assert built == [str(tmp_path / "chroma")]
+    assert accessor_calls() == calls
+    assert service.deck_knowledge_collection.count() == 1
+
+
+def test_pdfs_are_skipped_without_pypdf(monkeypatch, tmp_path):
+    monkeypatch.setattr(ki, "PYPDF_AVAILABLE", False)
+    service = _service(monkeypatch, tmp_path / "chroma")
+    (tmp_path / "manual.pdf").write_bytes(b"%PDF-1.4")
+
+    report = asyncio.run(ki.KnowledgeIngestor(service).ingest([str(tmp_path / "manual.pdf")]))
+
+    assert (report["files"], report["files_failed"], report["chunks"]) == (0, 1, 0)
+
+
+def test_ingest_endpoint_reads_only_from_the_ingest_dir(monkeypatch, tmp_path):
+    service = _service(monkeypatch, tmp_path / "chroma")
+    monkeypatch.setattr(main, "get_vector_db_service", lambda: service)
+    monkeypatch.setattr(main, "KNOWLEDGE_INGEST_DIR", str(tmp_path / "knowledge"))
+    (tmp_path / "knowledge" / "codes").mkdir(parents=True)
+    (tmp_path / "knowledge" / "codes" / "irc.md").write_text("Joists are 16 inches on center.")
+
+    async def post(payload):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/ingest-knowledge", json=payload)
+
+    response = asyncio.run(post({"paths": ["codes"], "category": "building_code"}))
+    assert response.status_code == 200
+    assert response.json()["upserted"] == 1
+    assert asyncio.run(post({"paths": ["../chroma"]})).status_code == 400
+    assert asyncio.run(post({"paths": ["manuals"]})).status_code == 404
+    assert asyncio.run(post({"paths": ["codes"], "chunk_words": 10, "overlap_words": 10})).status_code == 400
@@ -0,0 +1,55 @@
+"""
+Tests for the micro-benchmark runner.
+"""
+
+from benchmarks import microbench
+from benchmarks.microbench import SkipBenchmark, compare, measure
+
+
+def test_measure_reports_per_call_stats():
+    stats = measure(lambda: sum(range(100)), min_time=0.001, rounds=3)
+
+    assert stats["rounds"] == 3
+    assert stats["loops"] >= 1
+    assert 0 < stats["min"] <= stats["median"]
+    assert stats["ops"] > 0
+
+
+def test_compare_flags_changes_beyond_the_threshold():
+    baseline = {"a": {"median": 1.0}, "b": {"median": 1.0}, "c": {"median": 1.0}, "gone": {"median": 1.0}}
+    current = {"a": {"median": 1.05}, "b": {"median": 1.5}, "c": {"median": 0.5}, "new": {"median": 1.0}}
+
+    rows = {row["name"]: row for row in compare(current, baseline, threshold=0.10)}
+
+    assert set(rows) == {"a", "b", "c"}
+    assert rows["a"]["status"] == "ok"
+    assert rows["b"]["status"] == "regression"
+    assert round(rows["b"]["change"], 3) == 0.5
+    assert rows["c"]["status"] == "improvement"
+
+
+def test_run_filters_and_reports_skips(monkeypatch):
+    monkeypatch.setattr(microbench, "_REGISTRY", {})
+
+    @microbench.benchmark("fast[sync]", group="test")
+    def _sync():
+        return lambda: None
+
+    @microbench.benchmark("fast[async]", group="test")
+    def _async():
+        async def target():
+            pass
+        return target
+
+    @microbench.benchmark("needs_binary", group="test")
+    def _missing():
+        raise SkipBenchmark("binary not installed")
+
+    results, skipped = microbench.run(["fast*"], min_time=0.001, rounds=2)
+    assert set(results) == {"fast[sync]", "fast[async]"}
+    assert results["fast[async]"]["group"] == "test"
+    assert skipped == {}
+
+    results, skipped = microbench.run(["needs"], min_time=0.001, rounds=2)
+    assert results == {}
+    assert skipped == {"needs_binary": "binary not installed"}
@@ -0,0 +1,70 @@
+"""
+Tests for the installed-model registry cache.
+"""
+
+import asyncio
+
+from ai_service.model_registry import ModelRegistry
+
+
+def _counting_fetcher(models):
+    calls = {"count": 0}
+
+    async def fetch():
+        calls["count"] += 1
+        return list(models)
+
+    return fetch, calls
+
+
+def test_registry_serves_hits_within_ttl():
+    """Repeated lookups within the TTL should hit the cache, not /api/tags."""
+    fetch, calls = _counting_fetcher(["neural-chat", "phi3:mini"])
+    registry = ModelRegistry(fetch, ttl_seconds=60)
+
+    async def run():
+        for _ in range(5):
+            models = await registry.get_models()
+            assert "neural-chat" in models
+
+    asyncio.run(run())
+    assert calls["count"] == 1
+    assert registry.get_stats()["misses"] == 1
+    assert registry.get_stats()["hits"] == 4
+
+
+def test_registry_refetches_after_invalidate():
+    """A model-not-found invalidation should force the next lookup to refetch."""
+    fetch, calls = _counting_fetcher(["neural-chat"])
+    registry = ModelRegistry(fetch, ttl_seconds=60)
+
+    async def run():
+        await registry.get_models()
+        registry.invalidate()
+        await registry.get_models()
+
+    asyncio.run(run())
+    assert calls["count"] == 2
+    assert registry.get_stats()["invalidations"] == 1
+
+
+def test_registry_returns_none_when_fetch_fails():
+    """An unreachable Ollama should not raise, so callers can fall back."""
+    async def failing_fetch():
+        raise ConnectionError("ollama down")
+
+    registry = ModelRegistry(failing_fetch, ttl_seconds=60)
+    assert asyncio.run(registry.get_models()) is None
+    assert registry.get_stats()["refresh_errors"] == 1
+
+
+def test_concurrent_misses_share_one_fetch():
+    """Concurrent lookups on a cold cache should trigger a single fetch."""
+    fetch, calls = _counting_fetcher(["neural-chat"])
+    registry = ModelRegistry(fetch, ttl_seconds=60)
+
+    async def run():
+        await asyncio.gather(*(registry.get_models() for _ in range(10)))
+
+    asyncio.run(run())
+    assert calls["count"] == 1
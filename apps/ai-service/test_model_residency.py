@@ -0,0 +1,88 @@
+"""
+Tests for model warm-up and keep-alive residency management.
+"""
+
+import asyncio
+import time
+
+from ai_service.model_residency import ModelResidencyManager
+
+
+def _manager(loaded, fail=(), reachable=None, **kwargs):
+    async def warm_model(model):
+        if model in fail:
+            raise Exception(f"model '{model}' not found")
+        loaded.append(model)
+
+    return ModelResidencyManager(warm_model, ["neural-chat", "qwen2.5-vl", "neural-chat"],
+                                 is_reachable=lambda: reachable is None or reachable[0], **kwargs)
+
+
+def test_warm_all_loads_each_model_once_and_becomes_ready():
+    loaded = []
+    manager = _manager(loaded)
+    assert not manager.get_status()["ready"]
+
+    results = asyncio.run(manager.warm_all())
+
+    assert results == {"neural-chat": True, "qwen2.5-vl": True}
+    assert loaded == ["neural-chat", "qwen2.5-vl"]
+    status = manager.get_status()
+    assert status["ready"]
+    assert status["models"]["neural-chat"]["hot"]
+
+
+def test_failed_warmup_is_reported_without_failing_readiness():
+    manager = _manager([], fail={"qwen2.5-vl"})
+
+    asyncio.run(manager.warm_all())
+
+    status = manager.get_status()
+    # A missing model must not keep the instance out of rotation forever
+    assert status["ready"]
+    assert status["cold_models"] == ["qwen2.5-vl"]
+    assert status["models"]["neural-chat"]["hot"]
+    assert not status["models"]["qwen2.5-vl"]["hot"]
+    assert "not found" in status["models"]["qwen2.5-vl"]["last_error"]
+
+
+def test_models_go_cold_after_keep_alive():
+    manager = _manager([], keep_alive=0.05)
+    asyncio.run(manager.warm_all())
+    assert manager.is_hot("neural-chat")
+
+    time.sleep(0.06)
+
+    assert not manager.is_hot("neural-chat")
+    status = manager.get_status()
+    assert status["ready"]
+    assert status["cold_models"] == ["neural-chat", "qwen2.5-vl"]
+
+
+def test_not_ready_while_ollama_is_unreachable():
+    reachable = [False]
+    manager = _manager([], reachable=reachable)
+    asyncio.run(manager.warm_all())
+
+    assert not manager.get_status()["ready"]
+    assert not manager.get_status()["ollama_reachable"]
+    reachable[0] = True
+    assert manager.get_status()["ready"]
+
+
+def test_refresh_only_touches_recently_used_models():
+    loaded = []
+    manager = _manager(loaded, keep_alive=0.1, active_window=60)
+    asyncio.run(manager.warm_all())
+    manager.record_use("phi3:mini")
+    loaded.clear()
+
+    # Nothing is due until half of keep_alive has passed
+    assert asyncio.run(manager.refresh()) == []
+
+    time.sleep(0.06)
+    refreshed = asyncio.run(manager.refresh())
+
+    # Warmed-but-unused primaries are left to expire; the used model is kept loaded
+    assert refreshed == ["phi3:mini"]
+    assert loaded == ["phi3:mini"]
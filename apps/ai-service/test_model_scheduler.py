@@ -0,0 +1,118 @@
+"""
+Tests for model-affinity scheduling of Ollama requests.
+"""
+
+import asyncio
+
+from ai_service.model_scheduler import ModelAffinityScheduler
+
+
+class FakeOllama:
+    """Counts model loads the way a host that fits one model at a time would."""
+
+    def __init__(self):
+        self.loaded = None
+        self.loads = 0
+        self.order = []
+
+    async def call(self, scheduler, model, service_time=0.01):
+        async with scheduler.slot(model):
+            if self.loaded != model:
+                self.loaded = model
+                self.loads += 1
+            self.order.append(model)
+            await asyncio.sleep(service_time)
+
+
+async def _interleaved(scheduler, requests=30):
+    ollama = FakeOllama()
+    models = ["neural-chat", "qwen2.5-vl", "phi3:mini"]
+    await asyncio.gather(*(ollama.call(scheduler, models[i % len(models)]) for i in range(requests)))
+    return ollama
+
+
+def test_groups_interleaved_requests_by_model():
+    unscheduled = asyncio.run(_interleaved(ModelAffinityScheduler(enabled=False)))
+    scheduler = ModelAffinityScheduler(enabled=True, max_batch=16, max_wait=5.0)
+    scheduled = asyncio.run(_interleaved(scheduler))
+
+    assert len(scheduled.order) == 30
+    assert scheduled.loads == 3
+    assert unscheduled.loads == 30
+    stats = scheduler.get_stats()
+    assert stats["swaps"] == scheduled.loads - 1
+    assert stats["arrival_swaps"] == 29
+    assert stats["lanes"]["default"]["in_flight"] == 0
+
+
+def test_max_batch_bounds_starvation():
+    scheduler = ModelAffinityScheduler(enabled=True, max_batch=3, max_wait=60.0)
+    ollama = FakeOllama()
+
+    async def run():
+        # Tasks start in creation order
+        tasks = [asyncio.create_task(ollama.call(scheduler, "neural-chat", 0.05))]
+        tasks.append(asyncio.create_task(ollama.call(scheduler, "qwen2.5-vl")))
+        # A steady stream for the active model must not hold qwen back indefinitely
+        tasks += [asyncio.create_task(ollama.call(scheduler, "neural-chat")) for _ in range(6)]
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert ollama.order.index("qwen2.5-vl") == 3
+
+
+def test_max_wait_closes_the_batch():
+    scheduler = ModelAffinityScheduler(enabled=True, max_batch=100, max_wait=0.1)
+    ollama = FakeOllama()
+
+    async def run():
+        first = asyncio.create_task(ollama.call(scheduler, "neural-chat", 0.4))
+        other = asyncio.create_task(ollama.call(scheduler, "phi3:mini"))
+        early = asyncio.create_task(ollama.call(scheduler, "neural-chat"))
+        await asyncio.sleep(0.2)
+        late = asyncio.create_task(ollama.call(scheduler, "neural-chat"))
+        await asyncio.gather(first, other, early, late)
+
+    asyncio.run(run())
+    assert ollama.order == ["neural-chat", "neural-chat", "phi3:mini", "neural-chat"]
+
+
+def test_cancelled_waiter_does_not_block_the_lane():
+    scheduler = ModelAffinityScheduler(enabled=True, max_batch=16, max_wait=5.0)
+    ollama = FakeOllama()
+
+    async def run():
+        first = asyncio.create_task(ollama.call(scheduler, "neural-chat", 0.1))
+        await asyncio.sleep(0.001)
+        cancelled = asyncio.create_task(ollama.call(scheduler, "qwen2.5-vl"))
+        waiting = asyncio.create_task(ollama.call(scheduler, "phi3:mini"))
+        await asyncio.sleep(0.001)
+        cancelled.cancel()
+        await asyncio.gather(first, waiting)
+
+    asyncio.run(run())
+    assert ollama.order == ["neural-chat", "phi3:mini"]
+    assert scheduler.get_stats()["lanes"]["default"]["in_flight"] == 0
+
+
+def test_priority_requests_skip_the_queue():
+    scheduler = ModelAffinityScheduler(enabled=True, max_batch=16, max_wait=10)
+    started = []
+
+    async def call(model, service_time, priority=False):
+        async with scheduler.slot(model, priority=priority):
+            started.append(model)
+            await asyncio.sleep(service_time)
+
+    async def run():
+        slow = asyncio.create_task(call("neural-chat", 0.2))
+        queued = asyncio.create_task(call("qwen2.5-vl", 0.01))
+        hedge = asyncio.create_task(call("llama3.1:8b", 0.01, priority=True))
+        await asyncio.sleep(0.05)
+        assert started == ["neural-chat", "llama3.1:8b"]
+        await asyncio.gather(slow, queued, hedge)
+
+    asyncio.run(run())
+    lane = scheduler.get_stats()["lanes"]["default"]
+    assert started[-1] == "qwen2.5-vl"
+    assert (lane["priority_admits"], lane["swaps"], lane["in_flight"]) == (1, 1, 0)
@@ -0,0 +1,97 @@
+"""
+Tests for routing Ollama calls across several backend nodes.
+"""
+
+import asyncio
+import socket
+
+import httpx
+import pytest
+
+from ai_service.ollama_backends import OllamaBackendPool
+from benchmarks.stub_ollama import create_app, run_in_thread
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_selects_least_outstanding_node():
+    pool = OllamaBackendPool(["http://a", "http://b", "http://c"])
+    pool.nodes[0].outstanding = 2
+    pool.nodes[1].outstanding = 0
+    pool.nodes[2].outstanding = 1
+
+    assert pool.select("neural-chat").url == "http://b"
+
+
+def test_prefers_nodes_with_the_model():
+    pool = OllamaBackendPool(["http://a", "http://b"])
+    pool.nodes[0].models = {"phi3:mini"}
+    pool.nodes[1].models = {"neural-chat"}
+
+    assert all(pool.select("neural-chat").url == "http://b" for _ in range(5))
+    assert all(pool.select("phi3:mini").url == "http://a" for _ in range(5))
+
+
+def test_sticky_sessions_reuse_the_same_node():
+    pool = OllamaBackendPool(["http://a", "http://b"])
+    first = pool.select("neural-chat", session_id="user-1")
+    first.outstanding = 5  # Would lose least-outstanding, but the session is pinned
+
+    assert pool.select("neural-chat", session_id="user-1") is first
+    assert pool.select("neural-chat", session_id="user-2") is not first
+
+
+def test_node_is_ejected_after_repeated_failures():
+    pool = OllamaBackendPool(["http://a", "http://b"], failure_threshold=2)
+    bad, good = pool.nodes
+    good.outstanding = 10  # Keep the least-outstanding choice on the bad node
+
+    async def fail_once():
+        with pytest.raises(httpx.ConnectError):
+            async with pool.lease("neural-chat") as node:
+                assert node is bad
+                raise httpx.ConnectError("refused")
+
+    asyncio.run(fail_once())
+    assert bad.healthy
+    asyncio.run(fail_once())
+    assert not bad.healthy
+    assert bad.outstanding == 0
+    assert pool.select("neural-chat") is good
+
+
+def test_routes_to_the_stub_that_has_the_model():
+    ports = [_free_port(), _free_port()]
+    servers = [
+        run_in_thread(ports[0], stub_app=create_app(models=["neural-chat"])),
+        run_in_thread(ports[1], stub_app=create_app(models=["llava-deck"])),
+    ]
+    try:
+        urls = [f"http://127.0.0.1:{port}" for port in ports]
+        pool = OllamaBackendPool(urls)
+
+        async def run():
+            async with httpx.AsyncClient() as client:
+                await pool.check_health(client)
+                routed = []
+                for model in ["neural-chat", "llava-deck"] * 3:
+                    async with pool.lease(model) as node:
+                        response = await client.post(
+                            f"{node.url}/api/generate",
+                            json={"model": model, "prompt": "hi", "stream": False},
+                        )
+                        response.raise_for_status()
+                        routed.append((model, node.url))
+                return routed
+
+        routed = asyncio.run(run())
+        assert pool.available_models() == {"neural-chat", "llava-deck"}
+        assert all(url == urls[0] for model, url in routed if model == "neural-chat")
+        assert all(url == urls[1] for model, url in routed if model == "llava-deck")
+    finally:
+        for server in servers:
+            server.should_exit = True
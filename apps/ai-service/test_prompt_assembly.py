@@ -0,0 +1,157 @@
+"""
+Tests for token-budgeted prompt assembly.
+"""
+
+import asyncio
+import threading
+
+from ai_service import prompt_assembly
+from ai_service.prompt_assembly import PromptAssembler, approximate_token_count
+
+
+def _assembler(budget=100, reserve=0):
+    assembler = PromptAssembler(budget=budget, response_reserve=reserve, model_budgets={}, tokenizers={})
+    # One token per word keeps the arithmetic in these tests readable
+    assembler.register_tokenizer("test-model", lambda text: len(text.split()))
+    return assembler
+
+
+def _turn(role, words):
+    return {"role": role, "content": " ".join(["word"] * words)}
+
+
+def test_short_conversation_is_unchanged():
+    messages = [_turn("system", 5), _turn("user", 5), _turn("assistant", 5), _turn("user", 5)]
+
+    assembly = _assembler().assemble(messages, "test-model")
+
+    assert assembly.messages == messages
+    assert assembly.tokens_dropped == 0
+    assert assembly.messages_dropped == 0
+    assert assembly.tokens_used == 4 * (5 + 4)
+
+
+def test_drops_oldest_turns_and_keeps_system_and_latest():
+    messages = [_turn("system", 10)] + [_turn("user" if i % 2 == 0 else "assistant", 20) for i in range(6)]
+    assembler = _assembler(budget=80)
+
+    assembly = assembler.assemble(messages, "test-model")
+
+    # system (14) + three most recent turns (3 * 24) = 86 > 80, so only two fit
+    assert assembly.messages == [messages[0]] + messages[-2:]
+    assert assembly.messages_dropped == 4
+    assert assembly.tokens_dropped == 4 * 24
+    assert assembler.get_stats()["trimmed_requests"] == 1
+
+
+def test_context_is_truncated_to_the_remaining_budget():
+    messages = [_turn("system", 10), _turn("user", 10)]
+    context = "Relevant context: " + " ".join(["fact"] * 100)
+
+    assembly = _assembler(budget=60).assemble(messages, "test-model", context)
+
+    assert [message["role"] for message in assembly.messages] == ["system", "system", "user"]
+    assert assembly.messages[1]["content"].startswith("Relevant context: fact")
+    assert assembly.context_truncated
+    assert assembly.tokens_used <= 60
+    assert assembly.tokens_dropped == 102 - (60 - 14 - 14 - 4)
+
+
+def test_oversized_latest_turn_keeps_its_end():
+    long_question = {"role": "user", "content": " ".join(f"w{i}" for i in range(200))}
+
+    assembly = _assembler(budget=50).assemble([long_question], "test-model")
+
+    content = assembly.messages[0]["content"]
+    assert content.endswith("w199")
+    assert len(content.split()) <= 46
+    assert assembly.tokens_dropped > 0
+
+
+def test_oversized_system_prompt_never_empties_the_latest_turn():
+    assembler = _assembler(budget=60)
+    question = _turn("user", 10)
+
+    assembly = assembler.assemble([_turn("system", 100), question], "test-model")
+
+    # The question fits whole; the system prompt gets the other 46 tokens
+    assert assembly.messages[-1] == question
+    assert len(assembly.messages[0]["content"].split()) == 42
+    assert assembly.system_truncated
+    assert assembly.tokens_dropped == 58
+    assert assembly.tokens_used == 60
+    assert assembler.get_stats()["system_truncated_requests"] == 1
+
+    long_question = {"role": "user", "content": " ".join(f"w{i}" for i in range(200))}
+    both = assembler.assemble([_turn("system", 100), _turn("system", 5), long_question], "test-model",
+                              instructions="You are DeckChatbot")
+
+    # Both overflow: each side gets half, instructions first, the question keeps its end
+    contents = [message["content"] for message in both.messages]
+    assert contents[0] == "You are DeckChatbot"
+    assert len(contents) == 3 and len(contents[1].split()) == 30 - 7 - 4
+    assert contents[-1].split()[-1] == "w199" and len(contents[-1].split()) == 26
+
+
+def test_latest_turn_is_sent_whole_when_nothing_fits():
+    assembly = _assembler(budget=4).assemble([_turn("system", 10), _turn("user", 5)], "test-model")
+
+    assert assembly.messages == [_turn("user", 5)]
+    assert assembly.system_truncated
+
+
+def test_response_reserve_and_model_budgets():
+    assembler = PromptAssembler(budget=4096, response_reserve=512, model_budgets={"phi3:mini": 8192}, tokenizers={})
+
+    assert assembler.budget_for("neural-chat") == 3584
+    assert assembler.budget_for("phi3:mini") == 7680
+
+
+def test_approximate_counter_is_used_without_a_tokenizer():
+    assembler = PromptAssembler(budget=4096, response_reserve=0, model_budgets={}, tokenizers={})
+
+    assert assembler.count_tokens("x" * 40, "neural-chat") == approximate_token_count("x" * 40) == 10
+
+
+def test_configured_tokenizers_load_off_the_event_loop(monkeypatch):
+    loads = []
+
+    def load(name):
+        loads.append((name, threading.current_thread() is threading.main_thread()))
+        return lambda text: len(text.split())
+
+    monkeypatch.setattr(prompt_assembly, "_load_hf_tokenizer", load)
+    assembler = PromptAssembler(budget=4096, response_reserve=0, model_budgets={},
+                                tokenizers={"neural-chat": "Intel/neural-chat-7b-v3-1"})
+    text = "joists sixteen inches apart"
+
+    # Estimated, and nothing loaded, until the tokenizer is ready
+    assert assembler.count_tokens(text, "neural-chat") == approximate_token_count(text)
+    assert loads == []
+
+    async def run():
+        await assembler.start()
+        await assembler._loading
+
+    asyncio.run(run())
+
+    assert loads == [("Intel/neural-chat-7b-v3-1", False)]
+    assert assembler.count_tokens(text, "neural-chat") == 4
+    assert assembler.get_stats()["tokenizers_loaded"] == ["neural-chat"]
+
+
+def test_layout_keeps_the_prefix_stable_across_turns():
+    assembler = _assembler(budget=1000)
+    history = [_turn("user", 5), _turn("assistant", 5)]
+
+    first = assembler.assemble(history + [{"role": "user", "content": "q1"}], "test-model",
+                               context="retrieved for q1", instructions="You are DeckChatbot")
+    second = assembler.assemble(history + [{"role": "user", "content": "q1"}, _turn("assistant", 5),
+                                           {"role": "user", "content": "q2"}], "test-model",
+                                context="retrieved for q2", instructions="You are DeckChatbot")
+
+    contents = [message["content"] for message in first.messages]
+    assert contents[0] == "You are DeckChatbot"
+    assert contents[-2:] == ["retrieved for q1", "q1"]
+    # Everything before the per-turn context is an unchanged prefix of the next request
+    assert second.messages[:3] == first.messages[:3]
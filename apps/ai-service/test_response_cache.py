@@ -0,0 +1,114 @@
+"""
+Tests for the exact-match LLM response cache.
+"""
+
+import asyncio
+import threading
+
+from ai_service.response_cache import ResponseCache, make_cache_key, should_cache
+
+
+def test_cache_key_is_canonical():
+    """Option ordering must not change the cache key."""
+    messages = [{"role": "user", "content": "joist spacing?"}]
+    key_a = make_cache_key("chat", "phi3:mini", messages, {"temperature": 0.1, "top_p": 0.9})
+    key_b = make_cache_key("chat", "phi3:mini", messages, {"top_p": 0.9, "temperature": 0.1})
+    key_c = make_cache_key("chat", "neural-chat", messages, {"temperature": 0.1, "top_p": 0.9})
+    assert key_a == key_b
+    assert key_a != key_c
+
+
+def test_should_cache_policy():
+    """Deterministic requests are cached by default; callers can force or bypass."""
+    assert should_cache({"temperature": 0.1})
+    assert not should_cache({"temperature": 0.7})
+    assert not should_cache({})
+    assert should_cache({"temperature": 0.7}, use_cache=True)
+    assert not should_cache({"temperature": 0.1}, use_cache=False)
+
+
+def test_lru_eviction_by_entry_count():
+    cache = ResponseCache(max_entries=2, db_path=None, enabled=True)
+
+    async def run():
+        await cache.aset("a", "A")
+        await cache.aset("b", "B")
+        assert await cache.aget("a") == "A"  # "a" becomes most recently used
+        await cache.aset("c", "C")
+        return await cache.aget("b"), await cache.aget("a"), await cache.aget("c")
+
+    assert asyncio.run(run()) == (None, "A", "C")
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_eviction_by_size():
+    cache = ResponseCache(max_entries=100, max_bytes=30, db_path=None, enabled=True)
+
+    async def run():
+        await cache.aset("a", "x" * 20)
+        await cache.aset("b", "y" * 20)
+        return await cache.aget("a"), await cache.aget("b")
+
+    assert asyncio.run(run()) == (None, "y" * 20)
+
+
+def test_ttl_expiry():
+    cache = ResponseCache(ttl_seconds=0.05, db_path=None, enabled=True)
+
+    async def run():
+        await cache.aset("a", "A")
+        fresh = await cache.aget("a")
+        await asyncio.sleep(0.06)
+        return fresh, await cache.aget("a")
+
+    assert asyncio.run(run()) == ("A", None)
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite")
+    first = ResponseCache(db_path=db_path, enabled=True)
+    asyncio.run(first.aset("a", {"analysis": "12x16 deck"}))
+
+    restarted = ResponseCache(db_path=db_path, enabled=True)
+    assert asyncio.run(restarted.aget("a")) == {"analysis": "12x16 deck"}
+    assert restarted.get_stats()["disk_hits"] == 1
+
+
+def test_disk_tier_is_size_bounded(tmp_path):
+    cache = ResponseCache(db_path=str(tmp_path / "cache.sqlite"), max_disk_entries=2, enabled=True)
+
+    async def run():
+        for key in ("a", "b", "c"):
+            await cache.aset(key, key.upper())
+            await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    count = cache._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+    assert count == 2
+
+
+def test_async_access_runs_sqlite_off_the_event_loop(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(db_path=db_path, enabled=True)
+    threads = []
+    for name in ("_read_disk", "_write_disk"):
+        method = getattr(cache, name)
+        monkeypatch.setattr(cache, name, lambda *args, method=method: threads.append(
+            threading.current_thread()) or method(*args))
+
+    async def run():
+        await cache.aset("a", {"analysis": "12x16 deck"})
+        memory_hit = await cache.aget("a")
+        cache.clear()
+        await cache.aset("b", "B")
+        cache._entries.clear()
+        return memory_hit, await cache.aget("b"), await cache.aget("c")
+
+    memory_hit, disk_hit, miss = asyncio.run(run())
+
+    assert (memory_hit, disk_hit, miss) == ({"analysis": "12x16 deck"}, "B", None)
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 1)
+    # Both writes and both disk lookups went to worker threads
+    assert len(threads) == 4
+    assert not any(thread is threading.main_thread() for thread in threads)
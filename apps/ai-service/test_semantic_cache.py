@@ -0,0 +1,169 @@
+"""
+Tests for the semantic answer cache, using the vector DB stand-ins of
+test_vector_db_service.
+"""
+
+import asyncio
+import threading
+
+import httpx
+
+from ai_service import main
+from test_vector_db_service import _service
+
+QUESTION = "How far apart should deck joists be"
+
+
+def test_similar_questions_hit_and_dissimilar_ones_miss(monkeypatch, tmp_path):
+    service = _service(monkeypatch, tmp_path)
+
+    async def run():
+        await service.store_semantic_cache(QUESTION, "16 inches on center", "neural-chat", "s1")
+        hit = await service.lookup_semantic_cache("  how far apart should DECK joists be ", "neural-chat", "s1")
+        miss = await service.lookup_semantic_cache("Which stain suits cedar railings", "neural-chat", "s1")
+        return hit, miss
+
+    hit, miss = asyncio.run(run())
+
+    assert hit["answer"] == "16 inches on center"
+    assert hit["similarity_score"] >= service.semantic_cache_threshold
+    assert miss is None
+    stats = asyncio.run(service.get_semantic_cache_stats())
+    assert (stats["hits"], stats["misses"], stats["stores"], stats["entries"]) == (1, 1, 1, 1)
+
+
+def test_entries_are_scoped_by_model_and_options(monkeypatch, tmp_path):
+    service = _service(monkeypatch, tmp_path)
+
+    async def run():
+        await service.store_semantic_cache(QUESTION, "16 inches on center", "neural-chat", "s1")
+        return [
+            await service.lookup_semantic_cache(QUESTION, "phi3:mini", "s1"),
+            await service.lookup_semantic_cache(QUESTION, "neural-chat", "s2"),
+            await service.lookup_semantic_cache(QUESTION, "neural-chat", "s1"),
+        ]
+
+    other_model, other_scope, same = asyncio.run(run())
+
+    assert other_model is None and other_scope is None
+    assert same["answer"] == "16 inches on center"
+
+
+def test_knowledge_changes_invalidate_cached_answers(monkeypatch, tmp_path):
+    service = _service(monkeypatch, tmp_path)
+
+    async def run():
+        await service.store_semantic_cache(QUESTION, "12 inches on center", "neural-chat")
+        await service.add_deck_knowledge("Joists are 16 inches on center for composite decking.", {})
+        return await service.lookup_semantic_cache(QUESTION, "neural-chat")
+
+    assert asyncio.run(run()) is None
+    stats = asyncio.run(service.get_semantic_cache_stats())
+    assert (stats["invalidations"], stats["entries"]) == (1, 0)
+
+
+def test_invalidation_queries_chroma_on_the_executor(monkeypatch, tmp_path):
+    service = _service(monkeypatch, tmp_path)
+    threads = []
+    get = service.semantic_cache_collection.get
+    monkeypatch.setattr(service.semantic_cache_collection, "get", lambda **kwargs: threads.append(
+        threading.current_thread().name) or get(**kwargs))
+
+    async def run():
+        await service.store_semantic_cache(QUESTION, "16 inches on center", "neural-chat")
+        await service.invalidate_semantic_cache()
+        return await service.lookup_semantic_cache(QUESTION, "neural-chat")
+
+    assert asyncio.run(run()) is None
+    assert threads and all(name.startswith("vector-db") for name in threads)
+
+
+def test_replacing_a_document_invalidates_cached_answers(monkeypatch, tmp_path):
+    service = _service(monkeypatch, tmp_path)
+    old = [{"content": "Joists are 12 inches on center.", "metadata": {}}]
+    new = [{"content": "Joists are 16 inches on center.", "metadata": {}}]
+
+    async def run():
+        await service.initialize_default_knowledge(old)
+        await service.store_semantic_cache(QUESTION, "12 inches on center", "neural-chat")
+        await service.initialize_default_knowledge(new)
+        return await service.lookup_semantic_cache(QUESTION, "neural-chat")
+
+    assert asyncio.run(run()) is None
+    assert service.deck_knowledge_collection.count() == 1
+
+
+def test_enhanced_chat_never_shares_answers_across_users(monkeypatch, tmp_path):
+    service = _service(monkeypatch, tmp_path)
+    monkeypatch.setattr(main, "get_vector_db_service", lambda: service)
+    calls = []
+
+    async def best_model(task_type):
+        return "neural-chat"
+
+    async def chat(messages, task_type, options, **kwargs):
+        calls.append(messages)
+        return f"answer {len(calls)}", "neural-chat"
+
+    async def context(query, user_id):
+        return {"enhanced_context": f"history of {user_id}"}
+
+    monkeypatch.setattr(main, "get_best_model_for_task", best_model)
+    monkeypatch.setattr(main, "enhanced_chat_with_model", chat)
+    monkeypatch.setattr(main, "enhance_query_with_context", context)
+
+    async def ask(**fields):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/enhanced-chat", json={
+                "messages": [{"role": "user", "content": QUESTION}], **fields
+            })
+            return response.json()
+
+    async def run():
+        return [
+            await ask(user_id="u1"),
+            await ask(user_id="u2"),
+            await ask(),
+            await ask(),
+            await ask(context={"temperature": 0.0}),
+        ]
+
+    u1, u2, anonymous, repeated, other_options = asyncio.run(run())
+
+    assert (u1["response"], u2["response"]) == ("answer 1", "answer 2")
+    assert not u2["semantic_cache_hit"]
+    assert anonymous["response"] == "answer 3"
+    assert repeated == {**anonymous, "semantic_cache_hit": True, "enhanced_context": None,
+                        "tokens_dropped": 0}
+    assert (other_options["response"], other_options["semantic_cache_hit"]) == ("answer 4", False)
+    assert asyncio.run(service.get_semantic_cache_stats())["stores"] == 2
+
+
+def test_deck_design_answers_are_cached_under_the_model_that_answered(monkeypatch, tmp_path):
+    service = _service(monkeypatch, tmp_path)
+    monkeypatch.setattr(main, "get_vector_db_service", lambda: service)
+
+    async def best_model(task_type):
+        return "phi3:mini"
+
+    async def process(query, context, use_cache=None):
+        # The primary failed and the fallback answered
+        return "16 inches on center", "neural-chat"
+
+    monkeypatch.setattr(main, "get_best_model_for_task", best_model)
+    monkeypatch.setattr(main, "process_deck_design_query_with_model", process)
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/deck-design-query", data={"query": QUESTION})
+        scope = main._semantic_cache_scope("reasoning", None)
+        return (response.json(), await service.lookup_semantic_cache(QUESTION, "phi3:mini", scope),
+                await service.lookup_semantic_cache(QUESTION, "neural-chat", scope))
+
+    body, primary, fallback = asyncio.run(run())
+
+    assert body == {"response": "16 inches on center", "model_used": "neural-chat", "semantic_cache_hit": False}
+    assert primary is None
+    assert fallback["answer"] == "16 inches on center"
@@ -0,0 +1,179 @@
+"""
+Tests for server-side conversation sessions.
+"""
+
+import asyncio
+import json
+import threading
+import time
+
+import httpx
+import pytest
+
+from ai_service import core
+from ai_service.sessions import SessionStore, render_transcript
+
+
+def test_add_turn_keeps_history_and_context():
+    store = SessionStore(db_path=None, max_turns=4)
+    session = asyncio.run(store.create("reasoning", user_id="u1", system="You are DeckChatbot"))
+
+    for i in range(3):
+        asyncio.run(store.add_turn(session, f"q{i}", f"a{i}", "neural-chat", [1, 2, 3 + i]))
+
+    assert asyncio.run(store.get(session.id)) is session
+    assert [message["content"] for message in session.messages] == ["q1", "a1", "q2", "a2"]
+    assert list(session.context) == [1, 2, 5]
+    assert session.context.itemsize == 4
+    assert session.to_dict()["context_tokens"] == 3
+
+    # A reply without a context clears the stale one
+    asyncio.run(store.add_turn(session, "q3", "a3", "neural-chat", None))
+    assert session.to_dict()["context_tokens"] == 0
+    assert session.context_model is None
+
+
+def test_sessions_persist_to_sqlite(tmp_path):
+    db_path = str(tmp_path / "sessions.db")
+    store = SessionStore(db_path=db_path)
+    session = asyncio.run(store.create(system="You are DeckChatbot"))
+    asyncio.run(store.add_turn(session, "How far apart are joists?", "16 inches on center.", "neural-chat",
+                               [7, -8, 2 ** 30]))
+
+    restored = asyncio.run(SessionStore(db_path=db_path).get(session.id))
+
+    assert restored.system == "You are DeckChatbot"
+    assert restored.messages == session.messages
+    assert list(restored.context) == [7, -8, 2 ** 30]
+    assert restored.context_model == "neural-chat"
+    assert asyncio.run(SessionStore(db_path=db_path).delete(session.id))
+    assert asyncio.run(SessionStore(db_path=db_path).get(session.id)) is None
+
+
+def test_memory_cap_reloads_from_disk(tmp_path):
+    store = SessionStore(db_path=str(tmp_path / "sessions.db"), max_sessions=2)
+    sessions = [asyncio.run(store.create()) for _ in range(3)]
+
+    assert store.get_stats()["active"] == 2
+    assert asyncio.run(store.get(sessions[0].id)).id == sessions[0].id
+    assert store.get_stats()["loaded_from_disk"] == 1
+
+
+def test_idle_sessions_are_evicted(tmp_path):
+    store = SessionStore(db_path=str(tmp_path / "sessions.db"), idle_ttl=60)
+    idle, active = asyncio.run(store.create()), asyncio.run(store.create())
+    idle.last_active = time.time() - 120
+    asyncio.run(store._save(idle))
+
+    assert asyncio.run(store.evict_idle()) == 1
+    assert asyncio.run(store.get(idle.id)) is None
+    assert asyncio.run(store.get(active.id)) is active
+
+
+def test_sqlite_runs_off_the_event_loop_in_order(tmp_path, monkeypatch):
+    store = SessionStore(db_path=str(tmp_path / "sessions.db"))
+    threads = []
+    execute = store._execute
+    monkeypatch.setattr(store, "_execute", lambda sql, params: threads.append(
+        threading.current_thread().name) or execute(sql, params))
+
+    async def run():
+        session = await store.create()
+        # Saves issued back to back are written in order; the last one wins
+        await asyncio.gather(*(store.add_turn(session, f"q{i}", f"a{i}") for i in range(5)))
+        return session
+
+    session = asyncio.run(run())
+
+    assert len(threads) == 6
+    assert all(name.startswith("sessions-db") for name in threads)
+    store._sessions.clear()
+    assert asyncio.run(store.get(session.id)).messages == session.messages
+
+
+def test_render_transcript():
+    assert render_transcript([{"role": "user", "content": "hi"}]) == "hi"
+    assert render_transcript([
+        {"role": "user", "content": "q1"}, {"role": "assistant", "content": "a1"}, {"role": "user", "content": "q2"},
+    ]) == "Conversation so far:\nUser: q1\nAssistant: a1\n\nq2"
+
+
+def _generate_transport(requests):
+    """Mock Ollama /api/generate that records requests and returns a growing context."""
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        requests.append(payload)
+        context = list(payload.get("context") or []) + [len(requests)] * 10
+        lines = [
+            {"response": f"reply {len(requests)}", "done": False},
+            {"response": "", "done": True, "context": context, "prompt_eval_count": 10},
+        ]
+        return httpx.Response(200, content="".join(json.dumps(line) + "\n" for line in lines))
+
+    return httpx.MockTransport(handler)
+
+
+@pytest.fixture
+def isolated_core(monkeypatch):
+    store = SessionStore(db_path=None)
+    model = {"name": "neural-chat"}
+
+    async def best_model(task_type):
+        return model["name"]
+
+    monkeypatch.setattr(core, "session_store", store)
+    monkeypatch.setattr(core, "get_best_model_for_task", best_model)
+    monkeypatch.setattr(core.model_scheduler, "enabled", False)
+    return store, model
+
+
+async def _turn(session, content, client):
+    events = [event async for event in core.stream_session_reply(session, content, client)]
+    return events[0], "".join(event["content"] for event in events if event["type"] == "delta"), events[-1]
+
+
+def test_follow_up_turns_continue_from_ollama_context(isolated_core):
+    store, _ = isolated_core
+    session = asyncio.run(store.create(system="You are DeckChatbot"))
+    requests = []
+
+    async def run():
+        async with httpx.AsyncClient(transport=_generate_transport(requests)) as client:
+            first = await _turn(session, "How far apart are joists?", client)
+            second = await _turn(session, "And for composite decking?", client)
+            return first, second
+
+    (start, reply, done), (second_start, _, _) = asyncio.run(run())
+
+    assert reply == "reply 1"
+    assert start["context_reused"] is False
+    assert "context" not in done
+    assert requests[0]["system"] == "You are DeckChatbot"
+    assert requests[0]["prompt"] == "How far apart are joists?"
+    # The follow-up sends only the new turn plus the context from the first reply
+    assert second_start["context_reused"] is True
+    assert requests[1]["prompt"] == "And for composite decking?"
+    assert requests[1]["context"] == [1] * 10
+    assert "system" not in requests[1]
+    assert len(session.messages) == 4
+    assert list(session.context) == [1] * 10 + [2] * 10
+
+
+def test_model_change_resends_the_history(isolated_core):
+    store, model = isolated_core
+    session = asyncio.run(store.create())
+    asyncio.run(store.add_turn(session, "q1", "a1", "neural-chat", [1, 2, 3]))
+    model["name"] = "llama3.1:8b"
+    requests = []
+
+    async def run():
+        async with httpx.AsyncClient(transport=_generate_transport(requests)) as client:
+            return await _turn(session, "q2", client)
+
+    start, _, _ = asyncio.run(run())
+
+    assert start["context_reused"] is False
+    assert "context" not in requests[0]
+    assert requests[0]["prompt"] == "Conversation so far:\nUser: q1\nAssistant: a1\n\nq2"
+    assert session.context_model == "llama3.1:8b"
@@ -0,0 +1,83 @@
+"""
+Tests for single-flight request coalescing.
+"""
+
+import asyncio
+
+import pytest
+
+from ai_service.single_flight import SingleFlight, make_flight_key
+
+
+def test_flight_key_distinguishes_content():
+    assert make_flight_key("ocr", b"image-a") == make_flight_key("ocr", b"image-a")
+    assert make_flight_key("ocr", b"image-a") != make_flight_key("ocr", b"image-b")
+    assert make_flight_key("m", {"a": 1, "b": 2}) == make_flight_key("m", {"b": 2, "a": 1})
+
+
+def test_concurrent_identical_calls_share_one_upstream_call():
+    flights = SingleFlight()
+    calls = {"count": 0}
+
+    async def work():
+        calls["count"] += 1
+        await asyncio.sleep(0.05)
+        return "analysis"
+
+    async def run():
+        return await asyncio.gather(*(flights.do("same", work) for _ in range(10)))
+
+    results = asyncio.run(run())
+    assert results == ["analysis"] * 10
+    assert calls["count"] == 1
+    assert flights.get_stats()["coalesced"] == 9
+    assert flights.get_stats()["in_flight"] == 0
+
+
+def test_sequential_calls_are_not_coalesced():
+    flights = SingleFlight()
+    calls = {"count": 0}
+
+    async def work():
+        calls["count"] += 1
+        return calls["count"]
+
+    async def run():
+        first = await flights.do("same", work)
+        second = await flights.do("same", work)
+        return first, second
+
+    assert asyncio.run(run()) == (1, 2)
+
+
+def test_errors_propagate_to_every_waiter():
+    flights = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("ollama down")
+
+    async def run():
+        return await asyncio.gather(*(flights.do("same", work) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_cancelled_waiter_does_not_cancel_shared_work():
+    flights = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def run():
+        first = asyncio.ensure_future(flights.do("same", work))
+        second = asyncio.ensure_future(flights.do("same", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == "done"
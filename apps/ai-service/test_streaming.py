@@ -0,0 +1,138 @@
+"""
+Tests for the Server-Sent Events chat endpoints, run against the stub Ollama
+server of the benchmarks.
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from ai_service import core, main
+from ai_service.admission import ModelAdmissionController
+from ai_service.circuit_breaker import ModelCircuitBreakers
+from benchmarks.stub_ollama import _reply_text, create_app
+
+MESSAGES = [{"role": "user", "content": "How far apart should joists be?"}]
+
+
+def _events(body):
+    """Parse an SSE body into (event, data) pairs, checking the framing of each event."""
+    assert body.endswith("\n\n")
+    events = []
+    for frame in body[:-2].split("\n\n"):
+        event_line, data_line = frame.split("\n")
+        assert event_line.startswith("event: ") and data_line.startswith("data: ")
+        events.append((event_line[len("event: "):], json.loads(data_line[len("data: "):])))
+    return events
+
+
+@pytest.fixture
+def ollama(monkeypatch):
+    """Point the shared Ollama client at a transport; returns a setter taking the transport."""
+    monkeypatch.setattr(core, "circuit_breakers", ModelCircuitBreakers())
+    monkeypatch.setattr(core, "admission_controller", ModelAdmissionController())
+
+    def use(transport):
+        monkeypatch.setattr(core, "_http_client", httpx.AsyncClient(transport=transport))
+
+    use(httpx.ASGITransport(app=create_app(reply_tokens=5)))
+    return use
+
+
+def _post(path, payload):
+    async def post():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+            return await client.post(path, json=payload)
+    return asyncio.run(post())
+
+
+def test_bot_query_stream_sends_tokens_in_order_then_done(ollama):
+    response = _post("/bot-query/stream", {"messages": MESSAGES})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _events(response.text)
+    assert [name for name, _ in events] == ["delta"] * 5 + ["done"]
+    assert "".join(data["content"] for _, data in events[:-1]) == _reply_text(5)
+    done = events[-1][1]
+    assert done["model"] == core.OLLAMA_MODEL_NAME
+    assert done["eval_count"] == 5
+    assert {"total_duration", "prompt_eval_count", "eval_duration"} <= set(done)
+
+
+def test_enhanced_chat_stream_starts_with_the_selected_model(ollama, monkeypatch):
+    async def best_model(task_type):
+        return "neural-chat"
+
+    monkeypatch.setattr(core, "get_best_model_for_task", best_model)
+    monkeypatch.setattr(main, "get_best_model_for_task", best_model)
+
+    events = _events(_post("/enhanced-chat/stream", {"messages": MESSAGES}).text)
+
+    assert events[0] == ("start", {"model": "neural-chat", "enhanced_context": None, "tokens_dropped": 0})
+    assert [name for name, _ in events[1:]] == ["delta"] * 5 + ["done"]
+    assert events[-1][1]["model"] == "neural-chat"
+
+
+def _saturated(**limits):
+    """Admission controller whose only slot for the default model is already taken."""
+    controller = ModelAdmissionController(max_in_flight=1, **limits)
+    asyncio.run(controller.acquire(core.OLLAMA_MODEL_NAME))
+    return controller
+
+
+def test_admission_rejections_are_returned_before_the_stream_starts(ollama, monkeypatch):
+    monkeypatch.setattr(core, "admission_controller", _saturated(max_queue_depth=0))
+    full = _post("/bot-query/stream", {"messages": MESSAGES})
+
+    monkeypatch.setattr(core, "admission_controller", _saturated(max_queue_depth=1, queue_timeout=0.01))
+    timed_out = _post("/bot-query/stream", {"messages": MESSAGES})
+
+    assert (full.status_code, timed_out.status_code) == (429, 503)
+    for response in (full, timed_out):
+        assert response.headers["content-type"] == "application/json"
+        assert int(response.headers["retry-after"]) >= 1
+
+
+def test_upstream_error_after_the_first_token_ends_the_stream_with_an_error_event(ollama):
+    lines = [
+        {"message": {"role": "assistant", "content": "Joists "}, "done": False},
+        {"message": {"role": "assistant", "content": "are"}, "done": False},
+        {"error": "model runner has unexpectedly stopped"},
+    ]
+    ollama(httpx.MockTransport(lambda request: httpx.Response(
+        200, content="".join(json.dumps(line) + "\n" for line in lines)
+    )))
+
+    response = _post("/bot-query/stream", {"messages": MESSAGES})
+
+    assert response.status_code == 200
+    events = _events(response.text)
+    assert events[:2] == [("delta", {"content": "Joists "}), ("delta", {"content": "are"})]
+    assert events[2][0] == "error"
+    assert "unexpectedly stopped" in events[2][1]["detail"]
+    assert len(events) == 3
+
+
+def test_a_client_disconnect_closes_the_upstream_stream():
+    closed = []
+
+    async def events():
+        try:
+            yield {"type": "start", "model": "neural-chat"}
+            for i in range(100):
+                yield {"type": "delta", "content": f"token {i} "}
+        finally:
+            closed.append(True)
+
+    async def disconnect_after_two_events():
+        body = (await main._sse_response(events())).body_iterator
+        await body.__anext__()
+        await body.__anext__()
+        await body.aclose()
+        # Closed right away, not when the generator is garbage collected
+        return list(closed)
+
+    assert asyncio.run(disconnect_after_two_events()) == [True]
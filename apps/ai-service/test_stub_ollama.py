@@ -0,0 +1,95 @@
+"""
+Tests for the stub Ollama / Hugging Face server used by the benchmarks.
+"""
+
+import asyncio
+import base64
+import json
+import time
+
+import httpx
+
+from benchmarks.load_test import build_scenarios, percentile
+from benchmarks.stub_ollama import create_app
+
+
+def _run(app, requests):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://stub") as client:
+            return [await request(client) for request in requests]
+    return asyncio.run(run())
+
+
+def test_non_streaming_and_streaming_replies_match():
+    chat = {"model": "neural-chat", "messages": [{"role": "user", "content": "hi"}]}
+
+    streamed, single = _run(create_app(reply_tokens=5), [
+        lambda client: client.post("/api/chat", json=chat),
+        lambda client: client.post("/api/chat", json={**chat, "stream": False}),
+    ])
+
+    chunks = [json.loads(line) for line in streamed.text.splitlines()]
+    assert "".join(chunk["message"]["content"] for chunk in chunks) == single.json()["message"]["content"]
+    assert single.json()["done"] and single.json()["eval_count"] == 5
+
+
+def test_load_delay_is_paid_once_per_resident_model():
+    app = create_app(load_delay=0.05, max_loaded_models=1)
+    generate = {"prompt": "hi", "stream": False}
+
+    started = time.monotonic()
+    first, second, other, again = _run(app, [
+        lambda client: client.post("/api/generate", json={"model": "neural-chat", **generate}),
+        lambda client: client.post("/api/generate", json={"model": "neural-chat", **generate}),
+        lambda client: client.post("/api/generate", json={"model": "phi3:mini", **generate}),
+        lambda client: client.post("/api/generate", json={"model": "neural-chat", **generate}),
+    ])
+
+    assert time.monotonic() - started >= 0.15
+    assert [r.json()["load_duration"] for r in (first, second, other, again)] == [5e7, 0, 5e7, 5e7]
+
+
+def test_error_injection_is_reproducible():
+    chat = {"model": "neural-chat", "messages": [], "stream": False}
+
+    def statuses():
+        return [r.status_code for r in _run(create_app(error_rate=0.5, seed=1),
+                                            [lambda client: client.post("/api/chat", json=chat)] * 20)]
+
+    first = statuses()
+    assert first == statuses()
+    assert set(first) == {200, 500}
+
+
+def test_difix_endpoints_echo_the_image():
+    image = b"\x89PNG fake image"
+
+    raw, inference, space = _run(create_app(), [
+        lambda client: client.post("/models/NVIDIA/difix", content=image),
+        lambda client: client.post("/models/nvidia/difix", json={"inputs": base64.b64encode(image).decode()}),
+        lambda client: client.post("/api/predict", files={"data": ("image.png", image, "image/png")}),
+    ])
+
+    assert raw.content == inference.content == image
+    assert inference.headers["content-type"] == "image/png"
+    assert space.json()["data"][0] == "data:image/png;base64," + base64.b64encode(image).decode()
+
+
+def test_percentile_uses_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([3.0], 95) == 3.0
+    assert percentile([], 50) is None
+
+
+def test_load_test_covers_every_endpoint():
+    from fastapi.routing import APIRoute
+
+    from ai_service.main import app
+
+    routes = {f"{method} {route.path}".replace("{session_id}", "{id}")
+              for route in app.routes if isinstance(route, APIRoute) for method in route.methods}
+
+    assert routes <= set(build_scenarios(repeat_prompts=False))
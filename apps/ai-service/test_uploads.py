@@ -0,0 +1,104 @@
+"""
+Tests for the binary upload variants of the image and audio endpoints.
+"""
+
+import asyncio
+import base64
+import json
+
+import httpx
+
+from ai_service import main
+
+PNG = b"\x89PNG\r\n\x1a\n fake image"
+
+
+def _post(path, **kwargs):
+    async def post():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+            return await client.post(path, **kwargs)
+    return asyncio.run(post())
+
+
+def test_raw_and_multipart_uploads_return_binary_images(monkeypatch):
+    received = []
+
+    async def enhance(image_bytes, quality_level):
+        received.append((image_bytes, quality_level))
+        return image_bytes
+
+    monkeypatch.setattr(main, "enhance_deck_3d_preview", enhance)
+
+    raw = _post("/difix-enhance/upload?quality_level=fast", content=PNG,
+                headers={"Content-Type": "application/octet-stream"})
+    multipart = _post("/difix-enhance/upload", files={"file": ("deck.png", PNG, "image/png")},
+                      data={"quality_level": "medium", "enhancement_type": "upscale"})
+
+    assert raw.status_code == multipart.status_code == 200
+    assert raw.content == multipart.content == PNG
+    assert raw.headers["content-type"] == "image/png"
+    assert multipart.headers["x-enhancement-type"] == "upscale"
+    assert float(raw.headers["x-processing-time"]) >= 0
+    assert received == [(PNG, "fast"), (PNG, "medium")]
+
+
+def test_json_response_format_matches_base64_endpoint(monkeypatch):
+    async def enhance(image_bytes, token):
+        return image_bytes
+
+    monkeypatch.setattr(main, "enhance_image_with_difix", enhance)
+
+    upload = _post("/enhance-image/upload?response_format=json", content=PNG)
+    legacy = _post("/enhance-image", json={"imageBase64": base64.b64encode(PNG).decode()})
+
+    assert upload.json() == legacy.json() == {"enhanced_image_base64": base64.b64encode(PNG).decode()}
+    assert _post("/enhance-image/upload?response_format=xml", content=PNG).status_code == 400
+
+
+def test_image_analysis_receives_raw_bytes(monkeypatch):
+    calls = []
+
+    async def analyze(prompt, image):
+        calls.append((prompt, image))
+        return "A 12ft x 16ft deck"
+
+    monkeypatch.setattr(main, "AI_PROVIDER", "ollama")
+    monkeypatch.setattr(main, "analyze_image_with_ollama", analyze)
+
+    response = _post("/analyze-image/upload", params={"prompt": "Measure it"}, content=PNG)
+
+    assert response.json() == {"result": "A 12ft x 16ft deck"}
+    assert calls == [("Measure it", PNG)]
+
+
+def test_voice_upload_parses_context(monkeypatch):
+    async def process(audio_bytes, context):
+        return {"original_text": f"{len(audio_bytes)} bytes", "command_type": "dimension_change",
+                "confidence": 0.9, "processed_command": context}
+
+    monkeypatch.setattr(main, "process_voice_interaction", process)
+
+    response = _post("/transcribe-voice/upload", files={"file": ("note.wav", b"RIFF0000WAVE", "audio/wav")},
+                     data={"context": json.dumps({"deck_id": 7})})
+    invalid = _post("/transcribe-voice/upload?context=not-json", content=b"RIFF0000WAVE")
+
+    assert response.json()["transcribed_text"] == "12 bytes"
+    assert response.json()["processed_command"] == {"deck_id": 7}
+    assert invalid.status_code == 400
+
+
+def test_oversized_and_empty_uploads_are_rejected(monkeypatch):
+    monkeypatch.setattr(main, "UPLOAD_MAX_BYTES", 8)
+    monkeypatch.setattr(main, "UPLOAD_SPOOL_MAX_MEMORY", 4)
+
+    async def chunks():
+        for _ in range(4):
+            yield b"abc"
+
+    assert _post("/enhance-image/upload", content=b"x" * 9).status_code == 413
+    # Without a Content-Length, the limit is enforced while streaming
+    assert _post("/enhance-image/upload", content=chunks()).status_code == 413
+    assert _post("/enhance-image/upload", content=b"").status_code == 400
+
+    monkeypatch.setattr(main, "UPLOAD_MAX_BYTES", 1024)
+    assert _post("/enhance-image/upload", files={"other": ("a.png", b"x", "image/png")}).status_code == 400
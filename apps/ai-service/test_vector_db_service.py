@@ -0,0 +1,336 @@
+"""
+Tests for VectorDBService retrieval, using in-process stand-ins for the
+SentenceTransformer model and the Chroma collections.
+"""
+
+import asyncio
+import statistics
+import threading
+import time
+
+import httpx
+import numpy as np
+
+from ai_service import main
+from ai_service import vector_db_service as vdb
+from ai_service.embedding_cache import EmbeddingCache, _DiskTier
+
+
+class FakeModel:
+    """Deterministic bag-of-words embedder that counts encoded texts."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.encoded = []
+        self.calls = 0
+
+    def encode(self, texts, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        time.sleep(self.delay)
+        self.calls += 1
+        self.encoded.extend(texts)
+        vectors = np.zeros((len(texts), 16), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, sum(word.encode()) % 16] += 1.0
+        return vectors[0] if single else vectors
+
+
+def _matches(metadata, where):
+    """Evaluate the subset of Chroma's where filter the service uses: equality, $ne and $and."""
+    if not where:
+        return True
+    if "$and" in where:
+        return all(_matches(metadata, clause) for clause in where["$and"])
+    for key, value in where.items():
+        if isinstance(value, dict):
+            if metadata.get(key) == value["$ne"]:
+                return False
+        elif metadata.get(key) != value:
+            return False
+    return True
+
+
+class FakeCollection:
+    """Chroma collection stand-in that sleeps like a blocking query and records calls."""
+
+    def __init__(self, delay: float = 0.0, cosine: bool = False):
+        self.delay = delay
+        self.cosine = cosine  # Report cosine distances instead of a fixed 0.25
+        self.documents = {}
+        self.embeddings = {}
+        self.queries = []
+
+    def add(self, embeddings, documents, metadatas, ids):
+        for doc_id, embedding, document, metadata in zip(ids, embeddings, documents, metadatas):
+            self.documents[doc_id] = (document, metadata)
+            self.embeddings[doc_id] = np.asarray(embedding, dtype=np.float32)
+
+    upsert = add
+
+    def count(self):
+        return len(self.documents)
+
+    def get(self, ids=None, where=None, where_document=None, include=()):
+        matches = [doc_id for doc_id, (document, metadata) in self.documents.items()
+                   if (ids is None or doc_id in ids)
+                   and _matches(metadata, where)
+                   and (not where_document or where_document["$contains"] in document)]
+        return {"ids": matches, "documents": [self.documents[doc_id][0] for doc_id in matches]}
+
+    def delete(self, ids):
+        for doc_id in ids:
+            self.documents.pop(doc_id, None)
+            self.embeddings.pop(doc_id, None)
+
+    def query(self, query_embeddings, n_results, include, where=None):
+        time.sleep(self.delay)
+        self.queries.append((query_embeddings[0], n_results, where))
+        hits = [(self._distance(query_embeddings[0], doc_id), doc, meta)
+                for doc_id, (doc, meta) in self.documents.items() if _matches(meta, where)]
+        if self.cosine:
+            hits.sort(key=lambda hit: hit[0])
+        hits = hits[:n_results]
+        return {
+            "documents": [[doc for _, doc, _ in hits]],
+            "metadatas": [[meta for _, _, meta in hits]],
+            "distances": [[distance for distance, _, _ in hits]],
+        }
+
+    def _distance(self, query_embedding, doc_id):
+        if not self.cosine:
+            return 0.25
+        a, b = np.asarray(query_embedding, dtype=np.float32), self.embeddings[doc_id]
+        return float(1 - a @ b / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def _service(monkeypatch, tmp_path, model=None, delay=0.0):
+    # Build in stub mode, then attach the stand-ins
+    monkeypatch.setattr(vdb, "CHROMADB_AVAILABLE", False)
+    service = vdb.VectorDBService(persist_directory=str(tmp_path))
+    service.is_available = True
+    service.embedding_model = model or FakeModel()
+    service.deck_knowledge_collection = FakeCollection(delay)
+    service.conversation_history_collection = FakeCollection(delay)
+    service.blueprint_analysis_collection = FakeCollection(delay)
+    service.semantic_cache_collection = FakeCollection(cosine=True)
+    return service
+
+
+def test_enhance_query_embeds_once_and_queries_concurrently(monkeypatch, tmp_path):
+    service = _service(monkeypatch, tmp_path, delay=0.05)
+    monkeypatch.setattr(vdb, "get_vector_db_service", lambda: service)
+    service.deck_knowledge_collection.add([[0.0]], ["Joists are 16 inches on center"], [{"topic": "joists"}], ["k1"])
+    service.conversation_history_collection.add([[0.0]], ["User: hi"], [{"user_id": "u1"}], ["c1"])
+
+    started = time.perf_counter()
+    context = asyncio.run(vdb.enhance_query_with_context("How far apart are joists?", user_id="u1"))
+    elapsed = time.perf_counter() - started
+
+    assert service.embedding_model.encoded == ["How far apart are joists?"]
+    embeddings = [collection.queries[0][0] for collection in (
+        service.deck_knowledge_collection, service.conversation_history_collection,
+        service.blueprint_analysis_collection)]
+    assert embeddings[0] == embeddings[1] == embeddings[2]
+    # Three 50 ms queries ran side by side rather than one after another
+    assert elapsed < 0.14
+    assert set(context["timings"]) == {"embed", "deck_knowledge", "conversation_context", "similar_blueprints",
+                                       "total"}
+    assert context["timings"]["deck_knowledge"] >= 50
+    assert context["relevant_knowledge"][0]["similarity_score"] == 0.75
+    assert context["conversation_context"][0]["content"] == "User: hi"
+    assert "Joists are 16 inches on center" in context["enhanced_context"]
+
+
+def test_conversation_context_is_filtered_by_user(monkeypatch, tmp_path):
+    service = _service(monkeypatch, tmp_path)
+    for i, user_id in enumerate(["u1", "u2", "u1", "u1"]):
+        service.conversation_history_collection.add([[0.0]], [f"turn {i}"], [{"user_id": user_id}], [f"c{i}"])
+
+    results = asyncio.run(service.get_conversation_context("u1", "deck", n_results=2))
+
+    assert [result["content"] for result in results] == ["turn 0", "turn 2"]
+    assert service.conversation_history_collection.queries[0][1:] == (4, {"user_id": "u1"})
+
+
+def test_concurrent_writes_share_one_batched_encode(monkeypatch, tmp_path):
+    service = _service(monkeypatch, tmp_path)
+
+    async def store():
+        return await asyncio.gather(*(
+            service.store_conversation_context(f"u{i}", {"user_message": f"question {i}", "assistant_response": "ok"})
+            for i in range(6)
+        ))
+
+    asyncio.run(store())
+
+    assert service.embedding_model.calls == 1
+    assert service.conversation_history_collection.count() == 6
+    assert service.get_embedding_stats()["batching"]["batch_size"]["buckets"]["8"] == 1
+
+
+def test_repeated_texts_are_served_from_the_embedding_cache(monkeypatch, tmp_path):
+    service = _service(monkeypatch, tmp_path)
+
+    async def search_twice():
+        await service.search_deck_knowledge("How far apart are joists?")
+        await service.search_deck_knowledge("How far apart  are joists? ")
+
+    asyncio.run(search_twice())
+
+    assert service.embedding_model.calls == 1
+    assert service.get_embedding_stats()["cache"]["hits"] == 1
+
+
+def test_embedding_disk_reads_and_batched_writes_run_on_the_executor(monkeypatch, tmp_path):
+    service = _service(monkeypatch, tmp_path)
+    service.embedding_cache = EmbeddingCache(enabled=True, directory=str(tmp_path / "embeddings"))
+    readers, writers = [], []
+    get, add_many = _DiskTier.get, _DiskTier.add_many
+    monkeypatch.setattr(_DiskTier, "get", lambda tier, key: readers.append(
+        threading.current_thread().name) or get(tier, key))
+    monkeypatch.setattr(_DiskTier, "add_many", lambda tier, items: writers.append(
+        (threading.current_thread().name, len(items))) or add_many(tier, items))
+
+    async def run():
+        await service.embed("How far apart are joists?")
+        await service._embedding_flush
+        await service.embed_many(["Which stain suits cedar?", "What is a ledger board?"])
+
+    asyncio.run(run())
+
+    # One write per flush, not one per vector
+    assert [count for _, count in writers] == [1, 2]
+    assert len(readers) == 3
+    assert all(name.startswith("vector-db") for name in readers + [name for name, _ in writers])
+    restarted = EmbeddingCache(enabled=True, directory=str(tmp_path / "embeddings"))
+    assert restarted.get(service.embedding_model_name, "How far apart are joists?") is not None
+
+
+def test_shutdown_waits_off_the_loop_and_the_service_restarts(monkeypatch, tmp_path):
+    service = _service(monkeypatch, tmp_path)
+
+    async def cycle():
+        await service.search_deck_knowledge("How far apart are joists?")
+        executor = service._executor
+        await service.shutdown()
+        # The next startup gets a fresh executor instead of a dead one
+        await service.search_deck_knowledge("What is a ledger board?")
+        return executor
+
+    first = asyncio.run(cycle())
+
+    assert first._shutdown
+    assert service._executor is not first
+    assert service.embedding_model.calls == 2
+
+
+def test_health_latency_stays_flat_while_knowledge_search_is_under_load(monkeypatch, tmp_path):
+    # Every search blocks for ~40 ms of encoding and querying, as the real model and Chroma do
+    service = _service(monkeypatch, tmp_path, model=FakeModel(delay=0.02), delay=0.02)
+    monkeypatch.setattr(vdb, "get_vector_db_service", lambda: service)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+            async def health_latencies(count):
+                # A probe every 5 ms; a blocked loop shows up as a late wake-up or a slow response
+                latencies = []
+                for _ in range(count):
+                    started = time.perf_counter()
+                    await asyncio.sleep(0.005)
+                    assert (await client.get("/health")).status_code == 200
+                    latencies.append(time.perf_counter() - started - 0.005)
+                return latencies
+
+            async def search_load(stop):
+                searches = 0
+                while not stop.is_set():
+                    response = await client.post("/search-knowledge", json={"query": f"joist spacing {searches}"})
+                    assert response.status_code == 200
+                    searches += 1
+                return searches
+
+            idle = await health_latencies(20)
+            stop = asyncio.Event()
+            workers = [asyncio.create_task(search_load(stop)) for _ in range(8)]
+            loaded = await health_latencies(60)
+            stop.set()
+            searches = sum(await asyncio.gather(*workers))
+            return idle, loaded, searches
+
+    idle, loaded, searches = asyncio.run(run())
+
+    assert searches >= 8
+    # A blocked loop would delay most probes by a whole 40 ms search
+    loaded.sort()
+    assert loaded[int(len(loaded) * 0.9)] < 0.02
+    assert statistics.median(loaded) < statistics.median(idle) + 0.01
+
+
+def test_stats_count_collections_on_the_executor(monkeypatch, tmp_path):
+    service = _service(monkeypatch, tmp_path)
+    threads = []
+    for collection in (service.deck_knowledge_collection, service.conversation_history_collection,
+                       service.blueprint_analysis_collection, service.semantic_cache_collection):
+        monkeypatch.setattr(collection, "count", lambda: threads.append(threading.current_thread().name) or 0)
+
+    async def run():
+        return await service.get_collection_stats(), await service.get_semantic_cache_stats()
+
+    stats, cache_stats = asyncio.run(run())
+
+    assert (stats["deck_knowledge_count"], cache_stats["entries"]) == (0, 0)
+    assert len(threads) == 4
+    assert all(name.startswith("vector-db") for name in threads)
+
+
+def test_seeding_is_idempotent_and_skips_embedding_when_unchanged(monkeypatch, tmp_path):
+    service = _service(monkeypatch, tmp_path)
+
+    assert asyncio.run(service.initialize_default_knowledge()) is True
+    calls = service.embedding_model.calls
+    restarted = _service(monkeypatch, tmp_path)
+    restarted.deck_knowledge_collection = service.deck_knowledge_collection
+
+    assert asyncio.run(restarted.initialize_default_knowledge()) is False
+    assert restarted.embedding_model.calls == 0
+    assert calls == 1  # The whole corpus went through one batched encode
+    assert sorted(service.deck_knowledge_collection.documents) == sorted(
+        vdb.knowledge_id(item["content"]) for item in vdb.DEFAULT_KNOWLEDGE)
+    assert (tmp_path / vdb.SEED_MANIFEST_FILE).exists()
+
+
+def test_seeding_removes_legacy_duplicates_and_stale_documents(monkeypatch, tmp_path):
+    service = _service(monkeypatch, tmp_path)
+    collection = service.deck_knowledge_collection
+    # Three restarts' worth of uuid4 copies, and a document added by hand
+    for i in range(3):
+        collection.add([[0.0]], ["Joists are 16 inches on center."], [{}], [f"uuid-{i}"])
+    collection.add([[0.0]], ["Ledger boards need flashing."], [{}], ["manual"])
+    first = [{"content": "Joists are 16 inches on center.", "metadata": {"topic": "joists"}},
+             {"content": "Beams need posts.", "metadata": {"topic": "beams"}}]
+    second = [first[0], {"content": "Footings go below the frost line.", "metadata": {"topic": "footings"}}]
+
+    asyncio.run(service.initialize_default_knowledge(first))
+    assert sorted(doc for doc, _ in collection.documents.values()) == [
+        "Beams need posts.", "Joists are 16 inches on center.", "Ledger boards need flashing."]
+    version = service.knowledge_version
+
+    assert asyncio.run(service.initialize_default_knowledge(second)) is True
+    assert sorted(doc for doc, _ in collection.documents.values()) == [
+        "Footings go below the frost line.", "Joists are 16 inches on center.", "Ledger boards need flashing."]
+    # Same document count, different knowledge: the version still moves, once for the delete and once for the upsert
+    assert service.knowledge_version != version
+    assert service._read_knowledge_generation() == int(version.split("-")[1]) + 2
+    # Unchanged documents come out of the embedding cache
+    assert service.get_embedding_stats()["cache"]["hits"] == 1
+
+
+def test_seeding_repairs_a_collection_that_lost_its_documents(monkeypatch, tmp_path):
+    service = _service(monkeypatch, tmp_path)
+    asyncio.run(service.initialize_default_knowledge())
+    service.deck_knowledge_collection = FakeCollection()
+
+    assert asyncio.run(service.initialize_default_knowledge()) is True
+    assert service.deck_knowledge_collection.count() == len(vdb.DEFAULT_KNOWLEDGE)
@@ -0,0 +1,124 @@
+"""
+Tests for the vision-input preprocessing stage.
+"""
+
+import asyncio
+import base64
+import io
+import time
+
+from PIL import Image, ImageDraw
+
+from ai_service.vision_preprocessing import ProcessedImageCache, VisionPreprocessor
+
+
+def _image(size, format="JPEG", exif_orientation=None, margin=0):
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    width, height = size
+    # Content a little wider than tall, so orientation changes are visible
+    draw.rectangle((margin, margin, width - margin - 1, height - margin - 1), fill=(40, 80, 160))
+    draw.line((margin + 5, margin + 5, width - margin - 6, height - margin - 6), fill="black", width=3)
+    buffer = io.BytesIO()
+    if exif_orientation is not None:
+        exif = Image.Exif()
+        exif[0x0112] = exif_orientation
+        image.save(buffer, format=format, exif=exif)
+    else:
+        image.save(buffer, format=format)
+    return buffer.getvalue()
+
+
+def _decode(encoded):
+    return Image.open(io.BytesIO(base64.b64decode(encoded)))
+
+
+def _preprocessor(**kwargs):
+    return VisionPreprocessor(enabled=True, model_input_sizes={"llava": 672}, default_input_size=1024, **kwargs)
+
+
+def test_large_image_is_resized_to_the_model_input_size():
+    preprocessor = _preprocessor(crop_borders=False)
+    original = _image((4000, 3000))
+
+    result = _decode(asyncio.run(preprocessor.prepare(original, "llava:13b")))
+
+    assert result.format == "JPEG"
+    assert max(result.size) == 672
+    assert abs(result.size[0] / result.size[1] - 4 / 3) < 0.01
+    assert preprocessor.get_stats()["processed"] == 1
+    assert preprocessor.get_stats()["size_ratio"] < 0.5
+
+
+def test_exif_orientation_is_applied():
+    preprocessor = _preprocessor(crop_borders=False)
+    original = _image((400, 300), exif_orientation=6)
+
+    result = _decode(asyncio.run(preprocessor.prepare(original, "unknown-model")))
+
+    assert result.size == (300, 400)
+
+
+def test_uniform_borders_are_cropped():
+    preprocessor = _preprocessor()
+    original = _image((800, 600), format="PNG", margin=100)
+
+    result = _decode(asyncio.run(preprocessor.prepare(original, "llava")))
+
+    assert result.size == (600, 400)
+
+
+def test_small_image_is_passed_through_unchanged():
+    preprocessor = _preprocessor(crop_borders=False)
+    encoded = base64.b64encode(_image((320, 240))).decode()
+
+    assert asyncio.run(preprocessor.prepare(encoded, "llava")) == encoded
+    assert preprocessor.get_stats()["passed_through"] == 1
+
+
+def test_processed_images_are_cached_by_content():
+    preprocessor = _preprocessor()
+    original = _image((2000, 1500))
+
+    async def prepare_twice():
+        first = await preprocessor.prepare(original, "llava")
+        second = await preprocessor.prepare(base64.b64encode(original).decode(), "llava")
+        return first, second
+
+    first, second = asyncio.run(prepare_twice())
+
+    assert first == second
+    assert preprocessor.get_stats()["processed"] == 1
+    assert preprocessor.get_stats()["cache"]["hits"] == 1
+    # Held as the base64 string itself, sized by its length rather than a JSON encoding
+    assert preprocessor.get_stats()["cache"]["bytes"] == len(first)
+
+
+def test_processed_image_cache_evicts_by_length_and_age(monkeypatch):
+    cache = ProcessedImageCache(max_entries=10, max_bytes=10, ttl_seconds=60)
+    cache.set("a", "x" * 4)
+    cache.set("b", "y" * 4)
+    assert cache.get("a") == "x" * 4
+    cache.set("c", "z" * 4)
+    cache.set("too big", "w" * 11)
+
+    assert (cache.get("a"), cache.get("b"), cache.get("too big")) == ("x" * 4, None, None)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert cache.get("c") is None
+    assert cache.get_stats()["bytes"] == 4
+
+
+def test_undecodable_image_is_passed_through():
+    preprocessor = _preprocessor()
+    encoded = base64.b64encode(b"not an image").decode()
+
+    assert asyncio.run(preprocessor.prepare(encoded, "llava")) == encoded
+    assert preprocessor.get_stats()["errors"] == 1
+
+
+def test_disabled_preprocessor_returns_base64_of_raw_bytes():
+    preprocessor = VisionPreprocessor(enabled=False)
+    raw = _image((4000, 3000))
+
+    assert asyncio.run(preprocessor.prepare(raw, "llava")) == base64.b64encode(raw).decode()